@@ -0,0 +1,126 @@
+"""
+답안 이벤트 로그 (맞힘/틀림 모두, 응답 시간 포함)
+
+클릭 처리에서는 메모리 버퍼에 넣기만 하고, FLUSH_SIZE개가 모이거나 FLUSH_INTERVAL초가 지나면
+백그라운드 스레드가 한 트랜잭션으로 기록합니다. (프로세스 종료 시에도 남은 버퍼를 기록)
+오답노트, 과목 통계, 복습 일정은 기록할 때 이 로그로부터 갱신됩니다.
+"""
+import atexit
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+import database
+import metrics
+
+FLUSH_SIZE = 50
+FLUSH_INTERVAL = 2.0
+# 잠김 같은 일시적 오류로 기록하지 못한 이벤트를 다시 시도하는 최대 횟수 (넘으면 버림)
+FLUSH_RETRIES = 5
+
+_buffer = []
+_lock = threading.Lock()        # 버퍼 보호
+_flush_lock = threading.Lock()  # 기록은 한 번에 하나씩 (이벤트 순서 유지)
+_wakeup = threading.Event()
+_started = False
+
+
+def record(user_id, q, choice, latency_ms=None):
+    """답 하나를 버퍼에 추가 (디스크를 기다리지 않음)"""
+    event = {
+        "user_id": user_id,
+        "category": q.get('category'),
+        "question": q.get('question'),
+        "options": q.get('options', []),
+        "answer": q.get('answer', 0),
+        "explanation": q.get('explanation'),
+        "choice": choice,
+        "correct": choice == q.get('answer', 0),
+        "latency_ms": latency_ms,
+        "note_id": q.get('note_id'),   # 복습 퀴즈 문제면 오답노트 id
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),  # CURRENT_TIMESTAMP와 같은 형식
+    }
+    with _lock:
+        _buffer.append(event)
+        full = len(_buffer) >= FLUSH_SIZE
+    _start()
+    if full:
+        _wakeup.set()
+    return event["correct"]
+
+
+def flush():
+    """
+    버퍼를 지금 기록하고 기록한 이벤트 수 반환
+    잠김 같은 일시적 오류면 버퍼 앞에 되돌려 다음에 다시 시도 (FLUSH_RETRIES번까지),
+    그 밖의 오류면 하나씩 기록해 보고 기록되지 않는 이벤트만 버림 (answer_events_dropped_total)
+    """
+    with _flush_lock:
+        with _lock:
+            events = _buffer[:]
+            del _buffer[:]
+        if not events:
+            return 0
+        started = time.perf_counter()
+        try:
+            database.record_answer_events(events)
+            written, retry = len(events), []
+        except sqlite3.OperationalError:
+            metrics.inc("answer_events_flush_errors_total")
+            written, retry = 0, events
+        except Exception:
+            metrics.inc("answer_events_flush_errors_total")
+            written, retry = _record_each(events)
+        retry = _count_attempt(retry)
+        if retry:
+            with _lock:
+                _buffer[:0] = retry
+        if written:
+            metrics.observe("answer_events_flush_seconds", time.perf_counter() - started)
+            metrics.inc("answer_events_flushed_total", written)
+        return written
+
+
+def _record_each(events):
+    """이벤트를 하나씩 기록 (기록한 수, 일시적 오류로 다시 시도할 이벤트), 다른 오류가 난 이벤트는 버림"""
+    written, retry = 0, []
+    for event in events:
+        try:
+            database.record_answer_events([event])
+            written += 1
+        except sqlite3.OperationalError:
+            retry.append(event)
+        except Exception:
+            metrics.inc("answer_events_dropped_total")
+    return written, retry
+
+
+def _count_attempt(events):
+    """다시 시도할 이벤트의 시도 횟수를 올리고, FLUSH_RETRIES를 넘은 이벤트는 버림"""
+    kept = []
+    for event in events:
+        event["attempts"] = event.get("attempts", 0) + 1
+        if event["attempts"] < FLUSH_RETRIES:
+            kept.append(event)
+        else:
+            metrics.inc("answer_events_dropped_total")
+    return kept
+
+
+def _flush_loop():
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+        flush()
+
+
+def _start():
+    global _started
+    if _started:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    atexit.register(flush)
+    threading.Thread(target=_flush_loop, name="answer-log-flush", daemon=True).start()
@@ -1,12 +1,15 @@
 import streamlit as st
-import requests
-import json
 import time
-import random
 import uuid
 import database
+import answer_log
+import gemini
+import question_pool
+import session_store
+import metrics
 import os 
 import ast
+import hashlib
 
 def get_secret(key):
     """안전한 시크릿 로드 (Render 호환)"""
@@ -17,6 +20,64 @@ def get_secret(key):
         pass
     return os.environ.get(key)
 
+# [계측] 상호작용마다 스크립트(또는 프래그먼트) 실행 시간 기록
+_run_started = time.perf_counter()
+metrics.start_exporters()  # PT_METRICS_PORT / PT_METRICS_FILE 설정 시 한 번만 시작
+
+def record_run_time(scope, started):
+    """실행 시간을 세션에 최근 50개까지 보관 (SHOW_RUN_TIMING이 설정되면 사이드바에 표시)"""
+    elapsed = time.perf_counter() - started
+    mode = st.session_state.get("app_mode")
+    timings = st.session_state.setdefault("run_timings", [])
+    timings.append({"scope": scope, "mode": mode, "ms": round(elapsed * 1000, 1)})
+    del timings[:-50]
+    metrics.observe("script_run_seconds", elapsed, scope=scope, mode=mode)
+
+def stop_script():
+    """st.stop() 전에 이번 실행 시간을 기록"""
+    record_run_time("script", _run_started)
+    st.stop()
+
+def load_cloud_api_keys():
+    """시크릿/환경변수의 Gemini 키 목록 (다중 키 "GEMINI_API_KEYS" 우선, 단일 키 호환)"""
+    val_list = get_secret("GEMINI_API_KEYS")
+    val_single = get_secret("GEMINI_API_KEY")
+
+    if val_list:
+        if isinstance(val_list, str):
+            try:
+                # ["key1", "key2"] 꼴의 문자열 파싱 (Render 환경변수)
+                parsed = ast.literal_eval(val_list)
+                if isinstance(parsed, list): return tuple(parsed)
+                if isinstance(parsed, str): return (parsed,)
+            except:
+                # 콤마로 분리
+                return tuple(k.strip() for k in val_list.split(",") if k.strip())
+        else:
+            return tuple(val_list)
+    elif val_single:
+        # 단일 키 호환
+        return (val_single,)
+    return ()
+
+@st.cache_resource
+def startup():
+    """
+    프로세스에서 한 번만: DB 스키마 준비(마이그레이션), 시크릿 읽기와 키 목록 파싱, 모델 조회/문제 풀 확인 시작
+    새 세션과 rerun은 결과만 재사용 (시크릿 조회, literal_eval, 스키마 확인을 반복하지 않음)
+    """
+    database.init_db()
+    api_keys = load_cloud_api_keys()
+    if api_keys:
+        # 모델 조회를 미리 해두어 첫 시험 시작 시 대기 제거
+        gemini.warm_up(api_keys)
+        question_pool.warm_up(api_keys)
+    return {
+        "api_keys": api_keys,
+        "access_password": get_secret("ACCESS_PASSWORD"),
+        "show_run_timing": bool(get_secret("SHOW_RUN_TIMING")),
+    }
+
 # --- 1. 페이지 설정 & 초기화 ---
 st.set_page_config(
     page_title="PT Pro: 물리치료 국가고시 AI 마스터",
@@ -25,19 +86,28 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# [UI 트윅] Streamlit 기본 요소 숨기기 (헤더, 푸터, 햄버거 메뉴)
-hide_st_style = """
-<style>
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    .viewerBadge_container__1QSob {display: none;}
-</style>
-"""
-st.markdown(hide_st_style, unsafe_allow_html=True)
+# [UI 트윅] 테마 CSS (기본 요소 숨기기 + 디자인) - 정적 파일 링크만 보내고 브라우저가 캐시
+@st.cache_resource
+def theme_stylesheet_tag():
+    """static/theme.css를 내용 해시로 버전을 붙여 링크 (CSS가 바뀔 때만 브라우저가 새로 받음)"""
+    css_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "theme.css")
+    with open(css_path, "rb") as f:
+        version = hashlib.sha1(f.read()).hexdigest()[:10]
+    return f'<link rel="stylesheet" href="app/static/theme.css?v={version}">'
+
+st.markdown(theme_stylesheet_tag(), unsafe_allow_html=True)
+
+# 프로세스 공용 준비 (첫 세션에서만 실제로 실행)
+app_config = startup()
 
 # 사용자 ID & 상태 초기화
+# 주소의 sid로 같은 사용자를 이어감 (새로고침/재접속/서버 재시작 후에도 진행 중인 시험과 사용량 유지)
 if "user_id" not in st.session_state:
-    st.session_state.user_id = str(uuid.uuid4())
+    sid = st.query_params.get("sid")
+    if not session_store.valid_user_id(sid):
+        sid = str(uuid.uuid4())
+        st.query_params["sid"] = sid
+    st.session_state.user_id = sid
 
 # 앱 상태 관리: 'home', 'exam', 'review_notes'
 if "app_mode" not in st.session_state:
@@ -54,27 +124,13 @@ if "exam_session" not in st.session_state:
     }
 
 # [선물용 기능] 비밀번호 보호 (ACCESS_PASSWORD가 설정된 경우만)
-access_password = get_secret("ACCESS_PASSWORD")
+access_password = app_config["access_password"]
 
 if access_password:
     if "auth_status" not in st.session_state:
         st.session_state.auth_status = False
         
     if not st.session_state.auth_status:
-        st.markdown("""
-        <style>
-        .auth-container {
-            max-width: 400px;
-            margin: 100px auto;
-            padding: 40px;
-            background: rgba(255, 255, 255, 0.9);
-            border-radius: 20px;
-            box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-            text-align: center;
-        }
-        </style>
-        """, unsafe_allow_html=True)
-        
         col1, col2, col3 = st.columns([1,2,1])
         with col2:
             st.markdown('<div class="auth-container">', unsafe_allow_html=True)
@@ -91,285 +147,36 @@ if access_password:
                 else:
                     st.error("비밀번호가 틀렸습니다.")
             st.markdown('</div>', unsafe_allow_html=True)
-        st.stop() # 비밀번호 맞을 때까지 아래 코드 실행 중단
+        stop_script() # 비밀번호 맞을 때까지 아래 코드 실행 중단
 
-# 데이터베이스 초기화
-if "db_initialized" not in st.session_state:
-    database.init_db()
-    st.session_state.db_initialized = True
+# 새 세션에서 한 번: 저장된 시험 확인
+if "resume_checked" not in st.session_state:
+    st.session_state.resume_checked = True
+    # 새 세션이 홈에서 시작할 때, 끝나지 않은 시험이 저장되어 있으면 그 문제부터 이어서 (새로 생성하지 않음)
+    stored_session = None
+    if st.session_state.app_mode == "home":
+        stored_session = session_store.load_unfinished(st.session_state.user_id)
+    if stored_session is not None:
+        st.session_state.exam_session = stored_session
+        st.session_state.app_mode = "exam"
 
-# --- 2. Ultra Premium CSS 스타일 (Glassmorphism + Gradient) ---
-st.markdown("""
-<style>
-    @import url('https://cdn.jsdelivr.net/gh/orioncactus/pretendard/dist/web/static/pretendard.css');
-    
-    /* 기본 배경 및 폰트 */
-    .stApp {
-        background: linear-gradient(120deg, #fdfbfb 0%, #ebedee 100%);
-        font-family: 'Pretendard', sans-serif;
-    }
-    
-    /* 헤더 스타일 */
-    .header-container {
-        padding: 40px 20px;
-        text-align: center;
-        background: linear-gradient(90deg, #6a11cb 0%, #2575fc 100%);
-        color: white;
-        border-radius: 20px;
-        box-shadow: 0 10px 30px rgba(37, 117, 252, 0.3);
-        margin-bottom: 40px;
-    }
-    .header-title {
-        font-size: 2.8rem;
-        font-weight: 800;
-        margin: 0;
-        letter-spacing: -1px;
-    }
-    .header-subtitle {
-        font-size: 1.1rem;
-        opacity: 0.9;
-        margin-top: 10px;
-        font-weight: 400;
-    }
+def settle_usage(session):
+    """생성이 끝난 시험: 예약한 사용량을 실제로 받은 문제 수로 확정 (하나도 못 받았으면 전액 환불)"""
+    reserved = session.pop("reserved", None)
+    if reserved:
+        database.commit_usage(st.session_state.user_id, reserved, min(reserved, len(session.get("questions_list", []))))
 
-    /* 카드 공통 스타일 (Glassmorphism) */
-    .card {
-        background: rgba(255, 255, 255, 0.9);
-        backdrop-filter: blur(10px);
-        border-radius: 20px;
-        padding: 30px;
-        box-shadow: 0 8px 32px rgba(31, 38, 135, 0.07);
-        border: 1px solid rgba(255, 255, 255, 0.18);
-        margin-bottom: 25px;
-        transition: transform 0.3s ease;
-    }
-    .card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 12px 40px rgba(31, 38, 135, 0.12);
-    }
-    
-    /* 문제 텍스트 */
-    .question-box {
-        font-size: 1.4rem;
-        font-weight: 700;
-        color: #2d3436;
-        line-height: 1.6;
-        margin-bottom: 20px;
-    }
-    
-    /* 뱃지 스타일 */
-    .category-badge {
-        background: linear-gradient(45deg, #00b09b, #96c93d);
-        color: white;
-        padding: 5px 15px;
-        border-radius: 50px;
-        font-size: 0.85rem;
-        font-weight: 700;
-        display: inline-block;
-        margin-bottom: 15px;
-        box-shadow: 0 4px 10px rgba(150, 201, 61, 0.3);
-    }
-
-    /* 점수판 */
-    .score-board {
-        text-align: center;
-        font-size: 1.2rem;
-        font-weight: 700;
-        color: #6c5ce7;
-        margin-bottom: 20px;
-        padding: 10px;
-        background: #f1f2f6;
-        border-radius: 15px;
-    }
-
-    /* 정답/오답 박스 */
-    .result-box {
-        padding: 20px;
-        border-radius: 15px;
-        margin-top: 20px;
-        animation: fadeIn 0.5s ease-out;
-    }
-    .correct { background-color: #d4edda; color: #155724; border: 1px solid #c3e6cb; }
-    .wrong { background-color: #f8d7da; color: #721c24; border: 1px solid #f5c6cb; }
-    
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    /* 버튼 커스터마이징 */
-    .stButton button {
-        border-radius: 12px;
-        font-weight: 600;
-        padding: 0.5rem 1rem;
-        transition: all 0.2s;
-    }
-    /* Primary 버튼 (그라데이션) */
-    .stButton button[kind="primary"] {
-        background: linear-gradient(90deg, #6a11cb 0%, #2575fc 100%);
-        border: none;
-        box-shadow: 0 4px 15px rgba(37, 117, 252, 0.4);
-    }
-    .stButton button[kind="primary"]:hover {
-        opacity: 0.9;
-        transform: scale(1.02);
-    }
-</style>
-""", unsafe_allow_html=True)
-
-import random
-
-# --- 3. 로직 함수 (API & Helper) ---
-SUBJECTS = [
-    "물리치료 기초",
-    "물리치료 진단평가",
-    "물리치료 중재",
-    "의료관계법규",
-    "물리치료 실기"
-]
-
-def generate_exam_batch(api_keys_list, count=20):
-    """
-    한 번의 요청으로 20문제를 생성하여 리스트로 반환합니다.
-    (단순/고속 모드: 키 순환 후 실패 시 즉시 종료)
-    """
-    if not api_keys_list: return None
-        
-    shuffled_keys = list(api_keys_list)
-    random.shuffle(shuffled_keys)
-    
-    last_error = "Unknown Error"
-    
-    # 키 하나씩 시도
-    for i, api_key in enumerate(shuffled_keys):
-        try:
-            # 1. 모델 찾기
-            list_url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
-            resp = requests.get(list_url, timeout=5)
-            
-            if resp.status_code == 200:
-                models = resp.json().get('models', [])
-            else:
-                last_error = f"Key #{i+1} List Error {resp.status_code}"
-                continue
-            
-            valid_model_name = None
-            # Flash 모델 우선
-            for m in models:
-                 if 'flash' in m.get('name', '').lower() and 'generateContent' in m.get('supportedGenerationMethods', []):
-                     valid_model_name = m.get('name'); break
-            
-            # 없으면 아무거나
-            if not valid_model_name:
-                for m in models:
-                    if 'generateContent' in m.get('supportedGenerationMethods', []):
-                        valid_model_name = m.get('name'); break
-            
-            if not valid_model_name: 
-                last_error = f"Key #{i+1} No Model Found"
-                continue
-            
-            # 2. 배치 생성 요청
-            generate_url = f"https://generativelanguage.googleapis.com/v1beta/{valid_model_name}:generateContent?key={api_key}"
-            
-            prompt = f"""
-            당신은 대한민국 물리치료사 국가고시 출제 위원입니다.
-            [물리치료 기초, 진단평가, 중재, 의료관계법규, 실기] 전 범위에서
-            총 {count}개의 객관식 문제를 출제하여 JSON 리스트로 반환하세요.
-            
-            [조건]
-            1. 난이도: 실제 국시 합격률 40% 수준의 변별력 있는 문제
-            2. 각 과목을 골고루 분배하세요.
-            3. 5지 선다형
-            
-            [응답 형식]
-            반드시 아래와 같은 JSON 배열 포맷만 출력하세요. (Markdown codeblock 금지)
-            [
-              {{
-                "category": "과목명",
-                "question": "1. 문제 내용...",
-                "options": ["보기1", "보기2", "보기3", "보기4", "보기5"],
-                "answer": 0,
-                "explanation": "해설..."
-              }},
-              ... 
-            ]
-            """
-            
-            payload = {"contents": [{"parts": [{"text": prompt}]}]}
-            if "1.5" in valid_model_name:
-                payload["generationConfig"] = {"response_mime_type": "application/json"}
-                
-            headers = {'Content-Type': 'application/json'}
-            
-            # 타임아웃 180초 (3분) - 대량 생성이라 시간 필요
-            r = requests.post(generate_url, headers=headers, json=payload, timeout=180)
-            
-            if r.status_code == 200:
-                text = r.json()['candidates'][0]['content']['parts'][0]['text']
-                text = text.replace("```json", "").replace("```", "").strip()
-                
-                # 리스트 파싱
-                start = text.find("["); end = text.rfind("]")
-                if start != -1 and end != -1:
-                    data_list = json.loads(text[start:end+1])
-                    
-                    clean_list = []
-                    for item in data_list:
-                        if not all(k in item for k in ('question', 'options', 'answer')): continue
-                        ans = item.get('answer')
-                        if isinstance(ans, int):
-                            if ans > 4: item['answer'] = ans % 5
-                            elif ans >= 1: item['answer'] = ans - 1
-                        clean_list.append(item)
-                        
-                    if len(clean_list) > 0:
-                        return clean_list
-                
-                last_error = f"Key #{i+1} JSON Parse Error"
-                continue
-            
-            elif r.status_code == 429:
-                last_error = f"Key #{i+1} Quota Exceeded (429)"
-                continue # 다음 키로 바로 넘어감
-            else:
-                last_error = f"Key #{i+1} Error {r.status_code}"
-                continue
-                
-        except Exception as e:
-            last_error = str(e)
-            continue
-            
-    st.error(f"⚠️ 문제 생성 실패: {last_error} (잠시 후 다시 시도해주세요)")
-    return None
+def leave_exam(session):
+    """시험 중에 다른 화면으로 나갈 때: 생성 중이던 예약은 받은 만큼 확정하고 저장된 진행 상태 삭제 (다시 이어 풀지 않음)"""
+    settle_usage(session)
+    session_store.clear(st.session_state.user_id)
 
 # --- 4. 사이드바 (Secrets 연동 - 다중 키 지원) ---
 with st.sidebar:
     st.header("⚙️ 설정")
     
-    api_keys = []
-    
-    # 1. 시크릿/환경변수 로드 통합 (Helper 함수 사용)
-    # 다중 키 ("GEMINI_API_KEYS")
-    val_list = get_secret("GEMINI_API_KEYS")
-    val_single = get_secret("GEMINI_API_KEY")
-    
-    if val_list:
-        if isinstance(val_list, list): api_keys = val_list
-        elif isinstance(val_list, str):
-            try:
-                # ["key1", "key2"] 꼴의 문자열 파싱 (Render 환경변수)
-                import ast
-                parsed = ast.literal_eval(val_list)
-                if isinstance(parsed, list): api_keys = parsed
-                elif isinstance(parsed, str): api_keys = [parsed]
-            except:
-                # 콤마로 분리
-                api_keys = [k.strip() for k in val_list.split(",") if k.strip()]
-                
-    elif val_single:
-        # 단일 키 호환
-        api_keys = [val_single]
+    # 시크릿/환경변수의 키 목록 (startup에서 한 번만 읽고 파싱)
+    api_keys = list(app_config["api_keys"])
 
     if api_keys:
         st.success(f"✅ 클라우드 키 {len(api_keys)}개 대기중")
@@ -378,7 +185,7 @@ with st.sidebar:
         if user_input_key: api_keys = [user_input_key]
     
     daily_limit = 20
-    is_allowed, current_count = database.check_usage(st.session_state.user_id, daily_limit)
+    _, current_count = database.check_usage(st.session_state.user_id, daily_limit)
     
     st.markdown("---")
     st.markdown(f"📊 **일일 사용량: {current_count} / {daily_limit}**")
@@ -386,13 +193,24 @@ with st.sidebar:
     
     st.markdown("---")
     if st.button("🏠 홈으로"):
+        if st.session_state.app_mode == "exam":
+            leave_exam(st.session_state.exam_session)
         st.session_state.app_mode = "home"
         st.rerun()
         
     if st.button("📓 오답노트"):
+        if st.session_state.app_mode == "exam":
+            leave_exam(st.session_state.exam_session)
         st.session_state.app_mode = "review"
+        st.session_state.pop("review_page", None)  # 들어올 때마다 첫 페이지부터 다시 로드
         st.rerun()
 
+    # 실행 시간 (프래그먼트만 다시 그린 경우 포함, 최근 5개)
+    if app_config["show_run_timing"] and st.session_state.get("run_timings"):
+        st.markdown("---")
+        for t in st.session_state.run_timings[-5:]:
+            st.caption(f"⏱️ {t['scope']} ({t['mode']}): {t['ms']}ms")
+
 # --- 5. UI 구성 ---
 
 # 헤더
@@ -405,7 +223,116 @@ st.markdown("""
 
 if not api_keys:
     st.warning("🔒 API 키가 필요합니다. (Secrets를 설정하거나 키를 입력하세요)")
-    st.stop()
+    stop_script()
+
+def submit_answer(q, idx):
+    """제출 콜백: 클릭 직후 다시 그리기 전에 상태를 바꾸므로 별도 st.rerun이 필요 없음"""
+    session = st.session_state.exam_session
+    choice_idx = st.session_state.get(f"q_{idx}")
+    if choice_idx is None:
+        st.session_state.exam_feedback = "no_choice"
+        return
+    session['is_submitted'] = True
+    session['user_choice'] = choice_idx
+
+    # 오답노트/통계/복습 일정 반영은 답안 로그를 모아 기록할 때 (클릭은 디스크를 기다리지 않음)
+    shown_at = session.get('shown_at')
+    latency_ms = int((time.time() - shown_at) * 1000) if shown_at else None
+    if answer_log.record(st.session_state.user_id, q, choice_idx, latency_ms):
+        session['correct_count'] += 1
+        st.session_state.exam_feedback = "correct"
+    session_store.save(st.session_state.user_id, session)
+
+def next_question():
+    session = st.session_state.exam_session
+    session['current_idx'] += 1
+    session['is_submitted'] = False
+    session['user_choice'] = None
+    session_store.save(st.session_state.user_id, session)
+
+def reset_search_page():
+    st.session_state.review_search_page = 0
+
+def move_search_page(step):
+    st.session_state.review_search_page = st.session_state.get("review_search_page", 0) + step
+
+@st.fragment
+def exam_card():
+    """
+    시험 문제 카드 (점수판, 문제, 보기, 결과)
+    제출/다음 문제는 이 부분만 다시 실행 (사이드바·키 로드·사용량 조회를 반복하지 않음)
+    """
+    started = time.perf_counter()
+    session = st.session_state.exam_session
+    q_list = session.get("questions_list", [])
+    idx = session.get("current_idx", 0)
+    try:
+        # 마지막 문제였거나 다음 문제가 아직 생성 중이면 전체 화면(완료/대기)으로
+        if idx >= len(q_list):
+            st.rerun()
+
+        # 콜백에서 정한 알림은 여기서 표시 (콜백 안에서 요소를 그리면 프래그먼트 위치가 어긋남)
+        feedback = st.session_state.pop("exam_feedback", None)
+        if feedback == "no_choice":
+            st.toast("답을 골라주세요!", icon="⚠️")
+        elif feedback == "correct":
+            st.balloons()
+
+        # 현재 문제 가져오기 (API 호출 X, 메모리에서 가져옴)
+        q = q_list[idx]
+        if session.get('shown_idx') != idx:
+            # 응답 시간 측정용: 문제를 처음 보여준 시각
+            session['shown_idx'] = idx
+            session['shown_at'] = time.time()
+
+        # 레이아웃: 점수판 & 진행률 (남은 문제가 생성 중이면 받을 문제 수 기준)
+        total = session.get("reserved", len(q_list)) if session.get("generating") else len(q_list)
+        st.markdown(f'<div class="score-board">🏆 문제 {idx + 1} / {total} (현재 득점: {session["correct_count"]})</div>', unsafe_allow_html=True)
+
+        # 문제 카드
+        st.markdown(f"""
+        <div class="card">
+            <span class="category-badge">{q.get('category')}</span>
+            <div class="question-box">Q. {q.get('question')}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+        # 보기 영역
+        options = q.get('options', [])
+
+        with st.container():
+            # 상태에 따라 key를 다르게 주어 리셋 방지 or 리셋 유도
+            st.radio(
+                "정답을 선택하세요:", 
+                range(len(options)), 
+                format_func=lambda i: options[i],
+                key=f"q_{idx}", # 문제마다 키가 달라야 함
+                index=None,
+                disabled=session['is_submitted']
+            )
+
+            st.write("") 
+
+            if not session['is_submitted']:
+                st.button("✅ 정답 제출", type="primary", on_click=submit_answer, args=(q, idx))
+            else:
+                # 결과 표시
+                user_pick = session['user_choice']
+                correct_pick = q.get('answer', 0)
+
+                if user_pick == correct_pick:
+                    st.markdown(f'<div class="result-box correct">🎉 <b>정답입니다!</b></div>', unsafe_allow_html=True)
+                else:
+                    st.markdown(f'<div class="result-box wrong">❌ <b>오답입니다.</b> (선택: {options[user_pick]})<br>👉 정답: <b>{options[correct_pick]}</b></div>', unsafe_allow_html=True)
+
+                with st.expander("📚 해설 보기", expanded=True):
+                    st.info(q.get('explanation'))
+
+                col_nxt1, col_nxt2 = st.columns([4, 1])
+                with col_nxt2:
+                    st.button("다음 문제 ➡️", type="primary", on_click=next_question)
+    finally:
+        record_run_time("exam_card", started)
 
 # [모드: 홈]
 if st.session_state.app_mode == "home":
@@ -418,27 +345,37 @@ if st.session_state.app_mode == "home":
         
         # 시작 버튼
         if st.button("🚀 20문제 전체 생성 및 시작", type="primary"):
-            if not is_allowed:
+            # 생성 전에 사용량을 먼저 예약 (실패 시 환불)
+            reserved, _ = database.reserve_usage(st.session_state.user_id, 20, daily_limit)
+            if not reserved:
                 st.error("🚫 오늘의 학습량을 모두 사용했습니다.")
             else:
-                with st.spinner("🔄 AI가 20문제를 정성껏 출제하고 있습니다... (약 10~20초 소요)"):
-                    # 배치 생성 호출
-                    questions = generate_exam_batch(api_keys, count=20)
+                with st.spinner("🔄 문제를 준비하고 있습니다..."):
+                    # 미리 생성된 풀에서 꺼냄 (풀이 비었을 때만 AI 생성 대기)
+                    new_session = {
+                        "questions_list": [],       # 전체 문제 리스트 (즉석 생성 시 백그라운드에서 채워짐)
+                        "current_idx": 0,           # 현재 문제 인덱스
+                        "correct_count": 0,
+                        "is_submitted": False,
+                        "user_choice": None,
+                        "generating": False         # 남은 문제가 아직 생성 중인지
+                    }
+                    questions, pool_error = question_pool.draw_exam(st.session_state.user_id, api_keys, count=20, exam_session=new_session)
                     
-                    if questions:
-                        st.session_state.exam_session = {
-                            "questions_list": questions, # 전체 문제 리스트
-                            "current_idx": 0,           # 현재 문제 인덱스
-                            "correct_count": 0,
-                            "is_submitted": False,
-                            "user_choice": None
-                        }
-                        # 사용량 한 번에 증가
-                        database.increment_usage(st.session_state.user_id, amount=len(questions))
+                    # 풀이 비었으면 생성 작업만 넣고 바로 시험 화면으로 (도착하는 대로 이어 받음)
+                    if questions or new_session["generating"]:
+                        if new_session["generating"]:
+                            # 나머지가 생성 중이면 예약을 유지하고 생성이 끝날 때 받은 만큼 확정 (settle_usage)
+                            new_session["reserved"] = 20
+                        else:
+                            database.commit_usage(st.session_state.user_id, 20, len(questions))
+                        st.session_state.exam_session = new_session
+                        session_store.save(st.session_state.user_id, new_session)
                         st.session_state.app_mode = "exam"
                         st.rerun()
                     else:
-                        st.error("생성 실패! 잠시 후 다시 시도해주세요.")
+                        database.commit_usage(st.session_state.user_id, 20, 0)
+                        st.error(f"⚠️ 문제 생성 실패: {pool_error} (잠시 후 다시 시도해주세요)")
             
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -448,94 +385,129 @@ elif st.session_state.app_mode == "exam":
     q_list = session.get("questions_list", [])
     idx = session.get("current_idx", 0)
     
+    # 남은 문제가 아직 생성 중이면 작업 상태를 확인 (다 풀었으면 잠시 대기)
+    if session.get("generating"):
+        question_pool.poll_exam(st.session_state.user_id, session)
+        if not session["generating"]:
+            settle_usage(session)
+        session_store.save(st.session_state.user_id, session)  # 문제가 늘었으면 묶음까지 저장
+        if idx >= len(q_list) and session["generating"]:
+            st.info("⏳ 다음 문제를 준비하고 있습니다...")
+            time.sleep(1)
+            st.rerun()
+
+    if not q_list and session.get("error"):
+        session_store.clear(st.session_state.user_id)
+        st.error(f"⚠️ 문제 생성 실패: {session['error']} (잠시 후 다시 시도해주세요)")
+        if st.button("메인으로 돌아가기"):
+            st.session_state.app_mode = "home"
+            st.rerun()
+        stop_script()
+
     # 예외 처리: 문제가 없을 때
     if not q_list or idx >= len(q_list):
+        session_store.clear(st.session_state.user_id)  # 다 푼 시험은 이어 풀 대상이 아님
         st.balloons()
         st.success(f"🎉 모든 문제를 풀었습니다! 최종 점수: {session['correct_count']} / {len(q_list)}")
-        if st.button("메인으로 돌아가기"):
+        if session.get("review"):
+            if st.button("📓 오답노트로 돌아가기"):
+                st.session_state.app_mode = "review"
+                st.session_state.pop("review_page", None)
+                st.rerun()
+        elif st.button("메인으로 돌아가기"):
             st.session_state.app_mode = "home"
             st.rerun()
-        st.stop()
+        stop_script()
 
-    # 현재 문제 가져오기 (API 호출 X, 메모리에서 가져옴)
-    q = q_list[idx]
-    
-    # 레이아웃: 점수판 & 진행률
-    st.markdown(f'<div class="score-board">🏆 문제 {idx + 1} / {len(q_list)} (현재 득점: {session["correct_count"]})</div>', unsafe_allow_html=True)
-    
-    # 문제 카드
-    st.markdown(f"""
-    <div class="card">
-        <span class="category-badge">{q.get('category')}</span>
-        <div class="question-box">Q. {q.get('question')}</div>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # 보기 영역
-    options = q.get('options', [])
-    
-    with st.container():
-        # 상태에 따라 key를 다르게 주어 리셋 방지 or 리셋 유도
-        choice_idx = st.radio(
-            "정답을 선택하세요:", 
-            range(len(options)), 
-            format_func=lambda i: options[i],
-            key=f"q_{idx}", # 문제마다 키가 달라야 함
-            index=None,
-            disabled=session['is_submitted']
-        )
-        
-        st.write("") 
-        
-        if not session['is_submitted']:
-            if st.button("✅ 정답 제출", type="primary"):
-                if choice_idx is None:
-                    st.toast("답을 골라주세요!", icon="⚠️")
-                else:
-                    session['is_submitted'] = True
-                    session['user_choice'] = choice_idx
-                    
-                    correct_idx = q.get('answer', 0)
-                    if choice_idx == correct_idx:
-                        session['correct_count'] += 1
-                        st.balloons()
-                    else:
-                        database.add_review_note(st.session_state.user_id, q.get('category'), q.get('question'), options, correct_idx, q.get('explanation'))
-                    st.rerun()
-        else:
-            # 결과 표시
-            user_pick = session['user_choice']
-            correct_pick = q.get('answer', 0)
-            
-            if user_pick == correct_pick:
-                st.markdown(f'<div class="result-box correct">🎉 <b>정답입니다!</b></div>', unsafe_allow_html=True)
-            else:
-                st.markdown(f'<div class="result-box wrong">❌ <b>오답입니다.</b> (선택: {options[user_pick]})<br>👉 정답: <b>{options[correct_pick]}</b></div>', unsafe_allow_html=True)
-            
-            with st.expander("📚 해설 보기", expanded=True):
-                st.info(q.get('explanation'))
-                
-            col_nxt1, col_nxt2 = st.columns([4, 1])
-            with col_nxt2:
-                if st.button("다음 문제 ➡️", type="primary"):
-                    session['current_idx'] += 1
-                    session['is_submitted'] = False
-                    session['user_choice'] = None
-                    st.rerun()
+    exam_card()
 
 # [모드: 오답노트]
 elif st.session_state.app_mode == "review":
     st.markdown('<div class="header-container" style="padding:20px; font-size:1.5rem;">📓 오답노트 복습</div>', unsafe_allow_html=True)
+
+    # 들어올 때 한 번: 방금 푼 답까지 오답노트에 반영된 상태로 로드
+    if "review_page" not in st.session_state:
+        answer_log.flush()
+
+    # 간격 반복: 오늘 복습할 노트만 시험 화면으로 풀기 (사용량 차감 없음, AI 호출 없음)
+    due_count = database.count_due_review_notes(st.session_state.user_id)
+    if due_count:
+        due_label = "100+" if due_count >= 100 else str(due_count)
+        if st.button(f"🔁 오늘의 복습 퀴즈 시작 (복습할 문제 {due_label}개)", type="primary"):
+            due_notes = database.get_due_review_notes(st.session_state.user_id, limit=20)
+            if due_notes:
+                st.session_state.exam_session = {
+                    "questions_list": due_notes,
+                    "current_idx": 0,
+                    "correct_count": 0,
+                    "is_submitted": False,
+                    "user_choice": None,
+                    "generating": False,
+                    "review": True              # 복습 퀴즈 (답하면 복습 일정 갱신)
+                }
+                session_store.save(st.session_state.user_id, st.session_state.exam_session)
+                st.session_state.app_mode = "exam"
+                st.rerun()
+    
+    # 검색: 3글자 이상은 전문 검색 색인으로 관련도순 (검색 중에는 목록 대신 결과만)
+    search_text = st.text_input("🔍 검색", key="review_search", placeholder="예: 척수 손상, 의료법, 등장성 수축",
+                                on_change=reset_search_page)
+    if search_text.strip():
+        if not database.SEARCH_ENABLED:
+            st.caption("이 서버의 SQLite에는 전문 검색(FTS5)이 없어 일치하는 글자를 차례로 찾습니다. (관련도순 정렬 없음)")
+        scope = st.radio("검색 범위", ["오답노트", "내가 푼 문제 전체"], horizontal=True, key="review_search_scope",
+                         on_change=reset_search_page, label_visibility="collapsed")
+        search_page = st.session_state.get("review_search_page", 0)
+        search = database.search_review_notes if scope == "오답노트" else database.search_pool_questions
+        results, has_more = search(st.session_state.user_id, search_text, search_page)
+        if not results:
+            st.info("검색 결과가 없습니다. (두 글자 이상 입력)" if search_page == 0 else "더 이상 결과가 없습니다.")
+        for item in results:
+            with st.container(border=True):
+                if st.toggle(f"[{item['category']}] {item['snippet'] or item['question']}", key=f"found_{scope}_{item['id']}"):
+                    options = database.decode_note_options(item)
+                    st.markdown(f"**Q. {item['question']}**")
+                    st.markdown(f"**정답:** {options[item['answer']]}")
+                    st.markdown(f"**해설:** {item['explanation']}")
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            st.button("◀ 이전", disabled=search_page == 0, on_click=move_search_page, args=(-1,))
+        with col_page:
+            st.caption(f"{search_page + 1} 페이지")
+        with col_next:
+            st.button("다음 ▶", disabled=not has_more, on_click=move_search_page, args=(1,))
+        stop_script()
+
+    # 한 페이지씩 필요할 때만 로드 (이미 받은 페이지는 세션에 보관)
+    if "review_page" not in st.session_state:
+        first_notes, first_cursor = database.get_review_notes_page(st.session_state.user_id)
+        st.session_state.review_page = {"notes": first_notes, "cursor": first_cursor}
+    review_page = st.session_state.review_page
+    notes = review_page["notes"]
     
-    notes = database.get_review_notes(st.session_state.user_id)
     if not notes:
         st.success("🎉 저장된 오답이 없습니다. 훌륭해요!")
     else:
-        for i, note in enumerate(notes):
-            with st.expander(f"[{note['category']}] {note['question'][:40]}..."):
-                st.markdown(f"**Q. {note['question']}**")
-                st.markdown(f"**정답:** {note['options'][note['answer']]}")
-                st.markdown(f"**해설:** {note['explanation']}")
-                if st.button("완벽히 이해했음 (삭제)", key=f"del_{i}"):
-                    database.delete_review_note(st.session_state.user_id, note['question'])
-                    st.rerun()
+        for note in notes:
+            with st.container(border=True):
+                # 펼친 노트만 보기 목록을 파싱
+                miss_label = f" (❌ {note['miss_count']}회)" if note['miss_count'] > 1 else ""
+                if st.toggle(f"[{note['category']}] {note['question'][:40]}...{miss_label}", key=f"open_{note['id']}"):
+                    options = database.decode_note_options(note)
+                    st.markdown(f"**Q. {note['question']}**")
+                    st.markdown(f"**정답:** {options[note['answer']]}")
+                    st.markdown(f"**해설:** {note['explanation']}")
+                    if note.get('due_at'):
+                        st.caption(f"🔁 다음 복습: {note['due_at'][:10]}")
+                    if st.button("완벽히 이해했음 (삭제)", key=f"del_{note['id']}"):
+                        database.delete_review_note(st.session_state.user_id, note['id'])
+                        notes.remove(note)
+                        st.rerun()
+        
+        if review_page["cursor"] is not None:
+            if st.button("더 보기"):
+                more_notes, review_page["cursor"] = database.get_review_notes_page(st.session_state.user_id, review_page["cursor"])
+                notes.extend(more_notes)
+                st.rerun()
+
+record_run_time("script", _run_started)
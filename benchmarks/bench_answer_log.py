@@ -0,0 +1,107 @@
+"""
+답안 기록 벤치마크: 클릭마다 바로 쓰기(add_review_note/record_correct_answer) vs 답안 로그 버퍼
+
+    python benchmarks/bench_answer_log.py [--threads 8] [--answers 500] [--wrong-ratio 0.4] [--json]
+
+threads명이 동시에 answers개씩 답을 제출할 때 제출 처리(클릭 콜백) 한 번의 지연 분포와
+끝난 뒤 오답노트/과목 통계가 두 방식에서 같은지 확인합니다.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import answer_log
+import database
+
+SUBJECTS = ["물리치료 기초", "물리치료 진단평가", "물리치료 중재", "의료관계법규", "물리치료 실기"]
+
+
+def _questions(n, seed):
+    rng = random.Random(seed)
+    return [{"category": rng.choice(SUBJECTS), "question": f"벤치 문제 {i}", "options": ["1", "2", "3", "4", "5"],
+             "answer": 0, "explanation": "해설"} for i in range(n)]
+
+
+def direct_submit(user_id, q, choice):
+    if choice == q["answer"]:
+        database.record_correct_answer(user_id, q["category"])
+    else:
+        database.add_review_note(user_id, q["category"], q["question"], q["options"], q["answer"], q["explanation"])
+
+
+def buffered_submit(user_id, q, choice):
+    answer_log.record(user_id, q, choice, latency_ms=0)
+
+
+def run(submit, threads, answers, wrong_ratio):
+    latencies = []
+    lock = threading.Lock()
+
+    def _worker(n):
+        rng = random.Random(n)
+        mine = []
+        for q in _questions(answers, n):
+            choice = 1 if rng.random() < wrong_ratio else 0
+            started = time.perf_counter()
+            submit(f"bench-{n}", q, choice)
+            mine.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=_worker, args=(n,)) for n in range(threads)]
+    for w in workers: w.start()
+    for w in workers: w.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    pick = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return {"p50_ms": pick(0.5), "p99_ms": pick(0.99), "max_ms": latencies[-1] * 1000,
+            "answers_per_sec": len(latencies) / elapsed}
+
+
+def snapshot():
+    with database._connection() as conn:
+        notes = conn.execute('SELECT user_id, question, miss_count FROM review_notes ORDER BY user_id, question').fetchall()
+        stats = conn.execute('SELECT * FROM subject_stats ORDER BY user_id, category').fetchall()
+    return notes, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--answers", type=int, default=500)
+    parser.add_argument("--wrong-ratio", type=float, default=0.4)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    report = {"config": vars(args)}
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "direct.db")
+        database.init_db()
+        report["direct"] = run(direct_submit, args.threads, args.answers, args.wrong_ratio)
+        direct_state = snapshot()
+
+        database.DB_FILE = os.path.join(tmp, "buffered.db")
+        database.init_db()
+        report["buffered"] = run(buffered_submit, args.threads, args.answers, args.wrong_ratio)
+        answer_log.flush()
+        report["same_result"] = snapshot() == direct_state
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"{'mode':<9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'answers/s':>10}")
+    for mode in ("direct", "buffered"):
+        row = report[mode]
+        print(f"{mode:<9} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['max_ms']:>8.2f} {row['answers_per_sec']:>10.0f}")
+    print("same review notes / stats:", report["same_result"])
+
+
+if __name__ == "__main__":
+    main()
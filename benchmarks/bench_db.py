@@ -0,0 +1,100 @@
+"""
+SQLite 접근 벤치마크: 기존 방식(호출마다 connect/close, 기본 저널) vs 커넥션 풀 + WAL
+
+    python benchmarks/bench_db.py [--threads 8] [--seconds 3]
+
+한 번의 "rerun"은 사이드바의 check_usage 1회이며, 10회 중 1회는 오답 저장(쓰기)을 섞습니다.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+
+def legacy_check_usage(db_file, user_id):
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    c.execute('SELECT count FROM usage_logs WHERE user_id = ? AND date_str = ?', (user_id, database.get_today_str()))
+    row = c.fetchone()
+    conn.close()
+    return row
+
+
+def legacy_add_review_note(db_file, user_id):
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    c.execute('''
+        INSERT INTO review_notes (user_id, category, question, options, answer, explanation)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (user_id, "물리치료 기초", "문제", '["1","2","3","4","5"]', 0, "해설"))
+    conn.commit()
+    conn.close()
+
+
+def pooled_rerun(user_id, i):
+    database.check_usage(user_id)
+    if i % 10 == 0:
+        database.add_review_note(user_id, "물리치료 기초", "문제", ["1", "2", "3", "4", "5"], 0, "해설")
+
+
+def run(label, rerun, threads, seconds):
+    counts = [0] * threads
+    errors = [0] * threads
+    stop = time.time() + seconds
+
+    def _worker(n):
+        user_id = f"bench-{n}"
+        i = 0
+        while time.time() < stop:
+            try:
+                rerun(user_id, i)
+                counts[n] += 1
+            except sqlite3.OperationalError:
+                errors[n] += 1
+            i += 1
+
+    workers = [threading.Thread(target=_worker, args=(n,)) for n in range(threads)]
+    for w in workers: w.start()
+    for w in workers: w.join()
+    print(f"{label:<8} reruns/sec: {sum(counts) / seconds:>10.1f}   locked errors: {sum(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # before: 기본 rollback 저널 DB에 호출마다 새 커넥션
+        legacy_db = os.path.join(tmp, "legacy.db")
+        with sqlite3.connect(legacy_db) as conn:
+            conn.execute('CREATE TABLE usage_logs (user_id TEXT, date_str TEXT, count INTEGER, PRIMARY KEY (user_id, date_str))')
+            conn.execute('''
+                CREATE TABLE review_notes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, category TEXT, question TEXT,
+                    options TEXT, answer INTEGER, explanation TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+        def legacy_rerun(user_id, i):
+            legacy_check_usage(legacy_db, user_id)
+            if i % 10 == 0:
+                legacy_add_review_note(legacy_db, user_id)
+
+        run("before", legacy_rerun, args.threads, args.seconds)
+
+        # after: 커넥션 풀 + WAL
+        database.DB_FILE = os.path.join(tmp, "pooled.db")
+        database.init_db()
+        run("after", pooled_rerun, args.threads, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
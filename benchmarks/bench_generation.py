@@ -0,0 +1,189 @@
+"""
+문제 생성 경로 지연 벤치마크 (로컬 mock_gemini 서버 사용, 실제 할당량 소모 없음)
+
+    python benchmarks/bench_generation.py [--trials 20] [--latency 2] [--json]
+
+측정 항목:
+    - 모드별(batch / sharded / stream) 첫 문제까지 시간(TTFQ) p50/p95/p99
+    - 모드별 20문제 배치 전체 완료 시간과 동시 처리량(batches/sec)
+    - 키 장애 전환 비용: 첫 키가 429를 낼 때 추가로 드는 시간
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import gemini
+import key_scheduler
+from mock_gemini import MockConfig, MockGeminiServer
+
+KEYS = ["bench-key-1", "bench-key-2", "bench-key-3"]
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(values):
+    return {
+        "n": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values) if values else None,
+    }
+
+
+def run_once(mode, keys, count=20):
+    """(첫 문제까지 시간, 전체 완료 시간, 받은 문제 수)"""
+    start = time.perf_counter()
+    if mode == "batch":
+        questions, _ = gemini.generate_exam_batch(keys, count=count)
+        elapsed = time.perf_counter() - start
+        return (elapsed if questions else None), elapsed, len(questions or [])
+
+    done = threading.Event()
+    got = [0]
+
+    def _on_late(batch, finished):
+        got[0] += len(batch)
+        if finished:
+            done.set()
+
+    generate = gemini.generate_exam_batch_sharded if mode == "sharded" else gemini.generate_exam_batch_streaming
+    questions, _ = generate(keys, count=count, min_count=1, on_late_results=_on_late)
+    ttfq = time.perf_counter() - start
+    if not questions:
+        return None, ttfq, 0
+    got[0] += len(questions)
+    done.wait(300)
+    return ttfq, time.perf_counter() - start, got[0]
+
+
+def bench_ttfq(modes, trials):
+    results = {}
+    for mode in modes:
+        ttfqs, totals, sizes = [], [], []
+        for _ in range(trials):
+            ttfq, total, size = run_once(mode, KEYS)
+            if ttfq is not None:
+                ttfqs.append(ttfq)
+            totals.append(total)
+            sizes.append(size)
+        results[mode] = {
+            "ttfq": summarize(ttfqs),
+            "batch_total": summarize(totals),
+            "failures": trials - len(ttfqs),
+            "mean_questions": sum(sizes) / len(sizes),
+        }
+    return results
+
+
+def bench_throughput(modes, concurrency, seconds):
+    results = {}
+    for mode in modes:
+        stop = time.perf_counter() + seconds
+        finished = [0]
+        lock = threading.Lock()
+
+        def _worker():
+            while time.perf_counter() < stop:
+                _, _, size = run_once(mode, KEYS)
+                if size:
+                    with lock:
+                        finished[0] += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(_worker)
+        results[mode] = {"batches_per_sec": finished[0] / (time.perf_counter() - start), "concurrency": concurrency}
+    return results
+
+
+def _reset_scheduler():
+    with key_scheduler._lock:
+        key_scheduler._keys.clear()
+        key_scheduler._ranking.clear()
+
+
+def bench_failover(server, trials):
+    """
+    첫 키가 항상 429일 때의 batch 모드 지연 비교
+    cold: 스케줄러 기록이 없어 죽은 키부터 시도 / warm: 쿨다운 중인 키를 호출 없이 건너뜀
+    """
+    _reset_scheduler()
+    server.config.key_overrides["ok-key"] = {"rate_429": 0.0, "rate_malformed": 0.0}
+    healthy = [run_once("batch", ["ok-key"])[1] for _ in range(trials)]
+    server.config.key_overrides["dead-key"] = {"rate_429": 1.0}
+    cold = []
+    for _ in range(trials):
+        _reset_scheduler()  # 등록 순서가 같으면 먼저 넘긴 키부터 시도됨
+        cold.append(run_once("batch", ["dead-key", "ok-key"])[1])
+    warm = [run_once("batch", ["dead-key", "ok-key"])[1] for _ in range(trials)]
+    return {
+        "healthy": summarize(healthy),
+        "first_key_429": summarize(cold),
+        "first_key_cooling_down": summarize(warm),
+        "failover_cost_p50": percentile(cold, 50) - percentile(healthy, 50),
+        "failover_cost_warm_p50": percentile(warm, 50) - percentile(healthy, 50),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=2.0, help="mock generateContent 지연 (초)")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-malformed", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--modes", default="batch,sharded,stream")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, first_token_latency=min(0.3, args.latency),
+                        rate_429=args.rate_429, rate_malformed=args.rate_malformed)
+    server = MockGeminiServer(0, config).start()
+    gemini.API_BASE = server.api_base
+    # mock 서버에는 분당 한도가 없으므로 스케줄러의 키별 분당 한도는 끔 (지연/처리량만 잼)
+    key_scheduler.KEY_RPM_LIMIT = 10 ** 6
+    modes = args.modes.split(",")
+
+    report = {
+        "config": vars(args),
+        "ttfq": bench_ttfq(modes, args.trials),
+        "throughput": bench_throughput(modes, args.concurrency, args.seconds),
+        "failover": bench_failover(server, max(args.trials // 2, 3)),
+        "server_requests": server.stats,
+    }
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'mode':<8} {'ttfq p50':>9} {'p95':>7} {'p99':>7} {'batch p50':>10} {'batches/s':>10} {'failed':>7}")
+    for mode in modes:
+        t = report["ttfq"][mode]
+        print(f"{mode:<8} {t['ttfq']['p50'] or 0:>9.2f} {t['ttfq']['p95'] or 0:>7.2f} {t['ttfq']['p99'] or 0:>7.2f} "
+              f"{t['batch_total']['p50']:>10.2f} {report['throughput'][mode]['batches_per_sec']:>10.2f} {t['failures']:>7}")
+    f = report["failover"]
+    print(f"failover: healthy p50 {f['healthy']['p50']:.2f}s, first key 429 p50 {f['first_key_429']['p50']:.2f}s "
+          f"({f['failover_cost_p50']:+.2f}s), cooling down p50 {f['first_key_cooling_down']['p50']:.2f}s "
+          f"({f['failover_cost_warm_p50']:+.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
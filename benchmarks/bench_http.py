@@ -0,0 +1,110 @@
+"""
+HTTP 연결 재사용 벤치마크: 요청마다 새 연결(requests.get/post) vs 공유 세션(http_client)
+
+    python benchmarks/bench_http.py [--batches 30] [--json]
+
+로컬 mock_gemini 서버를 자체 서명 인증서(openssl 필요)로 HTTPS로 띄워, 배치마다
+모델 목록 조회 + generateContent 두 번의 요청에서 아낀 TCP+TLS 핸드셰이크 시간을 잽니다.
+openssl이 없으면 HTTP로 측정합니다. (TCP 핸드셰이크만 절약)
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import http_client
+from mock_gemini import MockConfig, MockGeminiServer
+
+PROMPT = {"contents": [{"parts": [{"text": "총 20개의 객관식 문제를 출제하여 JSON 리스트로 반환하세요."}]}]}
+
+
+def make_cert(tmp):
+    if not shutil.which("openssl"):
+        return None, None
+    cert = os.path.join(tmp, "cert.pem")
+    key = os.path.join(tmp, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+                    "-days", "1", "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def fresh_batch(base, verify):
+    """기존 방식: 요청마다 새 연결"""
+    requests.get(f"{base}/models?key=bench", timeout=5, verify=verify)
+    r = requests.post(f"{base}/models/gemini-1.5-flash:generateContent?key=bench",
+                      json=PROMPT, timeout=180, verify=verify)
+    r.json()
+
+
+def pooled_batch(base, verify):
+    """공유 세션: keep-alive 연결 재사용"""
+    http_client.get(f"{base}/models?key=bench")
+    r = http_client.post(f"{base}/models/gemini-1.5-flash:generateContent?key=bench", PROMPT)
+    r.json()
+
+
+def measure(label, batch, server, base, verify, batches):
+    before = server.stats.get("connections", 0)
+    times = []
+    for _ in range(batches):
+        start = time.perf_counter()
+        batch(base, verify)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "label": label,
+        "ms_per_batch_p50": times[len(times) // 2] * 1000,
+        "ms_per_batch_mean": sum(times) / len(times) * 1000,
+        "connections": server.stats.get("connections", 0) - before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batches", type=int, default=30)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_cert(tmp)
+        # 생성 지연은 0으로 두어 연결 비용만 남김
+        server = MockGeminiServer(0, MockConfig(latency=0, list_latency=0, jitter=0), cert, key).start()
+        base = server.api_base
+        verify = cert or True
+        http_client.reset_session()
+        session = http_client.get_session()
+        session.verify = verify
+        session.trust_env = False  # REQUESTS_CA_BUNDLE 등 환경변수가 verify를 덮어쓰지 않게
+
+        fresh = measure("fresh connection per request", fresh_batch, server, base, verify, args.batches)
+        pooled = measure("shared session (keep-alive)", pooled_batch, server, base, verify, args.batches)
+        server.shutdown()
+        http_client.reset_session()
+
+    report = {
+        "tls": cert is not None,
+        "batches": args.batches,
+        "fresh": fresh,
+        "pooled": pooled,
+        "saved_ms_per_batch": fresh["ms_per_batch_mean"] - pooled["ms_per_batch_mean"],
+    }
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    for r in (fresh, pooled):
+        print(f"{r['label']:<30} p50 {r['ms_per_batch_p50']:7.2f} ms/batch   mean {r['ms_per_batch_mean']:7.2f}   "
+              f"connections {r['connections']}")
+    print(f"saved per batch ({'TLS' if report['tls'] else 'plain HTTP'}): {report['saved_ms_per_batch']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
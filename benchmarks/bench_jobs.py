@@ -0,0 +1,87 @@
+"""
+생성 작업 큐 벤치마크: 풀이 빈 상태에서 여러 사용자가 동시에 시험을 시작할 때
+
+    python benchmarks/bench_jobs.py [--users 30] [--latency 2] [--json]
+
+로컬 mock_gemini 서버와 임시 DB를 씁니다. 측정 항목:
+    - 시작 버튼 처리 시간 (draw_exam, 스크립트 스레드가 붙잡히는 시간)
+    - 첫 문제를 받기까지의 시간 (1초 간격 대신 50ms 간격으로 poll_exam)
+    - 즉석 생성 LLM 호출 수 (같은 작업을 함께 쓰므로 사용자 수와 무관하게 1이어야 함)
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import database
+import gemini
+import jobs
+import question_pool
+from mock_gemini import MockConfig, MockGeminiServer
+
+KEYS = ["bench-key-1", "bench-key-2", "bench-key-3"]
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    server = MockGeminiServer(0, MockConfig(latency=args.latency, first_token_latency=min(0.3, args.latency))).start()
+    gemini.API_BASE = server.api_base
+    # 즉석 생성만 보려고 보충은 끔
+    question_pool.POOL_LOW_WATER = 0
+    question_pool.set_cloud_keys(KEYS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench_jobs.db")
+        database.init_db()
+
+        def _start(i):
+            session = {"questions_list": [], "current_idx": 0, "generating": False}
+            started = time.perf_counter()
+            question_pool.draw_exam(f"user-{i}", KEYS, count=20, exam_session=session)
+            submit_ms = (time.perf_counter() - started) * 1000
+            while session["generating"] and not session["questions_list"]:
+                time.sleep(0.05)
+                question_pool.poll_exam(f"user-{i}", session)
+            return submit_ms, time.perf_counter() - started, session.get("job_id")
+
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            results = list(pool.map(_start, range(args.users)))
+        jobs.wait_idle(120)
+
+    server.shutdown()
+    submit = [r[0] for r in results]
+    first = [r[1] for r in results]
+    report = {
+        "config": vars(args),
+        "submit_ms_p50": _percentile(submit, 0.5),
+        "submit_ms_max": max(submit),
+        "first_question_s_p50": _percentile(first, 0.5),
+        "first_question_s_max": max(first),
+        "distinct_jobs": len({r[2] for r in results}),
+        "inline_llm_calls": server.stats.get("streamGenerateContent", 0),
+    }
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    for k, v in report.items():
+        if k != "config":
+            print(f"{k:<22} {v:.3f}" if isinstance(v, float) else f"{k:<22} {v}")
+
+
+if __name__ == "__main__":
+    main()
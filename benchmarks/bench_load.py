@@ -0,0 +1,269 @@
+"""
+동시 사용자 부하 테스트: 한 app.py 프로세스가 몇 명까지 버티는지 (Streamlit AppTest, Gemini 대역 서버)
+
+    python benchmarks/bench_load.py [--users 1,5,10,20] [--questions 5] [--wrong-ratio 0.4]
+                                    [--think 0] [--llm-latency 1.0] [--json] [--out result.json]
+
+단계마다 users명이 동시에 (사용자마다 스레드 하나와 AppTest 하나) 아래 흐름을 따라갑니다.
+실제 서버처럼 모든 세션이 한 프로세스, 한 usage_data.db(임시 폴더)를 함께 씁니다.
+
+    홈 → 🚀 시작 → (문제가 올 때까지 대기) → questions문제 풀기(보기 선택/제출/다음) → 📓 오답노트 → 검색
+
+단계별 결과:
+    rerun_ms                rerun 한 번의 왕복 시간, 종류별/전체 p50, p95, p99, max
+                            (AppTest의 화면 파싱 포함, 문제 대기 rerun은 앱이 1초 쉬므로 전체에서 제외)
+    script_ms               같은 rerun에서 앱 스크립트만 실행된 시간 (앱의 run_timings 기록)
+    db_locked_errors        "database is locked" 횟수 (DB 계층 카운터 + 화면에 뜬 예외)
+    exceptions              그 밖에 화면에 뜬 예외 수
+    rss_kb_per_session      세션(AppTest)을 모두 살려 둔 채 늘어난 프로세스 메모리 / 사용자 수
+    session_state_bytes     사용자 세션 상태를 pickle한 크기 (p50, max)
+    reruns_per_sec          처리량 (전체 rerun 수 / 경과 시간)
+단계 전에 한 사용자를 먼저 돌려 import와 문제 풀 채우기를 끝내 둡니다 (결과에서 제외).
+마지막에 처리량이 가장 높았던 단계를 ceiling으로 적습니다. 실행 간 비교는 --out의 JSON을 diff합니다.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import pickle
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from streamlit.testing.v1 import AppTest
+from mock_gemini import MockConfig, MockGeminiServer
+
+APP = os.path.join(ROOT, "app.py")
+WAIT_STEP = "exam_wait"
+
+
+def _share_server_state():
+    """
+    AppTest는 run마다 가짜 Runtime과 설정(global.appTest)을 전역에 걸었다가 되돌리고,
+    스크립트도 run마다 새 ScriptCache로 다시 컴파일합니다. 여러 스레드에서 동시에 돌리면 다른 세션이
+    실행 중일 때 이것들이 풀리므로, 실제 서버처럼 모든 세션이 Runtime/설정/ScriptCache 하나를 공유하게 함
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner, util
+    last = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+        if not last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last[0]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(last))
+    script_cache = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+    config.get_option = util.build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+
+def _rss_kb():
+    """현재 RSS (리눅스 /proc, 없으면 최대 RSS)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(len(values) * p))]
+    return {"count": len(values), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": values[-1]}
+
+
+def _state_bytes(at):
+    size = 0
+    for key, value in at.session_state.items():
+        try:
+            size += len(pickle.dumps(value))
+        except Exception:
+            pass  # 위젯 객체 등 pickle 안 되는 값은 제외
+    return size
+
+
+def _button(at, label):
+    for b in at.button:
+        if b.label.startswith(label):
+            return b
+    raise LookupError(f"button not found: {label}")
+
+
+class VirtualUser:
+    """브라우저 탭 하나: AppTest 하나로 정해진 흐름을 따라가며 rerun마다 시간을 기록"""
+
+    def __init__(self, n, args):
+        self.rng = random.Random(n)
+        self.args = args
+        self.user_id = str(uuid.uuid4())
+        self.at = AppTest.from_file(APP, default_timeout=60)
+        self.at.session_state["user_id"] = self.user_id
+        self.timings = []       # (rerun 종류, 왕복 ms, 앱 스크립트 ms)
+        self.errors = []        # 화면에 뜬 예외 메시지
+        self.failed = None      # 흐름을 끝내지 못한 이유
+        self.current = None     # 진행 중인 rerun 종류
+
+    def _step(self, name, action):
+        self.current = name
+        self.at.session_state["run_timings"] = []  # 앱이 rerun마다 남기는 스크립트 실행 시간
+        started = time.perf_counter()
+        action()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        runs = self.at.session_state["run_timings"] if "run_timings" in self.at.session_state else []
+        script_ms = sum(t["ms"] for t in runs if t["scope"] == "script") or sum(t["ms"] for t in runs)
+        self.timings.append((name, elapsed_ms, script_ms))
+        self.errors.extend(str(e.value) for e in self.at.exception)
+        if self.args.think:
+            time.sleep(self.rng.uniform(0, 2 * self.args.think))
+
+    def run(self):
+        at = self.at
+        try:
+            self._step("home", at.run)
+            self._step("start", _button(at, "🚀").click().run)
+            deadline = time.time() + self.args.wait_timeout
+            while not at.radio and time.time() < deadline:
+                self._step(WAIT_STEP, at.run)
+            if not at.radio:
+                self.failed = "no question arrived"
+                return
+            for _ in range(self.args.questions):
+                self.current = "pick"
+                if not at.radio:
+                    break  # 받은 문제를 다 풂
+                choice = 1 if self.rng.random() < self.args.wrong_ratio else 0  # 대역 서버 문제의 정답 위치와 무관하게 섞임
+                self._step("pick", at.radio[0].set_value(at.radio[0].options[choice]).run)
+                self._step("submit", _button(at, "✅ 정답 제출").click().run)
+                self._step("next", _button(at, "다음 문제").click().run)
+            self._step("review", _button(at, "📓 오답노트").click().run)
+            self._step("search", at.text_input(key="review_search").input("물리치료").run)
+        except Exception as e:
+            self.failed = f"{self.current}: {type(e).__name__}: {e}"
+
+
+def run_stage(users, args):
+    import metrics
+    metrics.reset()
+    gc.collect()
+    rss_before = _rss_kb()
+    vus = [VirtualUser(n, args) for n in range(users)]
+    threads = [threading.Thread(target=vu.run, name=f"vu-{n}") for n, vu in enumerate(vus)]
+    started = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    rss_after = _rss_kb()  # 세션이 아직 살아 있는 상태
+
+    by_step, script_by_step = {}, {}
+    for vu in vus:
+        for name, ms, script_ms in vu.timings:
+            by_step.setdefault(name, []).append(ms)
+            script_by_step.setdefault(name, []).append(script_ms)
+    active = lambda steps: [ms for name, values in steps.items() if name != WAIT_STEP for ms in values]
+    errors = [e for vu in vus for e in vu.errors]
+    locked_in_db = sum(v for (name, _), v in metrics._counters.items() if name == "db_locked_errors_total")
+    locked_on_screen = sum("locked" in e for e in errors)
+    reruns = sum(len(values) for values in by_step.values())
+    return {
+        "users": users,
+        "seconds": elapsed,
+        "reruns": reruns,
+        "reruns_per_sec": reruns / elapsed,
+        "completed_users": sum(vu.failed is None for vu in vus),
+        "failures": sorted({vu.failed for vu in vus if vu.failed}),
+        "rerun_ms": {"all": _percentiles(active(by_step)), **{name: _percentiles(v) for name, v in sorted(by_step.items())}},
+        "script_ms": {"all": _percentiles(active(script_by_step)),
+                      **{name: _percentiles(v) for name, v in sorted(script_by_step.items())}},
+        "db_locked_errors": locked_in_db + locked_on_screen,
+        "exceptions": len(errors) - locked_on_screen,
+        "exception_samples": sorted(set(errors))[:3],
+        "db_call_errors": sum(v for (name, _), v in metrics._counters.items() if name == "db_call_errors_total"),
+        "rss_kb_per_session": (rss_after - rss_before) / users,
+        "session_state_bytes": _percentiles([_state_bytes(vu.at) for vu in vus]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", default="1,5,10,20", help="단계별 동시 사용자 수 (쉼표로 구분)")
+    parser.add_argument("--questions", type=int, default=5, help="사용자마다 풀 문제 수")
+    parser.add_argument("--wrong-ratio", type=float, default=0.4)
+    parser.add_argument("--think", type=float, default=0.0, help="rerun 사이 평균 대기 초 (0이면 쉬지 않고 최대 부하)")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="대역 서버 응답 시간 (초)")
+    parser.add_argument("--wait-timeout", type=float, default=60, help="첫 문제를 기다리는 최대 초")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    parser.add_argument("--out", help="결과 JSON을 저장할 파일")
+    args = parser.parse_args()
+
+    os.environ["GEMINI_API_KEY"] = "bench-fake-key"
+    os.environ.pop("GEMINI_API_KEYS", None)
+    os.environ.pop("ACCESS_PASSWORD", None)
+    os.environ.pop("PT_SESSION_STORE", None)
+    stages = [int(n) for n in args.users.split(",")]
+    _share_server_state()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # usage_data.db를 임시 폴더에 만듦
+        import gemini
+        import metrics
+        server = MockGeminiServer(0, MockConfig(latency=args.llm_latency, first_token_latency=args.llm_latency / 4)).start()
+        gemini.API_BASE = server.api_base
+        metrics.enable(True)
+        run_stage(1, args)  # 준비 (import, 첫 생성으로 문제 풀 채우기)
+        results = [run_stage(users, args) for users in stages]
+        import answer_log
+        answer_log.flush()
+        llm_calls = dict(server.stats)
+        server.shutdown()
+
+    best = max(results, key=lambda r: r["reruns_per_sec"])
+    report = {
+        "config": vars(args),
+        "stages": results,
+        "llm_calls": llm_calls,
+        "ceiling": {"users": best["users"], "reruns_per_sec": best["reruns_per_sec"],
+                    "p95_ms": best["rerun_ms"]["all"]["p95"] if best["rerun_ms"]["all"] else None},
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"{'users':>5} {'done':>5} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'script p95':>11} "
+          f"{'locked':>7} {'exc':>4} {'KB/sess':>8} {'state B':>8}")
+    empty = {"p50": 0, "p95": 0, "p99": 0}
+    for r in results:
+        lat = r["rerun_ms"]["all"] or empty
+        script = r["script_ms"]["all"] or empty
+        print(f"{r['users']:>5} {r['completed_users']:>5} {r['reruns_per_sec']:>9.1f} {lat['p50']:>8.1f} {lat['p95']:>8.1f} "
+              f"{lat['p99']:>8.1f} {script['p95']:>11.1f} {r['db_locked_errors']:>7} {r['exceptions']:>4} "
+              f"{r['rss_kb_per_session']:>8.0f} {r['session_state_bytes']['p50']:>8}")
+        for failure in r["failures"]:
+            print(f"      failed: {failure}")
+    print(f"ceiling: {best['reruns_per_sec']:.1f} reruns/s at {best['users']} users   LLM calls: {llm_calls}")
+
+
+if __name__ == "__main__":
+    main()
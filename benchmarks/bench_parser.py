@@ -0,0 +1,227 @@
+"""
+question_parser 퍼즈/처리량 벤치마크 (네트워크 없음)
+
+    python benchmarks/bench_parser.py [--cases 2000] [--seed 7] [--seconds 2] [--json]
+
+퍼즈: fixtures/questions.json으로 만든 20문제 응답을 무작위로 망가뜨려(잘라내기, 따옴표/쉼표/괄호 삭제,
+잡음 삽입, 끝 쉼표, 1부터 세는 정답, 보기 개수 오류 등) 다음을 확인합니다.
+    - 어떤 입력에도 예외가 나지 않음
+    - 나온 문제는 모두 스키마를 만족 (보기 5개, 정답 0~4)
+    - 한 군데만 망가진 응답에서 살린 문제 수 (기존 방식은 0개)
+처리량: 깨끗한 응답 전체 파싱, 스트리밍 조각 파싱의 MB/s와 문제/s
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import question_parser
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "questions.json")
+BATCH = 20
+
+
+def load_fixture():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def make_batch(rng, fixture):
+    items = []
+    for i in range(BATCH):
+        q = dict(rng.choice(fixture))
+        q["question"] = f"{i + 1}. {q['question']}"
+        items.append(q)
+    return items
+
+
+def render(items, rng):
+    text = json.dumps(items, ensure_ascii=False, indent=rng.choice([None, 1, 2]))
+    return rng.choice(["", "```json\n", "다음은 문제입니다.\n"]) + text + rng.choice(["", "\n```", "\n이상입니다."])
+
+
+def _nth(text, token, rng):
+    positions = [i for i in range(len(text)) if text.startswith(token, i)]
+    return rng.choice(positions) if positions else None
+
+
+def legacy_parse(text):
+    """기존 방식: 코드펜스 제거 후 첫 [ ~ 마지막 ] 를 통째로 json.loads"""
+    text = text.replace("```json", "").replace("```", "").strip()
+    start = text.find("["); end = text.rfind("]")
+    if start == -1 or end == -1:
+        return []
+    try:
+        return [q for q in json.loads(text[start:end + 1]) if isinstance(q, dict)]
+    except ValueError:
+        return []
+
+
+# 각 변형: (이름, 함수(items, rng) -> (텍스트, 최소로 살려야 할 문제 수 또는 None))
+def m_clean(items, rng):
+    return render(items, rng), BATCH
+
+
+def m_one_based(items, rng):
+    # 1부터 센다는 근거(정답 5번)가 하나는 있어야 추론 가능
+    items[0]["answer"] = question_parser.OPTION_COUNT - 1
+    shifted = [dict(q, answer=q["answer"] + 1) for q in items]
+    return render(shifted, rng), BATCH
+
+
+def m_drop_quote(items, rng):
+    text = render(items, rng)
+    i = _nth(text, '"explanation"', rng)
+    return text[:i] + text[i + 1:], BATCH - 2
+
+
+def m_drop_comma(items, rng):
+    text = render(items, rng)
+    i = _nth(text, '",', rng)
+    return text[:i + 1] + text[i + 2:], BATCH - 2
+
+
+def m_drop_brace(items, rng):
+    text = render(items, rng)
+    i = _nth(text, '}', rng)
+    return text[:i] + text[i + 1:], BATCH - 2
+
+
+def m_trailing_comma(items, rng):
+    text = render(items, rng)
+    i = _nth(text, '"explanation"', rng)
+    j = text.find('}', i)
+    return text[:j] + ',' + text[j:], BATCH
+
+
+def m_truncate(items, rng):
+    text = render(items, rng)
+    cut = rng.randrange(len(text))
+    return text[:cut], None
+
+
+def m_wrong_options(items, rng):
+    broken = [dict(q) for q in items]
+    k = rng.randrange(BATCH)
+    broken[k]["options"] = broken[k]["options"][:rng.choice([0, 3, 4])]
+    return render(broken, rng), BATCH - 1
+
+
+def m_out_of_range(items, rng):
+    broken = [dict(q) for q in items]
+    k = rng.randrange(BATCH)
+    broken[k]["answer"] = rng.choice([-1, 9, "모름", None])
+    return render(broken, rng), BATCH - 1
+
+
+def m_garbage(items, rng):
+    text = render(items, rng)
+    for _ in range(rng.randint(1, 5)):
+        i = rng.randrange(len(text))
+        text = text[:i] + rng.choice(['{', '}', '"', '\\', '[', ']', ',', '\n', '①']) + text[i:]
+    return text, None
+
+
+def m_random_bytes(items, rng):
+    return ''.join(chr(rng.randrange(32, 0xAC00 + 200)) for _ in range(rng.randint(0, 400))), None
+
+
+MUTATORS = [m_clean, m_one_based, m_drop_quote, m_drop_comma, m_drop_brace, m_trailing_comma,
+            m_truncate, m_wrong_options, m_out_of_range, m_garbage, m_random_bytes]
+
+
+def is_valid(q):
+    return (isinstance(q["question"], str) and q["question"]
+            and len(q["options"]) == question_parser.OPTION_COUNT
+            and isinstance(q["answer"], int) and 0 <= q["answer"] < question_parser.OPTION_COUNT)
+
+
+def fuzz(cases, seed):
+    rng = random.Random(seed)
+    fixture = load_fixture()
+    report = {}
+    for _ in range(cases):
+        mutate = rng.choice(MUTATORS)
+        items = make_batch(rng, fixture)
+        text, expected = mutate(items, rng)
+        row = report.setdefault(mutate.__name__[2:], {
+            "cases": 0, "exceptions": 0, "invalid_output": 0, "under_expected": 0,
+            "wrong_answer": 0, "salvaged": 0, "legacy_salvaged": 0})
+        row["cases"] += 1
+        try:
+            questions, _ = question_parser.parse_questions(text)
+        except Exception:
+            row["exceptions"] += 1
+            continue
+        row["salvaged"] += len(questions)
+        row["legacy_salvaged"] += len(legacy_parse(text))
+        row["invalid_output"] += sum(1 for q in questions if not is_valid(q))
+        if expected is not None and len(questions) < expected:
+            row["under_expected"] += 1
+        # 번호 체계가 바뀌어도 정답 보기는 원본과 같아야 함 (잡음으로 문제/보기가 바뀐 것은 제외)
+        originals = {q["question"]: q for q in items}
+        row["wrong_answer"] += sum(1 for q in questions
+                                   if q["question"] in originals and q["options"] == originals[q["question"]]["options"]
+                                   and q["answer"] != originals[q["question"]]["answer"])
+    return report
+
+
+def throughput(seconds, seed):
+    rng = random.Random(seed)
+    fixture = load_fixture()
+    texts = [render(make_batch(rng, fixture), rng) for _ in range(50)]
+    size = sum(len(t.encode("utf-8")) for t in texts)
+    results = {}
+
+    def _run(name, parse_one):
+        n_bytes = n_questions = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            for t in texts:
+                n_questions += parse_one(t)
+            n_bytes += size
+        elapsed = time.perf_counter() - start
+        results[name] = {"mb_per_sec": n_bytes / elapsed / 1e6, "questions_per_sec": n_questions / elapsed}
+
+    def _stream(t):
+        chunks = [t[i:i + 120] for i in range(0, len(t), 120)]
+        state = {}
+        return sum(1 for item in question_parser.iter_json_objects(chunks)
+                   if question_parser.validate_question(item, base_state=state))
+
+    _run("legacy_json_loads", lambda t: len(legacy_parse(t)))
+    _run("parse_questions", lambda t: len(question_parser.parse_questions(t)[0]))
+    _run("stream_120_chars", _stream)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--seconds", type=float, default=2)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    report = {"fuzz": fuzz(args.cases, args.seed), "throughput": throughput(args.seconds, args.seed)}
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'mutation':<15} {'cases':>6} {'exc':>4} {'invalid':>8} {'short':>6} {'wrong':>6} "
+              f"{'salvaged/case':>14} {'legacy':>7}")
+        for name, row in report["fuzz"].items():
+            print(f"{name:<15} {row['cases']:>6} {row['exceptions']:>4} {row['invalid_output']:>8} "
+                  f"{row['under_expected']:>6} {row['wrong_answer']:>6} "
+                  f"{row['salvaged'] / row['cases']:>14.1f} {row['legacy_salvaged'] / row['cases']:>7.1f}")
+        for name, row in report["throughput"].items():
+            print(f"{name:<18} {row['mb_per_sec']:>7.2f} MB/s  {row['questions_per_sec']:>9.0f} questions/s")
+
+    failed = sum(row["exceptions"] + row["invalid_output"] + row["wrong_answer"] for row in report["fuzz"].values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+문제 풀(생성 캐시) 버스트 벤치마크: 많은 사용자가 한꺼번에 시험을 시작할 때 LLM 호출이 몇 번 드는지
+
+    python benchmarks/bench_pool.py [--users 50] [--rounds 3] [--cache-max 5000] [--json]
+
+로컬 mock_gemini 서버와 임시 DB를 씁니다. 먼저 풀을 채워두고(warm-up), 라운드마다 users명이
+동시에 draw_exam을 호출합니다. 각 사용자는 라운드마다 안 본 문제 20개를 새로 받아야 합니다.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import database
+import gemini
+import jobs
+import question_pool
+from mock_gemini import MockConfig, MockGeminiServer
+
+KEYS = ["bench-key-1", "bench-key-2", "bench-key-3"]
+
+
+def _llm_calls(server):
+    return server.stats.get("generateContent", 0) + server.stats.get("streamGenerateContent", 0)
+
+
+def _wait_refill(timeout=60):
+    jobs.wait_idle(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--cache-max", type=int, default=database.QUESTION_CACHE_MAX)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    server = MockGeminiServer(0, MockConfig(latency=args.latency, first_token_latency=min(0.05, args.latency))).start()
+    gemini.API_BASE = server.api_base
+    database.QUESTION_CACHE_MAX = args.cache_max
+    # 보충 작업이 버스트 사이에 충분히 채우도록 목표치를 라운드 수에 맞춤
+    question_pool.POOL_LOW_WATER = 20 * args.rounds
+
+    report = {"config": vars(args), "rounds": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench_pool.db")
+        database.init_db()
+        question_pool.set_cloud_keys(KEYS)
+        question_pool.request_refill()
+        _wait_refill()
+
+        for r in range(args.rounds):
+            before = _llm_calls(server)
+
+            def _start(i):
+                session = {"questions_list": [], "generating": False}
+                questions, _ = question_pool.draw_exam(f"user-{i}", KEYS, count=20, exam_session=session)
+                return len(questions or [])
+
+            started = time.perf_counter()
+            inline_before = server.stats.get("streamGenerateContent", 0)  # 즉석 생성은 스트리밍 모드
+            with ThreadPoolExecutor(max_workers=min(args.users, 32)) as pool:
+                sizes = list(pool.map(_start, range(args.users)))
+            elapsed = time.perf_counter() - started
+            inline = server.stats.get("streamGenerateContent", 0) - inline_before
+            _wait_refill()
+            report["rounds"].append({
+                "round": r + 1,
+                "starts": args.users,
+                "inline_llm_starts": inline,
+                "zero_llm_start_ratio": 1 - inline / args.users,
+                "llm_calls_including_refill": _llm_calls(server) - before,
+                "mean_questions": sum(sizes) / len(sizes),
+                "burst_seconds": elapsed,
+                "pool_size": database.count_pool_questions(),
+            })
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"{'round':>5} {'starts':>7} {'inline':>7} {'zero-LLM':>9} {'llm calls':>10} {'burst s':>8} {'pool':>6}")
+    for row in report["rounds"]:
+        print(f"{row['round']:>5} {row['starts']:>7} {row['inline_llm_starts']:>7} {row['zero_llm_start_ratio']:>9.0%} "
+              f"{row['llm_calls_including_refill']:>10} {row['burst_seconds']:>8.2f} {row['pool_size']:>6}")
+
+
+if __name__ == "__main__":
+    main()
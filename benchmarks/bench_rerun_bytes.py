@@ -0,0 +1,110 @@
+"""
+rerun 한 번에 서버가 브라우저로 보내는 화면 요소 바이트 측정 (Streamlit AppTest 사용)
+
+    python benchmarks/bench_rerun_bytes.py [--app app.py] [--json]
+
+각 rerun마다 모든 요소의 delta(proto)가 다시 전송되므로, 요소 proto 크기의 합을 rerun당 전송량으로 봅니다.
+이전 버전과 비교하려면 옛 app.py를 꺼내 --app으로 넘깁니다.
+
+    git show <rev>:app.py > /tmp/app_old.py && python benchmarks/bench_rerun_bytes.py --app /tmp/app_old.py
+
+시나리오: 홈 화면, 시험 화면(보기 선택 → 제출 → 다음 문제), 오답노트 화면
+(키는 가짜 키, DB는 임시 폴더에 만들어 실제 데이터에 영향 없음)
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from streamlit.testing.v1 import AppTest
+
+FIXTURE = os.path.join(ROOT, "benchmarks", "fixtures", "questions.json")
+
+
+def _walk(node):
+    proto = getattr(node, "proto", None)
+    if proto is not None and hasattr(proto, "ByteSize"):
+        yield type(node).__name__, proto
+    children = getattr(node, "children", None) or {}
+    for child in children.values():
+        yield from _walk(child)
+
+
+def measure(at):
+    """현재 화면의 (전체 바이트, <style>/<link> 등 스타일 요소 바이트, 요소 수)"""
+    total = style = count = 0
+    for name, proto in _walk(at._tree):
+        size = proto.ByteSize()
+        total += size
+        count += 1
+        if name == "Markdown" and ("<style" in proto.body or "<link" in proto.body):
+            style += size
+    return {"bytes": total, "style_bytes": style, "elements": count}
+
+
+def run_scenarios(app_path):
+    with open(FIXTURE, encoding="utf-8") as f:
+        questions = json.load(f)[:5]
+    results = {}
+
+    def _new():
+        at = AppTest.from_file(app_path, default_timeout=30)
+        at.session_state["user_id"] = "bench-user"
+        return at
+
+    at = _new()
+    at.run()
+    results["home"] = measure(at)
+
+    at = _new()
+    at.session_state["app_mode"] = "exam"
+    at.session_state["exam_session"] = {
+        "questions_list": questions, "current_idx": 0, "correct_count": 0,
+        "is_submitted": False, "user_choice": None, "generating": False,
+    }
+    at.run()
+    results["exam_question"] = measure(at)
+    at.radio[0].set_value(1).run()
+    results["exam_pick_option"] = measure(at)
+    [b for b in at.button if b.label == "✅ 정답 제출"][0].click().run()
+    results["exam_submitted"] = measure(at)
+    [b for b in at.button if b.label == "다음 문제 ➡️"][0].click().run()
+    results["exam_next"] = measure(at)
+
+    at = _new()
+    at.session_state["app_mode"] = "review"
+    at.run()
+    results["review"] = measure(at)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"))
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    app_path = os.path.abspath(args.app)
+    os.environ.setdefault("GEMINI_API_KEY", "bench-fake-key")
+    os.environ.pop("ACCESS_PASSWORD", None)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # usage_data.db를 임시 폴더에 만듦
+        import database
+        database.init_db()
+        for i in range(20):
+            database.add_review_note("bench-user", "물리치료 기초", f"벤치 문제 {i}", ["1", "2", "3", "4", "5"], 0, "해설")
+        results = run_scenarios(app_path)
+
+    if args.json:
+        print(json.dumps({"app": app_path, "reruns": results}, ensure_ascii=False, indent=2))
+        return
+    print(f"{'rerun':<18} {'bytes':>8} {'style':>8} {'elements':>9}")
+    for name, row in results.items():
+        print(f"{name:<18} {row['bytes']:>8} {row['style_bytes']:>8} {row['elements']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+복습 대기열 벤치마크: 노트가 많아도 "지금 복습할 노트" 조회 비용이 일정한지
+
+    python benchmarks/bench_review_due.py [--notes 100000] [--due-ratio 0.05] [--repeat 200]
+
+임시 DB에 한 사용자의 오답노트를 notes개 만들고 (due-ratio 비율만 기한 도래, 나머지는 미래로 예약),
+get_due_review_notes(20개)와 예전 방식(사용자 노트 전체 읽기)의 호출당 시간을 비교합니다.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+USER = "bench-user"
+
+
+def seed(notes, due_ratio):
+    rng = random.Random(7)
+    options = json.dumps(["1", "2", "3", "4", "5"], ensure_ascii=False)
+    rows = []
+    for i in range(notes):
+        offset = f"-{rng.randint(0, 30)} days" if rng.random() < due_ratio else f"+{rng.randint(1, 180)} days"
+        rows.append((USER, "물리치료 기초", f"벤치 문제 {i}", options, 0, "해설", f"bench-{i}", offset))
+    with database._connection() as conn:
+        conn.executemany('''
+            INSERT INTO review_notes (user_id, category, question, options, answer, explanation, content_hash, due_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', ?))
+        ''', rows)
+
+
+def legacy_all_notes(user_id):
+    with database._connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT * FROM review_notes WHERE user_id = ? ORDER BY timestamp DESC', (user_id,))
+        return c.fetchall()
+
+
+def per_call_ms(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--due-ratio", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+        seed(args.notes, args.due_ratio)
+
+        with database._connection() as conn:
+            plan = conn.execute('''
+                EXPLAIN QUERY PLAN SELECT id FROM review_notes
+                WHERE user_id = ? AND due_at <= CURRENT_TIMESTAMP ORDER BY due_at, id LIMIT 20
+            ''', (USER,)).fetchall()
+        print("plan:", " / ".join(row[-1] for row in plan))
+
+        due = per_call_ms(lambda: database.get_due_review_notes(USER, limit=20), args.repeat)
+        count = per_call_ms(lambda: database.count_due_review_notes(USER), args.repeat)
+        legacy = per_call_ms(lambda: legacy_all_notes(USER), max(1, args.repeat // 20))
+        print(f"notes: {args.notes}  due now: ~{int(args.notes * args.due_ratio)}")
+        print(f"due queue (20)      {due:>9.3f} ms/call")
+        print(f"due count (cap 100) {count:>9.3f} ms/call")
+        print(f"legacy full list    {legacy:>9.3f} ms/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+오답노트 전문 검색 벤치마크 (FTS5 trigram 색인)
+
+    python benchmarks/bench_search.py [--notes 100000] [--others 100000] [--repeat 50] [--json]
+
+임시 DB에 한 사용자의 오답노트 notes개와 다른 사용자 1000명의 노트 others개를 만들고
+(녹화된 문제 25개를 틀로 삼아 드문 용어를 섞음)
+검색어 종류별로 search_review_notes 첫 페이지 / 다음 페이지의 호출당 시간과 일치 건수를 잽니다.
+비교용으로 색인 없이 LIKE로 훑는 시간도 함께 출력합니다.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import database
+
+USER = "bench-user"
+FIXTURE = os.path.join(ROOT, "benchmarks", "fixtures", "questions.json")
+SYLLABLES = "가나다라마바사아자차카타파하거너더러머버서어저처커터퍼허고노도로모보소오조초코토포호"
+
+
+def _vocabulary(rng, size=5000):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 4))))
+    return sorted(words)
+
+
+def seed(notes, others):
+    rng = random.Random(11)
+    with open(FIXTURE, encoding="utf-8") as f:
+        templates = json.load(f)
+    vocab = _vocabulary(rng)
+    weights = [1 / (i + 1) for i in range(len(vocab))]  # 자주 나오는 용어와 드문 용어 (Zipf)
+    rows = []
+    for i in range(notes + others):
+        t = templates[i % len(templates)]
+        terms = rng.choices(vocab, weights, k=2)
+        question = f"{t['question']} ({terms[0]} 관련 {i})"
+        explanation = f"{t['explanation']} 참고: {terms[1]}"
+        user = USER if i < notes else f"other-user-{i % 1000}"
+        rows.append((user, t["category"], question, json.dumps(t["options"], ensure_ascii=False), t["answer"],
+                     explanation, f"bench-{i}"))
+    started = time.perf_counter()
+    with database._connection() as conn:
+        conn.executemany('''
+            INSERT INTO review_notes (user_id, category, question, options, answer, explanation, content_hash, due_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', rows)
+    return vocab, time.perf_counter() - started
+
+
+def per_call_ms(func, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return times[len(times) // 2], times[min(len(times) - 1, int(len(times) * 0.95))]
+
+
+def count_matches(text):
+    query = database._match_query(text)
+    with database._connection() as conn:
+        if query:
+            match = database._review_match(conn.cursor(), USER, query)
+            return conn.execute('SELECT COUNT(*) FROM review_notes_fts WHERE review_notes_fts MATCH ?', (match,)).fetchone()[0]
+        pattern = database._like_pattern(text)
+        return conn.execute("SELECT COUNT(*) FROM review_notes WHERE user_id = ?1 AND (question LIKE ?2 ESCAPE '\\' OR explanation LIKE ?2 ESCAPE '\\')",
+                            (USER, pattern)).fetchone()[0]
+
+
+def legacy_like(text):
+    with database._connection() as conn:
+        return conn.execute('''
+            SELECT id FROM review_notes WHERE user_id = ? AND (question LIKE ? OR options LIKE ? OR explanation LIKE ?)
+            LIMIT 11
+        ''', (USER, f"%{text}%", f"%{text}%", f"%{text}%")).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--others", type=int, default=100000, help="다른 사용자들의 노트 수")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    report = {"config": vars(args), "queries": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+        vocab, seed_seconds = seed(args.notes, args.others)
+        report["insert_rows_per_sec"] = (args.notes + args.others) / seed_seconds  # 트리거 색인 갱신 포함
+
+        queries = {
+            "rare term": vocab[-1],
+            "common term": vocab[0],
+            "template word": "삼각근",
+            "two words": "견관절 외전",
+            "no match": "존재하지않는말",
+            "2-char (scan)": "외전",
+        }
+        for label, text in queries.items():
+            first = per_call_ms(lambda: database.search_review_notes(USER, text, 0), args.repeat)
+            second = per_call_ms(lambda: database.search_review_notes(USER, text, 1), args.repeat)
+            legacy = per_call_ms(lambda: legacy_like(text), max(3, args.repeat // 10))
+            report["queries"].append({
+                "label": label, "text": text, "matches": count_matches(text),
+                "page1_p50_ms": first[0], "page1_p95_ms": first[1], "page2_p50_ms": second[0],
+                "like_scan_p50_ms": legacy[0],
+            })
+
+        # 노트가 적은 사용자: 비용이 전체 표가 아니라 그 사용자의 노트 수를 따라가는지
+        small_user = "other-user-17"
+        report["small_user_common_p50_ms"] = per_call_ms(
+            lambda: database.search_review_notes(small_user, vocab[0], 0), args.repeat)[0]
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"notes: {args.notes} (+{args.others} of other users)  insert with index triggers: "
+          f"{report['insert_rows_per_sec']:.0f} rows/s")
+    print(f"{'query':<15} {'matches':>8} {'p1 p50':>8} {'p1 p95':>8} {'p2 p50':>8} {'LIKE p50':>9}")
+    for row in report["queries"]:
+        print(f"{row['label']:<15} {row['matches']:>8} {row['page1_p50_ms']:>8.2f} {row['page1_p95_ms']:>8.2f} "
+              f"{row['page2_p50_ms']:>8.2f} {row['like_scan_p50_ms']:>9.2f}")
+    print(f"common term for a user with {args.others // 1000} notes: p50 {report['small_user_common_p50_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+구조화 출력(responseSchema + 짧은 프롬프트) vs 예전 자유 형식 프롬프트: 문제당 토큰/시간
+
+    python benchmarks/bench_tokens.py [--requests 10] [--count 20] [--model models/gemini-2.0-flash]
+                                      [--tokens-per-sec 200] [--json]
+
+로컬 mock_gemini 서버를 씁니다. 대역 서버는 responseMimeType이 JSON이면 코드블록/들여쓰기 없는 JSON을,
+아니면 코드블록에 감싼 들여쓰기 JSON을 돌려주고, 응답 시간은 출력 토큰 수 / tokens-per-sec로 정합니다.
+토큰 수는 각 응답의 usageMetadata(gemini.recent_usage)에서 읽습니다.
+(대역 서버의 토큰 수는 글자 수 / 2 추정치이므로 실제 모델과의 비율 비교용)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import gemini
+import metrics
+from mock_gemini import MockConfig, MockGeminiServer
+
+KEY = "bench-key-1"
+
+
+def run(structured, args):
+    gemini.STRUCTURED_OUTPUT = structured
+    gemini._usage_history.clear()
+    metrics.reset()
+    questions = 0
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        got, _ = gemini.generate_exam_batch([KEY], count=args.count)
+        questions += len(got or [])
+    elapsed = time.perf_counter() - started
+    records = [r for r in gemini.recent_usage() if r["status"] == 200]
+    total = lambda field: sum(r[field] or 0 for r in records)
+    parse = metrics._histograms.get(("question_parse_seconds", ()), {"sum": 0.0})["sum"]
+    return {
+        "questions": questions,
+        "prompt_tokens_per_request": total("prompt_tokens") / max(len(records), 1),
+        "output_tokens_per_question": total("output_tokens") / max(questions, 1),
+        "total_tokens_per_question": total("total_tokens") / max(questions, 1),
+        "seconds_per_question": elapsed / max(questions, 1),
+        "parse_ms_per_question": parse * 1000 / max(questions, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--model", default="models/gemini-2.0-flash",
+                        help="예전 방식에서 JSON 모드가 꺼지는 모델 (1.5가 아닌 모델)")
+    parser.add_argument("--tokens-per-sec", type=float, default=200)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    server = MockGeminiServer(0, MockConfig(first_token_latency=0.2, jitter=0, tokens_per_sec=args.tokens_per_sec)).start()
+    gemini.API_BASE = server.api_base
+    metrics.enable(True)
+    # 모델 조회 대신 비교할 모델을 고정
+    gemini._model_cache[KEY] = (args.model, time.time() + 3600)
+
+    report = {"config": vars(args), "legacy": run(False, args), "structured": run(True, args)}
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    fields = list(report["legacy"])
+    print(f"{'':<28} {'legacy':>10} {'structured':>11} {'change':>8}")
+    for f in fields:
+        before, after = report["legacy"][f], report["structured"][f]
+        change = f"{(after - before) / before:+.0%}" if before else ""
+        print(f"{f:<28} {before:>10.3f} {after:>11.3f} {change:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+로컬 Gemini 대역 서버 (실제 할당량 소모 없이 생성 경로 성능 측정용)
+
+    python benchmarks/mock_gemini.py --port 8765 --latency 2 --rate-429 0.1
+
+구현 엔드포인트:
+    GET  /v1beta/models
+    POST /v1beta/models/<model>:generateContent
+    POST /v1beta/models/<model>:streamGenerateContent?alt=sse
+
+응답 문제는 fixtures/questions.json(녹화된 응답)에서 뽑고, 지연/429/깨진 JSON 비율과
+응답 크기를 MockConfig로 조절합니다. 키별로 다르게 동작시키려면 key_overrides를 씁니다.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import ssl
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class MockConfig:
+    def __init__(self, latency=1.0, jitter=0.2, first_token_latency=0.3, rate_429=0.0,
+                 rate_malformed=0.0, questions_per_response=None, chunk_chars=120,
+                 list_latency=0.05, retry_after=5, key_overrides=None, tokens_per_sec=None):
+        self.latency = latency                        # generateContent 전체 응답 시간 (초)
+        self.jitter = jitter                          # 지연 시간 랜덤 편차 비율
+        self.first_token_latency = first_token_latency  # 스트리밍 첫 조각까지 시간
+        self.rate_429 = rate_429                      # 429 응답 비율
+        self.rate_malformed = rate_malformed          # 깨진 JSON 응답 비율
+        self.questions_per_response = questions_per_response  # None이면 프롬프트의 개수를 따름
+        self.chunk_chars = chunk_chars                # 스트리밍 조각 크기
+        self.list_latency = list_latency              # 모델 목록 조회 지연
+        self.retry_after = retry_after                # 429의 Retry-After 헤더 값
+        self.key_overrides = key_overrides or {}      # api_key -> {설정명: 값}
+        self.tokens_per_sec = tokens_per_sec          # 설정하면 응답 시간 = 첫 토큰 + 출력 토큰 / 속도 (latency 무시)
+
+    def for_key(self, api_key):
+        overrides = self.key_overrides.get(api_key)
+        if not overrides:
+            return self
+        cfg = MockConfig(**vars(self))
+        for k, v in overrides.items():
+            setattr(cfg, k, v)
+        return cfg
+
+
+def _load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+MODELS = _load_fixture("models.json")
+QUESTIONS = _load_fixture("questions.json")
+
+
+def _sleep(seconds, jitter):
+    if seconds > 0:
+        time.sleep(max(0.0, seconds * (1 + random.uniform(-jitter, jitter))))
+
+
+def _requested_count(prompt, default=20):
+    m = re.search(r'총\s*(\d+)\s*개', prompt)
+    return int(m.group(1)) if m else default
+
+
+def _requested_subject(prompt):
+    m = re.search(r'\[([^\]]+)\]\s*과목에서', prompt)
+    return m.group(1) if m else None
+
+
+def build_response_text(prompt, cfg, json_mode=False):
+    """
+    프롬프트가 요구한 수만큼 녹화된 문제를 뽑아 모델 응답 텍스트를 만듦
+    json_mode(responseMimeType이 application/json)면 코드블록/들여쓰기 없는 JSON만
+    """
+    count = cfg.questions_per_response or _requested_count(prompt)
+    subject = _requested_subject(prompt)
+    candidates = [q for q in QUESTIONS if q["category"] == subject] if subject else QUESTIONS
+    items = []
+    for i in range(count):
+        q = dict(random.choice(candidates or QUESTIONS))
+        # 고유 문항 ID를 붙여 중복 필터에 걸리지 않게 함
+        q["question"] = f"{i + 1}. {q['question']} (문항 {uuid.uuid4().hex[:12]})"
+        items.append(q)
+    if json_mode:
+        return json.dumps(items, ensure_ascii=False, separators=(",", ":"))
+    text = json.dumps(items, ensure_ascii=False, indent=1)
+    if random.random() < cfg.rate_malformed:
+        # 중간 객체 하나를 망가뜨림 (닫는 따옴표/쉼표 누락)
+        cut = text.find('"explanation"', len(text) // 2)
+        if cut != -1:
+            text = text[:cut] + text[cut + 1:]
+    return "```json\n" + text + "\n```"
+
+
+def _usage(prompt, text):
+    prompt_tokens = len(prompt) // 2
+    output_tokens = len(text) // 2
+    return {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens}
+
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockGemini/1.0"
+    disable_nagle_algorithm = True  # 헤더/본문 분리 전송 시 지연 ACK로 40ms씩 밀리는 것 방지
+
+    def setup(self):
+        super().setup()
+        # 핸들러는 연결마다 하나씩 생성됨 → 새 TCP(+TLS) 연결 수
+        self.server.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            data = gzip.compress(data)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _api_key(self):
+        return parse_qs(urlparse(self.path).query).get("key", [""])[0]
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        cfg = self.server.config.for_key(self._api_key())
+        self.server.count("list")
+        if path.rstrip("/") == "/v1beta/models":
+            _sleep(cfg.list_latency, cfg.jitter)
+            self._send_json(200, MODELS)
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "Not Found"}})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        cfg = self.server.config.for_key(self._api_key())
+
+        m = re.match(r"^/v1beta/(models/[^:]+):(generateContent|streamGenerateContent)$", path)
+        if not m or m.group(1) not in [x["name"] for x in MODELS["models"]]:
+            self._send_json(404, {"error": {"code": 404, "message": "model not found"}})
+            return
+        method = m.group(2)
+        self.server.count(method)
+
+        if random.random() < cfg.rate_429:
+            self.server.count("429")
+            _sleep(0.05, 0)
+            self._send_json(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+                            {"Retry-After": str(cfg.retry_after)})
+            return
+
+        prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+        config = body.get("generationConfig") or {}
+        json_mode = (config.get("responseMimeType") or config.get("response_mime_type")) == "application/json"
+        text = build_response_text(prompt, cfg, json_mode)
+        latency = cfg.latency
+        if cfg.tokens_per_sec:
+            latency = cfg.first_token_latency + _usage(prompt, text)["candidatesTokenCount"] / cfg.tokens_per_sec
+
+        if method == "generateContent":
+            _sleep(latency, cfg.jitter)
+            self._send_json(200, {
+                "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+                "usageMetadata": _usage(prompt, text),
+            })
+            return
+
+        # 스트리밍: SSE 조각을 chunked 인코딩으로 나눠 보냄
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunks = [text[i:i + cfg.chunk_chars] for i in range(0, len(text), cfg.chunk_chars)]
+        _sleep(cfg.first_token_latency, cfg.jitter)
+        per_chunk = max(latency - cfg.first_token_latency, 0) / max(len(chunks), 1)
+        try:
+            for i, chunk in enumerate(chunks):
+                event = {"candidates": [{"content": {"parts": [{"text": chunk}], "role": "model"}}]}
+                if i == len(chunks) - 1:
+                    event["usageMetadata"] = _usage(prompt, text)
+                data = ("data: " + json.dumps(event, ensure_ascii=False) + "\r\n\r\n").encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+                _sleep(per_chunk, 0)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 필요한 만큼 받고 먼저 끊은 경우
+            self.close_connection = True
+
+
+class MockGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, config=None, certfile=None, keyfile=None):
+        super().__init__(("127.0.0.1", port), MockGeminiHandler)
+        self.config = config or MockConfig()
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self.tls = certfile is not None
+        if self.tls:
+            # 실제 API처럼 TLS 핸드셰이크 비용이 들도록 HTTPS로 서비스
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    def count(self, name):
+        with self._stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    @property
+    def api_base(self):
+        scheme = "https" if self.tls else "http"
+        return f"{scheme}://127.0.0.1:{self.server_address[1]}/v1beta"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="mock-gemini", daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-malformed", type=float, default=0.0)
+    parser.add_argument("--questions", type=int, default=None)
+    parser.add_argument("--tokens-per-sec", type=float, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, first_token_latency=args.first_token_latency,
+                        rate_429=args.rate_429, rate_malformed=args.rate_malformed,
+                        questions_per_response=args.questions, tokens_per_sec=args.tokens_per_sec)
+    server = MockGeminiServer(args.port, config)
+    print(f"Mock Gemini listening on {server.api_base}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
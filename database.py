@@ -1,12 +1,133 @@
+import json
+import queue
+import random
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+import dedup
+import metrics
+import question_parser
+import review_scheduler
 
 DB_FILE = "usage_data.db"
 
+# 프로세스 전체가 공유하는 커넥션 풀 크기 (DB 파일별)
+POOL_SIZE = 8
+# 문제 풀(생성 결과 캐시)에 보관할 최대 문제 수, 넘으면 가장 오래 출제되지 않은 문제부터 삭제
+QUESTION_CACHE_MAX = 5000
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# 이 프로세스에서 스키마 준비를 마친 DB 파일 (init_db는 파일마다 한 번만 실제로 실행)
+_initialized = set()
+_init_lock = threading.Lock()
+
+# 검색 한 페이지 결과 수 / FTS5를 쓸 수 있는지 (init_db에서 확인)
+SEARCH_PAGE_SIZE = 10
+SEARCH_ENABLED = True
+# 오답노트 관련도순 정렬은 가장 최근에 일치한 이만큼의 노트 안에서 (흔한 검색어도 순위 계산량이 일정)
+SEARCH_RANK_CANDIDATES = 500
+
+
+def _connect(db_file):
+    """WAL + 튜닝된 PRAGMA로 새 커넥션 생성 (풀에서 스레드 간 재사용)"""
+    conn = sqlite3.connect(db_file, timeout=5, check_same_thread=False, cached_statements=256)
+    conn.execute('PRAGMA journal_mode=WAL')      # 읽기와 쓰기가 서로 막지 않음
+    conn.execute('PRAGMA busy_timeout=5000')     # "database is locked" 대신 잠시 대기
+    conn.execute('PRAGMA synchronous=NORMAL')    # WAL에서는 NORMAL로도 안전, fsync 감소
+    conn.execute('PRAGMA cache_size=-8000')      # 커넥션당 약 8MB 페이지 캐시
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+@contextmanager
+def _connection():
+    """풀에서 커넥션을 빌려 쓰고 반납 (블록이 끝나면 commit, 예외 시 rollback)"""
+    db_file = DB_FILE
+    with _pools_lock:
+        pool = _pools.get(db_file)
+        if pool is None:
+            pool = _pools[db_file] = queue.LifoQueue()
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _connect(db_file)
+        metrics.inc("db_connections_opened_total")
+    try:
+        with conn:
+            yield conn
+    except sqlite3.OperationalError as e:
+        # busy_timeout을 넘겨 잠금을 얻지 못한 경우 (동시 사용자 부하 지표)
+        if "locked" in str(e):
+            metrics.inc("db_locked_errors_total")
+        raise
+    finally:
+        if pool.qsize() < POOL_SIZE:
+            pool.put(conn)
+        else:
+            conn.close()
+
+
+@metrics.timed("db_call_seconds")
 def init_db():
-    """데이터베이스 및 테이블 초기화"""
-    conn = sqlite3.connect(DB_FILE)
+    """
+    데이터베이스 스키마를 최신 버전으로 맞춤 (프로세스에서 DB 파일마다 한 번만, 이후 호출은 바로 반환)
+    여러 프로세스가 동시에 시작해도 마이그레이션 단계마다 쓰기 잠금을 잡고 버전을 다시 확인하므로 한 번씩만 적용됨
+    """
+    global SEARCH_ENABLED
+    db_file = DB_FILE
+    if db_file in _initialized:
+        return
+    with _init_lock:
+        if db_file in _initialized:
+            return
+        with _connection() as conn:
+            _migrate(conn)
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('review_notes_fts', 'question_pool_fts')")
+            SEARCH_ENABLED = c.fetchone()[0] == 2
+        _initialized.add(db_file)
+
+def _migrate(conn):
+    """PRAGMA user_version 이후의 마이그레이션을 차례로 적용 (단계마다 한 트랜잭션)"""
     c = conn.cursor()
+    c.execute('PRAGMA user_version')
+    current = c.fetchone()[0]
+    for version, step in enumerate(MIGRATIONS, 1):
+        if version <= current:
+            continue
+        c.execute('BEGIN IMMEDIATE')  # 다른 프로세스의 같은 단계와 겹치지 않도록 쓰기 잠금부터
+        try:
+            c.execute('PRAGMA user_version')
+            current = c.fetchone()[0]
+            if version > current:
+                step(c)
+                c.execute(f'PRAGMA user_version = {version}')
+                current = version
+                metrics.inc("db_migrations_applied_total")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def _add_column(c, table, column, decl):
+    """
+    컬럼 추가 (SQLite는 메타데이터만 바꾸므로 큰 테이블도 즉시 끝남)
+    버전 기록 전에 만든 DB에는 이미 있을 수 있으므로 그때는 건너뜀
+    """
+    try:
+        c.execute(f'ALTER TABLE {table} ADD COLUMN {column} {decl}')
+    except sqlite3.OperationalError as e:
+        if 'duplicate column' not in str(e):
+            raise
+
+# 버전 기록(user_version) 전에 만든 DB는 0에서 시작하므로, 각 단계는 이미 적용된 부분이 있어도 안전하게 작성
+# (IF NOT EXISTS, _add_column, NULL인 행만 채우기). 스키마를 바꿀 때는 기존 단계를 고치지 말고 끝에 새 단계를 추가.
+
+def _migration_1_base(c):
+    """사용량, 오답노트"""
     # 사용량 추적 테이블: 사용자ID(여기선 간단히 날짜별 통합 카운트 사용), 날짜, 횟수
     # 실제 배포 환경(Streamlit Cloud)에서는 IP 추적이 어렵거나 공유되므로,
     # 여기서는 '로컬 사용자' 기준으로 브라우저 세션 키나 단순 일일 전체 제한으로 구현합니다.
@@ -19,7 +140,7 @@ def init_db():
             PRIMARY KEY (user_id, date_str)
         )
     ''')
-    
+
     # [추가] 오답노트 테이블
     c.execute('''
         CREATE TABLE IF NOT EXISTS review_notes (
@@ -33,88 +154,976 @@ def init_db():
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    conn.commit()
-    conn.close()
+    # 사용자별 최신순 조회/페이지네이션용 인덱스
+    c.execute('CREATE INDEX IF NOT EXISTS idx_review_notes_user_ts ON review_notes (user_id, timestamp, id)')
+
+def _migration_2_review_dedup(c):
+    """같은 문제를 다시 틀리면 행을 늘리지 않고 miss_count만 올림"""
+    _add_column(c, 'review_notes', 'content_hash', 'TEXT')
+    _add_column(c, 'review_notes', 'miss_count', 'INTEGER DEFAULT 1')
+    _backfill_review_hashes(c)
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_review_notes_user_hash ON review_notes (user_id, content_hash)')
+
+def _migration_3_question_pool(c):
+    """미리 생성해 둔 문제 풀 (백그라운드에서 채움)"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS question_pool (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT,
+            question TEXT,
+            options TEXT,
+            answer INTEGER,
+            explanation TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    _add_column(c, 'question_pool', 'content_hash', 'TEXT')
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_question_pool_hash ON question_pool (content_hash)')
+    # 마지막으로 출제된 시각 (LRU 삭제용)
+    _add_column(c, 'question_pool', 'last_used_at', 'DATETIME')
+    c.execute('UPDATE question_pool SET last_used_at = created_at WHERE last_used_at IS NULL')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_question_pool_lru ON question_pool (last_used_at, id)')
+    # 사용자별로 이미 받은 풀 문제 (같은 문제 재출제 방지)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS question_pool_seen (
+            user_id TEXT,
+            question_id INTEGER,
+            PRIMARY KEY (user_id, question_id)
+        )
+    ''')
+    # 캐시에서 지운 문제의 '받음' 기록 정리용
+    c.execute('CREATE INDEX IF NOT EXISTS idx_question_pool_seen_qid ON question_pool_seen (question_id)')
+    # 과목별 할당량 추첨용
+    c.execute('CREATE INDEX IF NOT EXISTS idx_question_pool_category ON question_pool (category)')
+
+def _migration_4_subject_stats(c):
+    """사용자별·과목별 누적 풀이/오답 수 (답할 때마다 증분 갱신, 시험 시작 시 몇 행만 읽음)"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS subject_stats (
+            user_id TEXT,
+            category TEXT,
+            attempts INTEGER DEFAULT 0,
+            wrong INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, category)
+        )
+    ''')
+    _backfill_subject_stats(c)
+
+def _migration_5_review_schedule(c):
+    """간격 반복(SM-2) 일정: 예전 노트는 바로 복습 대상"""
+    # 마이그레이션은 한 번 배포되면 그대로여야 하므로 review_scheduler.START_EASE를 참조하지 않고 값을 적음
+    _add_column(c, 'review_notes', 'ease', 'REAL DEFAULT 2.5')
+    _add_column(c, 'review_notes', 'interval_days', 'INTEGER DEFAULT 0')
+    _add_column(c, 'review_notes', 'repetitions', 'INTEGER DEFAULT 0')
+    _add_column(c, 'review_notes', 'due_at', 'DATETIME')
+    c.execute('UPDATE review_notes SET due_at = timestamp WHERE due_at IS NULL')
+    # "지금 복습할 노트"를 기한 순으로 범위 조회
+    c.execute('CREATE INDEX IF NOT EXISTS idx_review_notes_user_due ON review_notes (user_id, due_at, id)')
+
+def _migration_6_generation_jobs(c):
+    """문제 생성 작업 큐 (스크립트 스레드 대신 워커가 처리, 화면은 작업 id로 상태만 조회)"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT,
+            job_key TEXT,
+            subject TEXT,
+            user_id TEXT,
+            count INTEGER,
+            status TEXT DEFAULT 'queued',
+            produced INTEGER DEFAULT 0,
+            error TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME,
+            finished_at DATETIME
+        )
+    ''')
+    # 같은 작업은 대기/실행 중에 하나만 (동시에 눌러도 생성 한 번을 함께 씀)
+    c.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_generation_jobs_active_key ON generation_jobs (job_key)
+        WHERE status IN ('queued', 'running')
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs (status, id)')
+
+def _migration_7_answer_events(c):
+    """답안 이벤트 로그 (맞힘/틀림 모두, 추가만 함) - 오답노트/통계/복습 일정은 여기서 파생"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS answer_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            category TEXT,
+            question TEXT,
+            options TEXT,
+            answer INTEGER,
+            explanation TEXT,
+            choice INTEGER,
+            correct INTEGER,
+            latency_ms INTEGER,
+            note_id INTEGER,
+            content_hash TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_answer_events_user_ts ON answer_events (user_id, created_at)')
+
+def _migration_8_exam_sessions(c):
+    """진행 중인 시험 저장 (재시작/재접속 시 이어 풀기) - 문제 묶음은 압축해 한 번만, 진행 상태는 작게 자주"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS exam_sessions (
+            user_id TEXT PRIMARY KEY,
+            batch BLOB,
+            state TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _migration_9_search_index(c):
+    """전문 검색 색인 (FTS5 trigram: 띄어쓰기/조사와 상관없이 3글자 이상 부분 일치) - 트리거로 동기화"""
+    _ensure_search_index(c, 'review_notes')
+    _ensure_search_index(c, 'question_pool')
+
+def _migration_10_job_owner(c):
+    """사용자가 입력한 키로 하는 생성 작업은 키를 가진 프로세스만 실행"""
+    _add_column(c, 'generation_jobs', 'owner', 'TEXT')
+
+def _migration_11_job_heartbeat(c):
+    """생성 작업을 실행 중인 프로세스와 그 프로세스의 하트비트 (죽은 워커의 작업을 바로 되살리기 위함)"""
+    _add_column(c, 'generation_jobs', 'worker', 'TEXT')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS generation_workers (
+            process_id TEXT PRIMARY KEY,
+            heartbeat_at DATETIME
+        )
+    ''')
+
+def _migration_12_search_index_user(c):
+    """
+    오답노트 색인을 사용자별로: 사용자마다 고유한 3글자 토큰(trigram 한 개)을 함께 색인해
+    MATCH가 그 사용자의 노트 안에서만 찾고 순위를 매기게 함 (전에는 모든 사용자의 일치 노트를 훑은 뒤 걸렀음)
+    FTS5가 없는 SQLite면 건너뜀
+    """
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'review_notes_fts'")
+    if not c.fetchone():
+        return
+    for trigger in ('ai', 'ad', 'au'):
+        c.execute(f'DROP TRIGGER IF EXISTS review_notes_fts_{trigger}')
+    c.execute('DROP TABLE review_notes_fts')
+    # 토큰: 사용자 번호를 사용 영역(U+E000~)의 세 글자로 (본문에 나오지 않으므로 다른 색인어와 겹치지 않음)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS search_scopes (
+            id INTEGER PRIMARY KEY,
+            user_id TEXT UNIQUE,
+            token TEXT GENERATED ALWAYS AS (char(57344 + id % 6400, 57344 + id / 6400 % 6400, 57344 + id / 40960000)) VIRTUAL
+        )
+    ''')
+    c.execute('INSERT OR IGNORE INTO search_scopes (user_id) SELECT DISTINCT user_id FROM review_notes')
+    c.execute('''
+        CREATE VIEW IF NOT EXISTS review_notes_search AS
+        SELECT n.id, n.question, n.options, n.explanation, s.token AS user_scope
+        FROM review_notes AS n JOIN search_scopes AS s ON s.user_id = n.user_id
+    ''')
+    c.execute('''
+        CREATE VIRTUAL TABLE review_notes_fts USING fts5(
+            question, options, explanation, user_scope,
+            content='review_notes_search', content_rowid='id', tokenize='trigram'
+        )
+    ''')
+    c.execute('''
+        CREATE TRIGGER review_notes_fts_ai AFTER INSERT ON review_notes BEGIN
+            INSERT OR IGNORE INTO search_scopes (user_id) VALUES (new.user_id);
+            INSERT INTO review_notes_fts (rowid, question, options, explanation, user_scope)
+            SELECT id, question, options, explanation, user_scope FROM review_notes_search WHERE id = new.id;
+        END
+    ''')
+    # 색인에서 지울 때는 색인한 값 그대로 필요하므로 행이 아직 있을 때 (BEFORE)
+    c.execute('''
+        CREATE TRIGGER review_notes_fts_bd BEFORE DELETE ON review_notes BEGIN
+            INSERT INTO review_notes_fts (review_notes_fts, rowid, question, options, explanation, user_scope)
+            SELECT 'delete', id, question, options, explanation, user_scope FROM review_notes_search WHERE id = old.id;
+        END
+    ''')
+    # 본문이 바뀔 때만 (오답 횟수/복습 일정 갱신은 색인을 건드리지 않음)
+    c.execute('''
+        CREATE TRIGGER review_notes_fts_bu BEFORE UPDATE OF question, options, explanation ON review_notes BEGIN
+            INSERT INTO review_notes_fts (review_notes_fts, rowid, question, options, explanation, user_scope)
+            SELECT 'delete', id, question, options, explanation, user_scope FROM review_notes_search WHERE id = old.id;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER review_notes_fts_au AFTER UPDATE OF question, options, explanation ON review_notes BEGIN
+            INSERT INTO review_notes_fts (rowid, question, options, explanation, user_scope)
+            SELECT id, question, options, explanation, user_scope FROM review_notes_search WHERE id = new.id;
+        END
+    ''')
+    c.execute("INSERT INTO review_notes_fts (review_notes_fts) VALUES ('rebuild')")
+
+def _ensure_search_index(c, table):
+    """
+    table의 question/options/explanation을 색인하는 <table>_fts (본문은 원래 테이블에서 읽음)
+    FTS5가 없는 SQLite면 만들지 않음 (init_db가 색인이 없으면 SEARCH_ENABLED를 끔)
+    """
+    fts = f'{table}_fts'
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,))
+    if c.fetchone():
+        return
+    try:
+        c.execute(f'''
+            CREATE VIRTUAL TABLE {fts} USING fts5(
+                question, options, explanation,
+                content='{table}', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, question, options, explanation)
+            VALUES (new.id, new.question, new.options, new.explanation);
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, question, options, explanation)
+            VALUES ('delete', old.id, old.question, old.options, old.explanation);
+        END
+    ''')
+    # 본문이 바뀔 때만 (오답 횟수/복습 일정 갱신은 색인을 건드리지 않음)
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF question, options, explanation ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, question, options, explanation)
+            VALUES ('delete', old.id, old.question, old.options, old.explanation);
+            INSERT INTO {fts} (rowid, question, options, explanation)
+            VALUES (new.id, new.question, new.options, new.explanation);
+        END
+    ''')
+    c.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")  # 기존 행 색인
+
+def _backfill_review_hashes(c):
+    """해시가 없는 예전 오답노트에 해시를 채우고, 같은 문제는 최신 행 하나로 합침"""
+    c.execute('SELECT id, question, options FROM review_notes WHERE content_hash IS NULL')
+    rows = c.fetchall()
+    if not rows:
+        return
+    c.executemany('UPDATE review_notes SET content_hash = ? WHERE id = ?',
+                  [(dedup.content_hash(r[1], json.loads(r[2] or '[]')), r[0]) for r in rows])
+    c.execute('''
+        UPDATE review_notes SET miss_count = (
+            SELECT COUNT(*) FROM review_notes AS d
+            WHERE d.user_id = review_notes.user_id AND d.content_hash = review_notes.content_hash
+        )
+        WHERE id IN (SELECT MAX(id) FROM review_notes GROUP BY user_id, content_hash)
+    ''')
+    c.execute('''
+        DELETE FROM review_notes
+        WHERE id NOT IN (SELECT MAX(id) FROM review_notes GROUP BY user_id, content_hash)
+    ''')
+
+def _backfill_subject_stats(c):
+    """통계 테이블이 처음 생겼을 때 기존 오답노트로 한 번만 채움 (맞힌 기록은 없으므로 오답만)"""
+    c.execute('SELECT 1 FROM subject_stats LIMIT 1')
+    if c.fetchone():
+        return
+    # 예전 노트의 과목명은 모델이 쓴 그대로라 SUBJECTS로 맞춰서 합침 (알아볼 수 없는 과목은 제외)
+    c.execute('''
+        SELECT user_id, category, SUM(miss_count) FROM review_notes
+        WHERE category IS NOT NULL
+        GROUP BY user_id, category
+    ''')
+    totals = {}
+    for user_id, category, misses in c.fetchall():
+        subject = question_parser.normalize_category(category)
+        if subject is not None:
+            totals[(user_id, subject)] = totals.get((user_id, subject), 0) + (misses or 0)
+    c.executemany('''
+        INSERT INTO subject_stats (user_id, category, attempts, wrong) VALUES (?, ?, ?, ?)
+    ''', [(user_id, subject, misses, misses) for (user_id, subject), misses in totals.items()])
+
+# 스키마 버전 = 목록 길이 (PRAGMA user_version에 기록)
+MIGRATIONS = [
+    _migration_1_base,
+    _migration_2_review_dedup,
+    _migration_3_question_pool,
+    _migration_4_subject_stats,
+    _migration_5_review_schedule,
+    _migration_6_generation_jobs,
+    _migration_7_answer_events,
+    _migration_8_exam_sessions,
+    _migration_9_search_index,
+    _migration_10_job_owner,
+    _migration_11_job_heartbeat,
+    _migration_12_search_index_user,
+]
 
 def get_today_str():
     return datetime.now().strftime("%Y-%m-%d")
 
+# 프로세스 공용 사용량 캐시 (write-through): (user_id, date_str) -> count
+# 이 프로세스의 모든 쓰기가 캐시를 갱신하므로 check_usage는 디스크를 읽지 않음
+_usage_cache = {}
+_usage_lock = threading.Lock()
+_usage_cache_day = None
+
+def _prune_usage_cache(today):
+    """날짜가 바뀌면 지난 날짜 항목을 버림 (_usage_lock을 잡은 채 호출)"""
+    global _usage_cache_day
+    if _usage_cache_day == today:
+        return
+    for key in [k for k in _usage_cache if k[1] != today]:
+        del _usage_cache[key]
+    _usage_cache_day = today
+
+def _cached_usage(user_id, today):
+    with _usage_lock:
+        _prune_usage_cache(today)
+        count = _usage_cache.get((user_id, today))
+    if count is not None:
+        return count
+
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT count FROM usage_logs WHERE user_id = ? AND date_str = ?', (user_id, today))
+        row = c.fetchone()
+    count = row[0] if row else 0
+    with _usage_lock:
+        # 조회하는 사이 쓰기가 있었다면 그 값을 우선
+        return _usage_cache.setdefault((user_id, today), count)
+
+def _store_usage(user_id, today, count):
+    with _usage_lock:
+        _prune_usage_cache(today)
+        _usage_cache[(user_id, today)] = count
+
 # [수정] 일일 제한 20회로 증가
+@metrics.timed("db_call_seconds")
 def check_usage(user_id, daily_limit=20):
-    """오늘 사용량이 한도를 초과했는지 확인"""
-    today = get_today_str()
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
-    c.execute('SELECT count FROM usage_logs WHERE user_id = ? AND date_str = ?', (user_id, today))
-    row = c.fetchone()
-    conn.close()
-    
-    if row:
-        current_count = row[0]
-        return current_count < daily_limit, current_count
-    else:
-        return True, 0
+    """오늘 사용량이 한도를 초과했는지 확인 (캐시에서 응답)"""
+    current_count = _cached_usage(user_id, get_today_str())
+    return current_count < daily_limit, current_count
 
+@metrics.timed("db_call_seconds")
 def increment_usage(user_id, amount=1):
-    """사용량 증가 (기본 1, 배치 생성 시 amount 만큼)"""
+    """사용량 증가 (기본 1, 배치 생성 시 amount 만큼). 증가 후 사용량 반환"""
     today = get_today_str()
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
-    c.execute('SELECT count FROM usage_logs WHERE user_id = ? AND date_str = ?', (user_id, today))
-    row = c.fetchone()
-    
-    if row:
-        c.execute('UPDATE usage_logs SET count = count + ? WHERE user_id = ? AND date_str = ?', (amount, user_id, today))
-    else:
-        c.execute('INSERT INTO usage_logs (user_id, date_str, count) VALUES (?, ?, ?)', (user_id, today, amount))
-        
-    conn.commit()
-    conn.close()
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            INSERT INTO usage_logs (user_id, date_str, count) VALUES (?, ?, MAX(?, 0))
+            ON CONFLICT (user_id, date_str) DO UPDATE SET count = MAX(count + ?, 0)
+            RETURNING count
+        ''', (user_id, today, amount, amount))
+        count = c.fetchone()[0]
+    _store_usage(user_id, today, count)
+    return count
+
+@metrics.timed("db_call_seconds")
+def reserve_usage(user_id, amount, daily_limit=20):
+    """
+    비싼 생성 호출 전에 사용량을 미리 잡아둠. (성공 여부, 사용량) 반환
+    한도에 아직 닿지 않았으면 amount 전체를 잡으므로 마지막 시험은 한도를 넘길 수 있음 (19 + 20 = 39)
+    한도 확인과 증가를 한 문장으로 처리하므로 여러 탭이 동시에 눌러도 한도에 닿은 뒤로는 더 잡지 않음
+    """
+    today = get_today_str()
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            INSERT INTO usage_logs (user_id, date_str, count) VALUES (?, ?, ?)
+            ON CONFLICT (user_id, date_str) DO UPDATE SET count = count + excluded.count
+            WHERE usage_logs.count < ?
+            RETURNING count
+        ''', (user_id, today, amount, daily_limit))
+        row = c.fetchone()
+    if row is None:
+        # 이미 한도 도달: 실제 값을 캐시에 반영
+        with _usage_lock:
+            _usage_cache.pop((user_id, today), None)
+        return False, _cached_usage(user_id, today)
+    _store_usage(user_id, today, row[0])
+    return True, row[0]
+
+@metrics.timed("db_call_seconds")
+def commit_usage(user_id, reserved, used):
+    """예약한 사용량을 실제 사용량으로 확정 (생성 실패 시 used=0 이면 전액 환불)"""
+    if used != reserved:
+        return increment_usage(user_id, used - reserved)
+    return check_usage(user_id)[1]
 
 # [추가] 오답노트 관련 함수
+@metrics.timed("db_call_seconds")
 def add_review_note(user_id, category, question, options_list, answer_idx, explanation):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    with _connection() as conn:
+        c = conn.cursor()
+        _upsert_review_note(c, user_id, category, question, options_list, answer_idx, explanation)
+        _bump_subject_stats(c, user_id, category, wrong=1)
+
+def _upsert_review_note(c, user_id, category, question, options_list, answer_idx, explanation):
     # options 리스트는 문자열로 변환해서 저장 (,로 구분하되 간단히 repr 사용)
-    import json
     options_str = json.dumps(options_list, ensure_ascii=False)
-    
+
+    # 이미 틀렸던 문제면 새 행 대신 miss_count 증가 + 최신으로 올림, 복습 일정은 처음부터 (바로 복습 대상)
     c.execute('''
-        INSERT INTO review_notes (user_id, category, question, options, answer, explanation)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user_id, category, question, options_str, answer_idx, explanation))
-    conn.commit()
-    conn.close()
+        INSERT INTO review_notes (user_id, category, question, options, answer, explanation, content_hash, due_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id, content_hash) DO UPDATE SET
+            miss_count = miss_count + 1,
+            timestamp = CURRENT_TIMESTAMP,
+            ease = MAX(?, ease + ?),
+            interval_days = 0,
+            repetitions = 0,
+            due_at = CURRENT_TIMESTAMP
+    ''', (user_id, category, question, options_str, answer_idx, explanation,
+          dedup.content_hash(question, options_list), review_scheduler.MIN_EASE,
+          review_scheduler.ease_delta(review_scheduler.QUALITY_WRONG)))
 
-def get_review_notes(user_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute('SELECT category, question, options, answer, explanation, timestamp FROM review_notes WHERE user_id = ? ORDER BY timestamp DESC', (user_id,))
-    rows = c.fetchall()
-    conn.close()
+def _bump_subject_stats(c, user_id, category, wrong):
+    if not category:
+        return
+    c.execute('''
+        INSERT INTO subject_stats (user_id, category, attempts, wrong) VALUES (?, ?, 1, ?)
+        ON CONFLICT (user_id, category) DO UPDATE SET
+            attempts = attempts + 1,
+            wrong = wrong + excluded.wrong
+    ''', (user_id, category, wrong))
+
+@metrics.timed("db_call_seconds")
+def record_correct_answer(user_id, category):
+    """맞힌 답을 과목별 통계에 반영 (틀린 답은 add_review_note가 반영)"""
+    with _connection() as conn:
+        _bump_subject_stats(conn.cursor(), user_id, category, wrong=0)
+
+@metrics.timed("db_call_seconds")
+def get_subject_stats(user_id):
+    """{과목: (풀이 수, 오답 수)} - 기본키 범위로 과목 수만큼만 읽음"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT category, attempts, wrong FROM subject_stats WHERE user_id = ?', (user_id,))
+        rows = c.fetchall()
+    return {r[0]: (r[1], r[2]) for r in rows}
+
+@metrics.timed("db_call_seconds")
+def get_review_notes_page(user_id, cursor=None, limit=20):
+    """
+    오답노트를 최신순으로 한 페이지씩 조회 (keyset 페이지네이션). (노트 리스트, 다음 커서) 반환
+    options는 펼쳐볼 때만 decode_note_options로 풀도록 JSON 문자열 그대로 둠
+    """
+    with _connection() as conn:
+        c = conn.cursor()
+        if cursor is None:
+            c.execute('''
+                SELECT id, category, question, options, answer, explanation, timestamp, miss_count, due_at FROM review_notes
+                WHERE user_id = ?
+                ORDER BY timestamp DESC, id DESC LIMIT ?
+            ''', (user_id, limit + 1))
+        else:
+            c.execute('''
+                SELECT id, category, question, options, answer, explanation, timestamp, miss_count, due_at FROM review_notes
+                WHERE user_id = ? AND (timestamp, id) < (?, ?)
+                ORDER BY timestamp DESC, id DESC LIMIT ?
+            ''', (user_id, cursor[0], cursor[1], limit + 1))
+        rows = c.fetchall()
     
     notes = []
-    import json
-    for r in rows:
+    for r in rows[:limit]:
         notes.append({
-            "category": r[0],
-            "question": r[1],
-            "options": json.loads(r[2]),
-            "answer": r[3],
-            "explanation": r[4],
-            "timestamp": r[5]
+            "id": r[0],
+            "category": r[1],
+            "question": r[2],
+            "options_json": r[3],
+            "answer": r[4],
+            "explanation": r[5],
+            "timestamp": r[6],
+            "miss_count": r[7] or 1,
+            "due_at": r[8]
         })
-    return notes
+    next_cursor = (notes[-1]["timestamp"], notes[-1]["id"]) if len(rows) > limit else None
+    return notes, next_cursor
 
-def delete_review_note(user_id, question):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute('DELETE FROM review_notes WHERE user_id = ? AND question = ?', (user_id, question))
-    conn.commit()
-    conn.close()
+def decode_note_options(note):
+    """노트의 보기 목록 (처음 펼칠 때 한 번만 JSON 파싱)"""
+    if "options" not in note:
+        note["options"] = json.loads(note["options_json"])
+    return note["options"]
+
+@metrics.timed("db_call_seconds")
+def delete_review_note(user_id, note_id):
+    """오답노트 삭제 (기본키 기준)"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('DELETE FROM review_notes WHERE id = ? AND user_id = ?', (note_id, user_id))
+
+# [추가] 간격 반복 복습 관련 함수
+@metrics.timed("db_call_seconds")
+def get_due_review_notes(user_id, limit=20):
+    """
+    지금 복습할 노트를 기한이 오래된 순으로 최대 limit개, 시험 문제 형식으로 반환
+    (user_id, due_at) 인덱스 범위만 읽으므로 노트가 아무리 많아도 limit개만 봄
+    """
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            SELECT id, category, question, options, answer, explanation FROM review_notes
+            WHERE user_id = ? AND due_at <= CURRENT_TIMESTAMP
+            ORDER BY due_at, id LIMIT ?
+        ''', (user_id, limit))
+        rows = c.fetchall()
+    return [
+        {"note_id": r[0], "category": r[1], "question": r[2], "options": json.loads(r[3] or '[]'),
+         "answer": r[4], "explanation": r[5]}
+        for r in rows
+    ]
+
+@metrics.timed("db_call_seconds")
+def count_due_review_notes(user_id, cap=100):
+    """지금 복습할 노트 수 (cap개에서 세기를 멈춤)"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM review_notes WHERE user_id = ? AND due_at <= CURRENT_TIMESTAMP LIMIT ?
+            )
+        ''', (user_id, cap))
+        return c.fetchone()[0]
+
+def _apply_review_result(c, user_id, note_id, correct):
+    c.execute('SELECT category, ease, interval_days, repetitions FROM review_notes WHERE id = ? AND user_id = ?',
+              (note_id, user_id))
+    row = c.fetchone()
+    if row is None:
+        return None
+    ease, interval, repetitions = review_scheduler.next_review(row[1], row[2], row[3] or 0, correct)
+    c.execute('''
+        UPDATE review_notes SET
+            ease = ?, interval_days = ?, repetitions = ?,
+            due_at = datetime('now', ?),
+            miss_count = miss_count + ?
+        WHERE id = ?
+    ''', (ease, interval, repetitions, f'+{interval} days', 0 if correct else 1, note_id))
+    _bump_subject_stats(c, user_id, question_parser.normalize_category(row[0]), wrong=0 if correct else 1)
+    return interval
+
+# [추가] 답안 이벤트 로그 관련 함수
+@metrics.timed("db_call_seconds")
+def record_answer_events(events):
+    """
+    답안 이벤트 여러 개를 한 트랜잭션으로 기록하고, 이벤트 순서대로 파생 데이터를 갱신
+    (틀린 시험 문제 -> 오답노트, 맞힌 문제 -> 과목 통계, 복습 퀴즈 -> 복습 일정)
+    """
+    rows = [
+        (e['user_id'], e.get('category'), e.get('question'), json.dumps(e.get('options', []), ensure_ascii=False),
+         e.get('answer'), e.get('explanation'), e.get('choice'), 1 if e['correct'] else 0, e.get('latency_ms'), e.get('note_id'),
+         dedup.content_hash(e.get('question'), e.get('options', [])), e['created_at'])
+        for e in events
+    ]
+    with _connection() as conn:
+        c = conn.cursor()
+        c.executemany('''
+            INSERT INTO answer_events (user_id, category, question, options, answer, explanation, choice, correct,
+                                       latency_ms, note_id, content_hash, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        for e in events:
+            if e.get('note_id') is not None:
+                _apply_review_result(c, e['user_id'], e['note_id'], e['correct'])
+            elif e['correct']:
+                _bump_subject_stats(c, e['user_id'], e.get('category'), wrong=0)
+            else:
+                _upsert_review_note(c, e['user_id'], e.get('category'), e.get('question'), e.get('options', []),
+                                    e.get('answer'), e.get('explanation'))
+                _bump_subject_stats(c, e['user_id'], e.get('category'), wrong=1)
+
+# [추가] 문제 풀 관련 함수
+@metrics.timed("db_call_seconds")
+def add_pool_questions(questions):
+    """
+    생성된 문제들을 풀에 저장하고 id 목록 반환 (이미 있는 문제는 기존 id)
+    풀이 QUESTION_CACHE_MAX를 넘으면 LRU 삭제
+    """
+    rows = [
+        (q.get('category'), q.get('question'), json.dumps(q.get('options', []), ensure_ascii=False),
+         q.get('answer', 0), q.get('explanation'), dedup.content_hash(q.get('question'), q.get('options', [])))
+        for q in questions
+    ]
+    with _connection() as conn:
+        c = conn.cursor()
+        ids = []
+        inserted = False
+        for row in rows:
+            c.execute('''
+                INSERT INTO question_pool (category, question, options, answer, explanation, content_hash, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (content_hash) DO NOTHING
+            ''', row)
+            if c.rowcount:
+                ids.append(c.lastrowid)
+                inserted = True
+            else:
+                c.execute('SELECT id FROM question_pool WHERE content_hash = ?', (row[5],))
+                ids.append(c.fetchone()[0])
+        if inserted:
+            _evict_pool(c, keep_ids=ids)
+    return ids
+
+def _evict_pool(c, keep_ids=()):
+    """풀이 QUESTION_CACHE_MAX를 넘으면 가장 오래 출제되지 않은 문제부터 삭제 (방금 넣은 문제는 제외)"""
+    c.execute('SELECT COUNT(*) FROM question_pool')
+    excess = c.fetchone()[0] - QUESTION_CACHE_MAX
+    if excess <= 0:
+        return 0
+    keep = set(keep_ids)
+    c.execute('SELECT id FROM question_pool ORDER BY last_used_at, id LIMIT ?', (excess + len(keep),))
+    victims = [(qid,) for (qid,) in c.fetchall() if qid not in keep][:excess]
+    c.executemany('DELETE FROM question_pool WHERE id = ?', victims)
+    c.executemany('DELETE FROM question_pool_seen WHERE question_id = ?', victims)
+    metrics.inc("question_cache_evicted_total", len(victims))
+    return len(victims)
+
+@metrics.timed("db_call_seconds")
+def count_pool_questions(user_id=None):
+    """풀에 남은 문제 수 (user_id가 있으면 그 사용자가 아직 안 받은 문제 수)"""
+    with _connection() as conn:
+        c = conn.cursor()
+        if user_id is None:
+            c.execute('SELECT COUNT(*) FROM question_pool')
+        else:
+            c.execute('''
+                SELECT COUNT(*) FROM question_pool
+                WHERE id NOT IN (SELECT question_id FROM question_pool_seen WHERE user_id = ?)
+            ''', (user_id,))
+        count = c.fetchone()[0]
+    return count
+
+@metrics.timed("db_call_seconds")
+def count_pool_questions_by_category(user_id):
+    """{과목: 사용자가 아직 안 받은 문제 수}"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            SELECT category, COUNT(*) FROM question_pool
+            WHERE id NOT IN (SELECT question_id FROM question_pool_seen WHERE user_id = ?)
+            GROUP BY category
+        ''', (user_id,))
+        rows = c.fetchall()
+    return {r[0]: r[1] for r in rows}
+
+def _take_unseen(c, user_id, limit, category=None):
+    """안 받은 문제를 무작위로 limit개 골라 '받음'으로 표시하고 행 반환"""
+    where = 'AND category = ?' if category is not None else ''
+    params = (user_id, category, limit) if category is not None else (user_id, limit)
+    c.execute(f'''
+        SELECT id, category, question, options, answer, explanation FROM question_pool
+        WHERE id NOT IN (SELECT question_id FROM question_pool_seen WHERE user_id = ?) {where}
+        ORDER BY RANDOM() LIMIT ?
+    ''', params)
+    rows = c.fetchall()
+    c.executemany('INSERT OR IGNORE INTO question_pool_seen (user_id, question_id) VALUES (?, ?)',
+                  [(user_id, r[0]) for r in rows])
+    return rows
+
+@metrics.timed("db_call_seconds")
+def draw_pool_questions(user_id, count=20, quotas=None):
+    """
+    사용자가 아직 받지 않은 문제를 무작위로 꺼내고 '받음'으로 표시
+    (여러 생성 배치, 여러 사용자의 요청으로 만든 문제가 섞여서 나옴)
+    quotas({과목: 문제 수})가 있으면 과목별로 먼저 뽑고, 모자란 만큼은 아무 과목에서나 채움
+    """
+    with _connection() as conn:
+        c = conn.cursor()
+        rows = []
+        for category, n in (quotas or {}).items():
+            if n > 0:
+                rows.extend(_take_unseen(c, user_id, min(n, count - len(rows)), category))
+        if len(rows) < count:
+            rows.extend(_take_unseen(c, user_id, count - len(rows)))
+        # 출제된 문제는 캐시에서 최근 사용으로 갱신 (LRU)
+        c.executemany('UPDATE question_pool SET last_used_at = CURRENT_TIMESTAMP WHERE id = ?',
+                      [(r[0],) for r in rows])
+
+    if quotas:
+        random.shuffle(rows)  # 과목별로 뭉치지 않게 섞음
+    questions = []
+    for r in rows:
+        questions.append({
+            "category": r[1],
+            "question": r[2],
+            "options": json.loads(r[3]),
+            "answer": r[4],
+            "explanation": r[5]
+        })
+    return questions
+
+# [추가] 검색 관련 함수
+def _match_query(text):
+    """
+    검색어 -> FTS5 MATCH 식 (trigram은 3글자 이상만 색인으로 찾을 수 있음)
+    단어가 모두 3글자 이상이면 각 단어를 AND, 아니면 전체를 한 구절로, 전체도 3글자 미만이면 None
+    """
+    words = [w.replace('"', '""') for w in text.split()]
+    if words and all(len(w) >= 3 for w in words):
+        return ' '.join(f'"{w}"' for w in words)
+    phrase = ' '.join(words)
+    return f'"{phrase}"' if len(phrase) >= 3 else None
+
+def _review_match(c, user_id, query):
+    """오답노트 색인용 MATCH 식: 본문 열에서 query, 그 사용자의 토큰으로 한정 (노트가 없는 사용자면 None)"""
+    c.execute('SELECT token FROM search_scopes WHERE user_id = ?', (user_id,))
+    row = c.fetchone()
+    if row is None:
+        return None
+    return f'user_scope : "{row[0]}" AND {{question options explanation}} : ({query})'
+
+def _like_pattern(text):
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def _search_rows(rows, page_size):
+    results = []
+    for r in rows[:page_size]:
+        results.append({
+            "id": r[0],
+            "category": r[1],
+            "question": r[2],
+            "options_json": r[3],
+            "answer": r[4],
+            "explanation": r[5],
+            "snippet": r[6]
+        })
+    return results, len(rows) > page_size
+
+@metrics.timed("db_call_seconds")
+def search_review_notes(user_id, text, page=0, page_size=SEARCH_PAGE_SIZE):
+    """
+    내 오답노트 검색 (최근 일치 SEARCH_RANK_CANDIDATES개 안에서 관련도순, page는 0부터). (결과 리스트, 다음 페이지 있음) 반환
+    2글자 검색어나 색인이 없는 SQLite(SEARCH_ENABLED가 꺼짐)에서는 내 노트를 최신순으로 훑음
+    """
+    text = ' '.join((text or '').split())
+    if len(text) < 2:
+        return [], False
+    query = _match_query(text) if SEARCH_ENABLED else None
+    with _connection() as conn:
+        c = conn.cursor()
+        if query:
+            match = _review_match(c, user_id, query)
+            if match is None:
+                return [], False
+            c.execute('''
+                SELECT n.id, n.category, n.question, n.options, n.answer, n.explanation,
+                       snippet(review_notes_fts, -1, '**', '**', '…', 24)
+                FROM review_notes_fts JOIN review_notes AS n ON n.id = review_notes_fts.rowid
+                WHERE review_notes_fts MATCH ?1 AND n.user_id = ?2
+                  AND review_notes_fts.rowid >= (
+                      SELECT MIN(rowid) FROM (
+                          SELECT rowid FROM review_notes_fts WHERE review_notes_fts MATCH ?1
+                          ORDER BY rowid DESC LIMIT ?3
+                      )
+                  )
+                ORDER BY review_notes_fts.rank LIMIT ?4 OFFSET ?5
+            ''', (match, user_id, SEARCH_RANK_CANDIDATES, page_size + 1, page * page_size))
+        else:
+            c.execute('''
+                SELECT id, category, question, options, answer, explanation, NULL FROM review_notes
+                WHERE user_id = ?1
+                  AND (question LIKE ?2 ESCAPE '\\' OR options LIKE ?2 ESCAPE '\\' OR explanation LIKE ?2 ESCAPE '\\')
+                ORDER BY timestamp DESC, id DESC LIMIT ?3 OFFSET ?4
+            ''', (user_id, _like_pattern(text), page_size + 1, page * page_size))
+        rows = c.fetchall()
+    return _search_rows(rows, page_size)
+
+@metrics.timed("db_call_seconds")
+def search_pool_questions(user_id, text, page=0, page_size=SEARCH_PAGE_SIZE):
+    """
+    문제 은행 검색: 사용자가 이미 받은 문제만 (안 본 문제의 정답이 미리 보이지 않도록)
+    (결과 리스트, 다음 페이지 있음) 반환, 2글자 검색어나 색인이 없으면 받은 문제를 훑음
+    """
+    text = ' '.join((text or '').split())
+    if len(text) < 2:
+        return [], False
+    query = _match_query(text) if SEARCH_ENABLED else None
+    with _connection() as conn:
+        c = conn.cursor()
+        if query:
+            c.execute('''
+                SELECT p.id, p.category, p.question, p.options, p.answer, p.explanation,
+                       snippet(question_pool_fts, -1, '**', '**', '…', 24)
+                FROM question_pool_fts JOIN question_pool AS p ON p.id = question_pool_fts.rowid
+                WHERE question_pool_fts MATCH ?
+                  AND p.id IN (SELECT question_id FROM question_pool_seen WHERE user_id = ?)
+                ORDER BY question_pool_fts.rank LIMIT ? OFFSET ?
+            ''', (query, user_id, page_size + 1, page * page_size))
+        else:
+            c.execute('''
+                SELECT p.id, p.category, p.question, p.options, p.answer, p.explanation, NULL
+                FROM question_pool_seen AS s JOIN question_pool AS p ON p.id = s.question_id
+                WHERE s.user_id = ?1
+                  AND (p.question LIKE ?2 ESCAPE '\\' OR p.options LIKE ?2 ESCAPE '\\' OR p.explanation LIKE ?2 ESCAPE '\\')
+                ORDER BY p.id DESC LIMIT ?3 OFFSET ?4
+            ''', (user_id, _like_pattern(text), page_size + 1, page * page_size))
+        rows = c.fetchall()
+    return _search_rows(rows, page_size)
+
+# [추가] 시험 세션 저장 관련 함수 (session_store의 SQLite 백엔드)
+@metrics.timed("db_call_seconds")
+def save_exam_batch(user_id, batch, state):
+    """문제 묶음(압축된 bytes)과 진행 상태(JSON 문자열)를 함께 저장 (새 시험 또는 문제가 늘었을 때)"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            INSERT INTO exam_sessions (user_id, batch, state, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_id) DO UPDATE SET
+                batch = excluded.batch, state = excluded.state, updated_at = CURRENT_TIMESTAMP
+        ''', (user_id, sqlite3.Binary(batch), state))
+
+@metrics.timed("db_call_seconds")
+def save_exam_state(user_id, state):
+    """진행 상태만 갱신 (문제 묶음은 다시 쓰지 않음)"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('UPDATE exam_sessions SET state = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?',
+                  (state, user_id))
+
+@metrics.timed("db_call_seconds")
+def load_exam_session(user_id):
+    """(문제 묶음 bytes, 진행 상태 JSON 문자열) 또는 None"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT batch, state FROM exam_sessions WHERE user_id = ?', (user_id,))
+        row = c.fetchone()
+    if row is None:
+        return None
+    return bytes(row[0]), row[1]
+
+@metrics.timed("db_call_seconds")
+def delete_exam_session(user_id):
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('DELETE FROM exam_sessions WHERE user_id = ?', (user_id,))
+
+# [추가] 문제 생성 작업 큐 관련 함수
+@metrics.timed("db_call_seconds")
+def enqueue_generation_job(kind, job_key, subject=None, user_id=None, count=20, owner=None):
+    """
+    생성 작업을 큐에 넣고 (작업 id, 새로 넣었는지) 반환
+    같은 job_key의 작업이 이미 대기/실행 중이면 새로 넣지 않고 그 작업 id를 돌려줌 (대기 중이면 count는 큰 쪽으로)
+    owner가 있으면 그 프로세스만 가져감 (claim_generation_job)
+    """
+    with _connection() as conn:
+        c = conn.cursor()
+        for _ in range(3):
+            c.execute('''
+                INSERT INTO generation_jobs (kind, job_key, subject, user_id, count, owner, status, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, 'queued', CURRENT_TIMESTAMP)
+                ON CONFLICT (job_key) WHERE status IN ('queued', 'running') DO NOTHING
+                RETURNING id
+            ''', (kind, job_key, subject, user_id, count, owner))
+            row = c.fetchone()
+            if row:
+                return row[0], True
+            c.execute("SELECT id FROM generation_jobs WHERE job_key = ? AND status IN ('queued', 'running')", (job_key,))
+            row = c.fetchone()
+            if row:
+                # 아직 대기 중이면 더 많이 필요한 요청에 맞춰 생성 수를 늘림 (실행 중이면 끝난 뒤 호출한 쪽이 다시 요청)
+                c.execute("UPDATE generation_jobs SET count = MAX(count, ?) WHERE id = ? AND status = 'queued'",
+                          (count, row[0]))
+                return row[0], False
+    return None, False
+
+@metrics.timed("db_call_seconds")
+def claim_generation_job(owner=None):
+    """
+    가장 오래 기다린 작업 하나를 실행 중으로 바꾸고 dict로 반환 (없으면 None)
+    다른 프로세스 전용(owner) 작업은 건너뛰고, 가져간 프로세스를 worker에 기록
+    """
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            UPDATE generation_jobs SET status = 'running', started_at = CURRENT_TIMESTAMP, worker = ?1
+            WHERE id = (
+                SELECT id FROM generation_jobs
+                WHERE status = 'queued' AND (owner IS NULL OR owner = ?1)
+                ORDER BY id LIMIT 1
+            )
+            RETURNING id, kind, subject, user_id, count
+        ''', (owner,))
+        row = c.fetchone()
+    if row is None:
+        return None
+    return {"id": row[0], "kind": row[1], "subject": row[2], "user_id": row[3], "count": row[4]}
+
+@metrics.timed("db_call_seconds")
+def finish_generation_job(job_id, produced, error=None):
+    """작업 완료 기록 (하나도 만들지 못했으면 failed)"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            UPDATE generation_jobs SET status = ?, produced = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', ('done' if produced else 'failed', produced, error, job_id))
+
+@metrics.timed("db_call_seconds")
+def get_generation_job(job_id):
+    """작업 상태 조회 (기본키 한 행) {status, produced, error} 또는 None"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT status, produced, error FROM generation_jobs WHERE id = ?', (job_id,))
+        row = c.fetchone()
+    if row is None:
+        return None
+    return {"status": row[0], "produced": row[1], "error": row[2]}
+
+@metrics.timed("db_call_seconds")
+def count_active_generation_jobs():
+    """대기/실행 중인 작업 수"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*) FROM generation_jobs WHERE status IN ('queued', 'running')")
+        return c.fetchone()[0]
+
+@metrics.timed("db_call_seconds")
+def beat_generation_worker(process_id):
+    """이 프로세스의 워커가 살아 있음을 기록"""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            INSERT INTO generation_workers (process_id, heartbeat_at) VALUES (?, CURRENT_TIMESTAMP)
+            ON CONFLICT (process_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at
+        ''', (process_id,))
 
+@metrics.timed("db_call_seconds")
+def recover_generation_jobs(stale_seconds, dead_seconds, owner=None, active_ids=(), keep_days=1):
+    """
+    죽은 워커의 작업 정리 (워커 시작 시와 하트비트마다 호출)
+    - dead_seconds 동안 하트비트가 없는 프로세스가 실행하던 작업은 다시 대기로
+      (그 프로세스 전용 작업은 다른 곳에서 실행할 수 없으므로 대기/실행 중이든 실패로)
+    - owner(이 프로세스)가 실행 중으로 남긴 작업도 active_ids(지금 실제로 실행 중인 작업)에 없으면 다시 대기로
+      (완료 기록에 실패한 작업, 막 가져간 작업은 dead_seconds 동안 건드리지 않음)
+    - 실행한 프로세스 기록이 없는 예전 작업은 stale_seconds보다 오래 실행 중이면 다시 대기로
+    - keep_days보다 오래된 완료 작업과 워커 기록은 삭제
+    """
+    dead = f'-{int(dead_seconds)} seconds'
+    alive = '''SELECT process_id FROM generation_workers WHERE heartbeat_at >= datetime('now', :dead)'''
+    params = {"owner": owner or '', "dead": dead, "stale": f'-{int(stale_seconds)} seconds',
+              "keep": f'-{int(keep_days)} days', "active": json.dumps(list(active_ids))}
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute(f'''
+            UPDATE generation_jobs SET status = 'failed', error = 'Owner process is gone', finished_at = CURRENT_TIMESTAMP
+            WHERE status IN ('queued', 'running') AND owner IS NOT NULL AND owner != :owner
+              AND owner NOT IN ({alive}) AND created_at < datetime('now', :dead)
+        ''', params)
+        c.execute(f'''
+            UPDATE generation_jobs SET status = 'queued', started_at = NULL, worker = NULL
+            WHERE status = 'running' AND (
+                (worker IS NULL AND started_at < datetime('now', :stale))
+                OR (worker IS NOT NULL AND worker != :owner AND worker NOT IN ({alive}))
+                OR (worker = :owner AND started_at < datetime('now', :dead)
+                    AND id NOT IN (SELECT value FROM json_each(:active)))
+            )
+        ''', params)
+        recovered = c.rowcount
+        c.execute('''
+            DELETE FROM generation_jobs
+            WHERE status IN ('done', 'failed') AND finished_at < datetime('now', :keep)
+        ''', params)
+        c.execute("DELETE FROM generation_workers WHERE heartbeat_at < datetime('now', :keep)", params)
+    return recovered
 
 if __name__ == "__main__":
     init_db()
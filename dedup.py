@@ -0,0 +1,58 @@
+import hashlib
+import random
+import re
+
+# MinHash 설정: 문자 3-gram 슁글, 32개 해시 함수
+SHINGLE_SIZE = 3
+NUM_PERM = 32
+# 이 이상 비슷하면 같은 문제로 보고 버림
+NEAR_DUP_THRESHOLD = 0.8
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240101)  # 프로세스가 달라도 같은 서명이 나오도록 고정 시드
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize_text(text):
+    """비교용 정규화: 앞 번호("1.", "3)") 제거, 공백/문장부호 제거, 소문자"""
+    text = re.sub(r'^\s*\d+\s*[.)]\s*', '', str(text or ''))
+    return re.sub(r'[\s\W_]+', '', text).lower()
+
+
+def content_hash(question, options=()):
+    """문제 본문 + 보기의 정규화 해시 (오답노트/문제 풀 중복 판정 키)"""
+    parts = [normalize_text(question)] + [normalize_text(o) for o in options or ()]
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def minhash_signature(q):
+    """문제 dict의 MinHash 서명"""
+    text = normalize_text(q.get('question', '')) + ''.join(normalize_text(o) for o in q.get('options', []) or [])
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little') for s in shingles]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def similarity(sig_a, sig_b):
+    """두 서명의 추정 Jaccard 유사도"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def drop_near_duplicates(questions, signatures=None, threshold=NEAR_DUP_THRESHOLD):
+    """
+    배치에서 거의 같은 문제를 걸러낸 리스트를 반환합니다.
+    signatures(이미 받은 문제들의 서명 리스트)를 넘기면 그것과도 비교하고, 통과한 서명을 추가합니다.
+    """
+    if signatures is None:
+        signatures = []
+    kept = []
+    for q in questions:
+        sig = minhash_signature(q)
+        if any(similarity(sig, other) >= threshold for other in signatures):
+            continue
+        signatures.append(sig)
+        kept.append(q)
+    return kept
@@ -0,0 +1,580 @@
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import http_client
+import dedup
+import key_scheduler
+import metrics
+import question_parser
+
+API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+
+SUBJECTS = question_parser.SUBJECTS
+
+# 샤드 생성: 이 시간(초) 안에 응답이 없으면 다른 키로 같은 샤드를 한 번 더 요청
+SHARD_HEDGE_AFTER = 20
+
+# 모델 조회 결과 캐시 유지 시간 (초)
+MODEL_CACHE_TTL = 60 * 60
+
+# 구조화 출력: 지원하는 모델에는 응답 스키마(responseSchema)와 짧은 프롬프트를 보냄
+# (코드블록/설명 없는 JSON만 받으므로 출력 토큰과 파싱 시간이 줄어듦)
+STRUCTURED_OUTPUT = True
+QUESTION_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "category": {"type": "STRING", "enum": SUBJECTS},
+            "question": {"type": "STRING"},
+            "options": {"type": "ARRAY", "items": {"type": "STRING"}, "minItems": 5, "maxItems": 5},
+            "answer": {"type": "INTEGER", "minimum": 0, "maximum": 4},
+            "explanation": {"type": "STRING"},
+        },
+        "required": ["category", "question", "options", "answer", "explanation"],
+        "propertyOrdering": ["category", "question", "options", "answer", "explanation"],
+    },
+}
+# 스키마 요청에 400을 낸 모델 (이후로는 예전 프롬프트로 요청)
+_schema_unsupported = set()
+# 최근 요청별 토큰/지연 기록 (벤치마크/디버그용)
+USAGE_HISTORY = 200
+_usage_history = deque(maxlen=USAGE_HISTORY)
+
+# 프로세스 전체(모든 Streamlit 세션)가 공유하는 모델 캐시
+# api_key -> (모델명, 만료 시각)
+_model_cache = {}
+_model_cache_lock = threading.Lock()
+# 같은 키에 대한 동시 조회를 막기 위한 키별 락
+_key_locks = {}
+_warmed_keys = set()
+
+
+def _get_key_lock(api_key):
+    with _model_cache_lock:
+        lock = _key_locks.get(api_key)
+        if lock is None:
+            lock = threading.Lock()
+            _key_locks[api_key] = lock
+        return lock
+
+
+def _forget_key(api_key):
+    """스케줄러가 오래 안 쓴 사용자 키를 버릴 때 그 키의 모델 캐시와 락도 정리"""
+    with _model_cache_lock:
+        _model_cache.pop(api_key, None)
+        _key_locks.pop(api_key, None)
+        _warmed_keys.discard(api_key)
+
+
+key_scheduler.on_evict(_forget_key)
+
+
+def _pick_model(models):
+    """Flash 모델 우선, 없으면 generateContent 지원 모델 아무거나"""
+    for m in models:
+        if 'flash' in m.get('name', '').lower() and 'generateContent' in m.get('supportedGenerationMethods', []):
+            return m.get('name')
+    for m in models:
+        if 'generateContent' in m.get('supportedGenerationMethods', []):
+            return m.get('name')
+    return None
+
+
+def _cached_model(api_key):
+    with _model_cache_lock:
+        entry = _model_cache.get(api_key)
+        if entry and entry[1] > time.time():
+            return entry[0]
+    return None
+
+
+def resolve_model(api_key):
+    """
+    키에 사용할 모델명을 반환합니다. (model_name, error)
+    캐시가 살아있으면 네트워크 호출 없이 바로 반환합니다.
+    """
+    model_name = _cached_model(api_key)
+    if model_name:
+        return model_name, None
+
+    # 첫 세션만 조회 비용을 내고, 동시에 들어온 세션은 결과를 기다림
+    with _get_key_lock(api_key):
+        model_name = _cached_model(api_key)
+        if model_name:
+            return model_name, None
+
+        list_url = f"{API_BASE}/models?key={api_key}"
+        started = time.perf_counter()
+        resp = http_client.get(list_url, read_timeout=5)
+        metrics.observe("gemini_list_models_seconds", time.perf_counter() - started, status=resp.status_code)
+        if resp.status_code != 200:
+            # 목록 조회가 400/401/403이면 키 자체가 잘못된 것: 스케줄러가 한동안 건너뜀
+            key_scheduler.report_failure(
+                api_key, resp.status_code, key_scheduler.parse_retry_after(resp.headers.get('Retry-After')),
+                started=False, invalid_key=resp.status_code in (400, 401, 403))
+            return None, f"List Error {resp.status_code}"
+
+        model_name = _pick_model(resp.json().get('models', []))
+        if not model_name:
+            return None, "No Model Found"
+
+        with _model_cache_lock:
+            _model_cache[api_key] = (model_name, time.time() + MODEL_CACHE_TTL)
+        return model_name, None
+
+
+def invalidate_model(api_key):
+    """생성 요청이 404/400으로 실패했을 때 캐시된 모델을 버림"""
+    with _model_cache_lock:
+        _model_cache.pop(api_key, None)
+
+
+def warm_up(api_keys):
+    """프로세스 시작 시 백그라운드에서 키별 모델을 미리 조회 (중복 호출 무시)"""
+    with _model_cache_lock:
+        new_keys = [k for k in api_keys if k not in _warmed_keys]
+        _warmed_keys.update(new_keys)
+    if not new_keys:
+        return
+
+    def _run():
+        for api_key in new_keys:
+            try:
+                resolve_model(api_key)
+            except Exception:
+                pass
+
+    threading.Thread(target=_run, name="gemini-warm-up", daemon=True).start()
+
+
+def _supports_schema(model_name):
+    """응답 스키마를 지원하는 모델인지 (1.0 세대 제외, 한 번 거부한 모델 제외)"""
+    name = (model_name or "").lower()
+    if not STRUCTURED_OUTPUT or name in _schema_unsupported:
+        return False
+    return "1.0" not in name and not name.endswith("gemini-pro")
+
+
+def _generation_config(model_name):
+    """모델에 맞는 generationConfig (없으면 None)"""
+    if _supports_schema(model_name):
+        return {"responseMimeType": "application/json", "responseSchema": QUESTION_SCHEMA}
+    if "1.5" in (model_name or ""):
+        return {"response_mime_type": "application/json"}
+    return None
+
+
+def _build_prompt(count, subject=None, structured=False):
+    if subject:
+        scope = f"[{subject}] 과목에서"
+        spread = "과목 내 세부 영역을 골고루 분배하세요."
+    else:
+        scope = "[물리치료 기초, 진단평가, 중재, 의료관계법규, 실기] 전 범위에서"
+        spread = "각 과목을 골고루 분배하세요."
+    if structured:
+        # 형식은 스키마가 정하므로 내용 조건만
+        return (f"물리치료사 국가고시 출제위원으로서 {scope} 5지선다 객관식 총 {count}개 출제.\n"
+                f"난이도: 국시 합격률 40% 수준의 변별력. {spread}\n"
+                "answer: 정답 보기의 0부터 센 번호. explanation: 핵심 근거만 간결하게.")
+    return f"""
+            당신은 대한민국 물리치료사 국가고시 출제 위원입니다.
+            {scope}
+            총 {count}개의 객관식 문제를 출제하여 JSON 리스트로 반환하세요.
+            
+            [조건]
+            1. 난이도: 실제 국시 합격률 40% 수준의 변별력 있는 문제
+            2. {spread}
+            3. 5지 선다형
+            4. answer는 정답 보기의 번호를 0부터 센 정수(0~4)
+            
+            [응답 형식]
+            반드시 아래와 같은 JSON 배열 포맷만 출력하세요. (Markdown codeblock 금지)
+            [
+              {{
+                "category": "과목명",
+                "question": "1. 문제 내용...",
+                "options": ["보기1", "보기2", "보기3", "보기4", "보기5"],
+                "answer": 0,
+                "explanation": "해설..."
+              }},
+              ... 
+            ]
+            """
+
+
+def _build_payload(model_name, count, subject=None):
+    """(요청 payload, generationConfig) - 모델이 지원하면 스키마 + 짧은 프롬프트"""
+    config = _generation_config(model_name)
+    structured = bool(config and "responseSchema" in config)
+    payload = {"contents": [{"parts": [{"text": _build_prompt(count, subject, structured)}]}]}
+    if config:
+        payload["generationConfig"] = config
+    return payload, config
+
+
+def _record_usage(method, label, model_name, status, seconds, usage, questions):
+    """요청 한 건의 토큰 수(usageMetadata)와 지연을 기록"""
+    usage = usage or {}
+    record = {
+        "method": method,
+        "key": label,
+        "model": model_name,
+        "status": status,
+        "seconds": round(seconds, 3),
+        "prompt_tokens": usage.get("promptTokenCount"),
+        "output_tokens": usage.get("candidatesTokenCount"),
+        "thought_tokens": usage.get("thoughtsTokenCount"),
+        "total_tokens": usage.get("totalTokenCount"),
+        "questions": questions,
+    }
+    _usage_history.append(record)
+    for kind in ("prompt", "output", "thought", "total"):
+        if record[f"{kind}_tokens"]:
+            metrics.inc("gemini_tokens_total", record[f"{kind}_tokens"], kind=kind, method=method, model=model_name)
+
+
+def recent_usage():
+    """최근 요청별 기록 리스트 (오래된 것부터)"""
+    return list(_usage_history)
+
+
+def _generate_with_key(api_key, count, subject=None, label="Key"):
+    """키 하나로 문제를 생성하여 (문제 리스트, 에러 메시지)로 반환 (결과는 키 스케줄러에 기록)"""
+    try:
+        # 1. 모델 찾기 (프로세스 공용 캐시, 만료 시에만 목록 조회)
+        valid_model_name, model_error = resolve_model(api_key)
+    except Exception as e:
+        return None, str(e)
+    if not valid_model_name:
+        return None, f"{label} {model_error}"
+
+    key_scheduler.start_request(api_key)
+    started = time.time()
+    status = None
+    retry_after = None
+    try:
+        # 2. 배치 생성 요청
+        generate_url = f"{API_BASE}/{valid_model_name}:generateContent?key={api_key}"
+        payload, config = _build_payload(valid_model_name, count, subject)
+        
+        # 공유 세션으로 keep-alive 연결 재사용, 읽기 타임아웃 180초 (3분) - 대량 생성이라 시간 필요
+        r = http_client.post(generate_url, payload, read_timeout=180)
+        status = r.status_code
+        metrics.observe("gemini_request_seconds", time.time() - started,
+                        method="generate", key=label, model=valid_model_name, status=status)
+        
+        if r.status_code == 200:
+            body = r.json()
+            text = body['candidates'][0]['content']['parts'][0]['text']
+
+            # 배열 일부가 깨져도 온전한 문제는 살림 (모자란 개수는 호출한 쪽이 다시 요청)
+            with metrics.timer("question_parse_seconds"):
+                clean_list, rejected = question_parser.parse_questions(text, subject)
+            metrics.inc("questions_parsed_total", len(clean_list))
+            metrics.inc("questions_rejected_total", rejected)
+            _record_usage("generate", label, valid_model_name, status, time.time() - started,
+                          body.get('usageMetadata'), len(clean_list))
+            if clean_list:
+                key_scheduler.report_success(api_key, time.time() - started)
+                return clean_list[:count], None
+
+            error = f"{label} JSON Parse Error"
+
+        elif r.status_code == 429:
+            retry_after = key_scheduler.parse_retry_after(r.headers.get('Retry-After'))
+            error = f"{label} Quota Exceeded (429)"
+        elif r.status_code in (400, 404):
+            # 모델이 사라졌거나 바뀐 경우: 다음 호출에서 다시 조회하도록 캐시 무효화
+            invalidate_model(api_key)
+            _reject_schema(valid_model_name, config, r.status_code)
+            error = f"{label} Error {r.status_code}"
+        else:
+            error = f"{label} Error {r.status_code}"
+            
+    except Exception as e:
+        error = str(e)
+
+    key_scheduler.report_failure(api_key, status, retry_after, time.time() - started)
+    return None, error
+
+
+def _reject_schema(model_name, config, status):
+    """스키마를 보낸 요청이 400이면 그 모델은 이후 예전 형식으로 요청"""
+    if status == 400 and config and "responseSchema" in config:
+        _schema_unsupported.add((model_name or "").lower())
+
+
+def _key_label(api_keys_list, api_key):
+    return f"Key #{list(api_keys_list).index(api_key) + 1}"
+
+
+def _pick_ordered_keys(api_keys_list):
+    """스케줄러 기준 좋은 키부터 (쿨다운 중인 키 제외), 없으면 (빈 리스트, 에러)"""
+    keys = key_scheduler.pick_keys(api_keys_list, len(api_keys_list))
+    if not keys:
+        wait_sec = key_scheduler.cooldown_remaining(api_keys_list)
+        return [], f"All keys cooling down ({wait_sec:.0f}s)"
+    return keys, None
+
+
+@metrics.timed("generation_seconds")
+def generate_exam_batch(api_keys_list, count=20, subject=None):
+    """
+    한 번의 요청으로 20문제를 생성하여 (문제 리스트, 에러 메시지)로 반환합니다.
+    (단순/고속 모드: 키 순환 후 실패 시 즉시 종료, subject를 주면 그 과목만)
+    Streamlit에 의존하지 않으므로 백그라운드 스레드에서도 호출할 수 있습니다.
+    """
+    if not api_keys_list: return None, "No API Key"
+        
+    # 키 스케줄러가 고른 순서 (429 쿨다운 중인 키는 호출 없이 건너뜀)
+    ordered_keys, last_error = _pick_ordered_keys(api_keys_list)
+    
+    # 키 하나씩 시도: 일부만 살아오면 모자란 개수만 다음 키에 요청
+    questions = []
+    signatures = []
+    for api_key in ordered_keys:
+        got, error = _generate_with_key(api_key, count - len(questions), subject, _key_label(api_keys_list, api_key))
+        if not got:
+            last_error = error
+            continue
+        questions.extend(dedup.drop_near_duplicates(got, signatures))
+        if len(questions) >= count:
+            break
+
+    if questions:
+        return questions[:count], None
+    return None, last_error
+
+
+def _split_shards(count):
+    """과목별 샤드 (과목, 문제 수) 목록"""
+    base, extra = divmod(count, len(SUBJECTS))
+    shards = []
+    for i, subject in enumerate(SUBJECTS):
+        n = base + (1 if i < extra else 0)
+        if n > 0:
+            shards.append((subject, n))
+    return shards
+
+
+def _iter_shard_results(api_keys_list, count, hedge_after):
+    """
+    과목별 샤드를 여러 키로 동시에 요청하고, 샤드가 끝날 때마다
+    (새로 합쳐진 중복 제거 문제 리스트, 마지막 에러)를 내보냅니다.
+    느린 샤드는 hedge_after 초 뒤 다른 키로 한 번 더 요청하고, 먼저 온 응답을 씁니다.
+    응답이 일부만 살아오면 그 샤드의 모자란 개수만 다른 키로 다시 요청합니다.
+    """
+    keys, last_error = _pick_ordered_keys(api_keys_list)
+    if not keys:
+        yield [], last_error
+        return
+    shards = _split_shards(count)
+
+    executor = ThreadPoolExecutor(max_workers=min(len(shards) * 2, 16), thread_name_prefix="gemini-shard")
+    in_flight = {}                        # future -> (샤드 번호, 요청 시각)
+    used_keys = [set() for _ in shards]   # 샤드별로 이미 쓴 키 번호
+    need = [n for _, n in shards]         # 샤드별 아직 모자란 문제 수
+    finished = [False] * len(shards)
+    next_key = [0]
+    signatures = []                       # 이미 받은 문제들의 MinHash 서명 (샤드 간 유사 문제 제거)
+
+    def _submit(shard_idx):
+        # 점수 순 키 목록을 라운드 로빈으로 돌며 이 샤드가 아직 안 쓴, 쉬는 중이 아닌 키를 고름
+        for _ in range(len(keys)):
+            key_idx = next_key[0] % len(keys)
+            next_key[0] += 1
+            if key_idx not in used_keys[shard_idx] and key_scheduler.is_available(keys[key_idx]):
+                used_keys[shard_idx].add(key_idx)
+                subject = shards[shard_idx][0]
+                label = _key_label(api_keys_list, keys[key_idx])
+                future = executor.submit(_generate_with_key, keys[key_idx], need[shard_idx], subject, label)
+                in_flight[future] = (shard_idx, time.time())
+                return True
+        return False
+
+    try:
+        for shard_idx in range(len(shards)):
+            _submit(shard_idx)
+
+        while in_flight:
+            done, _ = wait(list(in_flight), timeout=0.5, return_when=FIRST_COMPLETED)
+            new_questions = []
+            for future in done:
+                shard_idx, _ = in_flight.pop(future)
+                if finished[shard_idx]:
+                    continue  # 헤지 요청 중 늦게 온 쪽은 버림
+                questions, error = future.result()
+                if questions:
+                    kept = dedup.drop_near_duplicates(questions[:need[shard_idx]], signatures)
+                    need[shard_idx] -= len(kept)
+                    new_questions.extend(kept)
+                    finished[shard_idx] = need[shard_idx] <= 0
+                else:
+                    last_error = error
+                # 모자라고 같은 샤드의 다른 요청이 진행 중이 아니면 다음 키로 (남은 개수만) 재요청
+                if not finished[shard_idx] and not any(s == shard_idx for s, _ in in_flight.values()):
+                    _submit(shard_idx)
+
+            # 느린 샤드 헤지: 요청이 하나뿐이고 오래 걸리면 다른 키로 한 번 더
+            now = time.time()
+            for shard_idx in range(len(shards)):
+                if finished[shard_idx]:
+                    continue
+                started = [t for s, t in in_flight.values() if s == shard_idx]
+                if len(started) == 1 and now - started[0] > hedge_after:
+                    _submit(shard_idx)
+
+            if new_questions:
+                yield new_questions, last_error
+        yield [], last_error
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _return_first(results, min_count, on_late_results):
+    """
+    (새 문제 리스트, 에러) 이터레이터에서 min_count개가 모이면 바로 반환하고,
+    나머지는 백그라운드 스레드에서 on_late_results(문제 리스트, 완료 여부)로 넘김
+    """
+    questions = []
+    last_error = "Unknown Error"
+    for new_questions, last_error in results:
+        questions.extend(new_questions)
+        if len(questions) >= min_count:
+            break
+
+    if not questions:
+        results.close()
+        return None, last_error
+
+    def _drain():
+        try:
+            for late_questions, _ in results:
+                if late_questions and on_late_results:
+                    on_late_results(late_questions, False)
+        finally:
+            if on_late_results:
+                on_late_results([], True)
+
+    threading.Thread(target=_drain, name="gemini-drain", daemon=True).start()
+    return questions, None
+
+
+@metrics.timed("generation_seconds")
+def generate_exam_batch_sharded(api_keys_list, count=20, min_count=None, on_late_results=None,
+                                hedge_after=SHARD_HEDGE_AFTER):
+    """
+    과목별 병렬 생성 모드. (문제 리스트, 에러 메시지)로 반환합니다.
+    min_count개가 모이는 즉시 반환하고, 나머지 샤드는 백그라운드에서 계속 받아
+    on_late_results(문제 리스트, 완료 여부)로 넘깁니다.
+    """
+    if not api_keys_list: return None, "No API Key"
+    if min_count is None: min_count = count
+
+    results = _iter_shard_results(api_keys_list, count, hedge_after)
+    return _return_first(results, min_count, on_late_results)
+
+
+def _iter_stream_texts(resp, usage=None):
+    """streamGenerateContent(SSE) 응답에서 텍스트 조각만 꺼냄 (usage dict를 주면 usageMetadata를 채움)"""
+    resp.encoding = 'utf-8'
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line or not line.startswith('data:'):
+            continue
+        chunk = json.loads(line[5:])
+        if usage is not None and chunk.get('usageMetadata'):
+            usage.update(chunk['usageMetadata'])  # 마지막 조각의 누적값이 최종값
+        for cand in chunk.get('candidates', []):
+            for part in cand.get('content', {}).get('parts', []):
+                yield part.get('text', '')
+
+
+def _stream_with_key(api_key, count, errors, label="Key"):
+    """키 하나로 스트리밍 생성, 완성된 문제를 도착 즉시 하나씩 내보냄 (실패 사유는 errors에 추가)"""
+    try:
+        valid_model_name, model_error = resolve_model(api_key)
+    except Exception as e:
+        errors.append(str(e))
+        return
+    if not valid_model_name:
+        errors.append(f"{label} {model_error}")
+        return
+
+    key_scheduler.start_request(api_key)
+    started = time.time()
+    status = None
+    retry_after = None
+    got = 0
+    usage = {}
+    try:
+        stream_url = f"{API_BASE}/{valid_model_name}:streamGenerateContent?alt=sse&key={api_key}"
+        payload, config = _build_payload(valid_model_name, count)
+
+        # 연결은 빨리 포기하고, 조각 사이 대기는 넉넉히
+        with http_client.post(stream_url, payload, read_timeout=180, stream=True) as r:
+            status = r.status_code
+            if r.status_code != 200:
+                if r.status_code == 429:
+                    retry_after = key_scheduler.parse_retry_after(r.headers.get('Retry-After'))
+                    errors.append(f"{label} Quota Exceeded (429)")
+                else:
+                    if r.status_code in (400, 404):
+                        invalidate_model(api_key)
+                        _reject_schema(valid_model_name, config, r.status_code)
+                    errors.append(f"{label} Error {r.status_code}")
+                return
+
+            base_state = {}
+            for item in question_parser.iter_json_objects(_iter_stream_texts(r, usage)):
+                item = question_parser.validate_question(item, base_state=base_state)
+                if item:
+                    got += 1
+                    yield item
+            if got == 0:
+                errors.append(f"{label} JSON Parse Error")
+
+    except Exception as e:
+        errors.append(str(e))
+    finally:
+        metrics.observe("gemini_request_seconds", time.time() - started,
+                        method="stream", key=label, model=valid_model_name, status=status)
+        metrics.inc("questions_parsed_total", got)
+        # 필요한 만큼 받고 먼저 닫았으면 usageMetadata가 없음 (토큰은 기록하지 않고 지연만)
+        _record_usage("stream", label, valid_model_name, status, time.time() - started, usage, got)
+        # 소비자가 필요한 만큼 받고 닫은 경우(GeneratorExit)도 성공으로 기록
+        if got > 0:
+            key_scheduler.report_success(api_key, time.time() - started)
+        else:
+            key_scheduler.report_failure(api_key, status, retry_after, time.time() - started)
+
+
+def _iter_stream_results(api_keys_list, count):
+    """키를 좋은 순서대로 스트리밍, 중간에 끊기면 남은 개수만 다음 키에 요청"""
+    keys, first_error = _pick_ordered_keys(api_keys_list)
+    signatures = []
+    errors = [first_error or "Unknown Error"]
+    got = 0
+    for api_key in keys:
+        for q in _stream_with_key(api_key, count - got, errors, _key_label(api_keys_list, api_key)):
+            if not dedup.drop_near_duplicates([q], signatures):
+                continue
+            got += 1
+            yield [q], errors[-1]
+            if got >= count:
+                return
+    yield [], errors[-1]
+
+
+@metrics.timed("generation_seconds")
+def generate_exam_batch_streaming(api_keys_list, count=20, min_count=1, on_late_results=None):
+    """
+    스트리밍 생성 모드. 첫 min_count개가 도착하면 (문제 리스트, 에러 메시지)로 바로 반환하고,
+    나머지는 도착하는 대로 on_late_results(문제 리스트, 완료 여부)로 넘깁니다.
+    """
+    if not api_keys_list: return None, "No API Key"
+
+    results = _iter_stream_results(api_keys_list, count)
+    return _return_first(results, min_count, on_late_results)
@@ -0,0 +1,46 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# 연결(TCP+TLS)은 빨리 포기하고, 응답 대기는 넉넉히 (대량 생성이라 시간 필요)
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 180
+# 호스트당 유지할 keep-alive 연결 수 (샤드/헤지 동시 요청 수보다 크게)
+POOL_MAXSIZE = 32
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """프로세스 전체가 공유하는 requests.Session (keep-alive 연결 풀 재사용)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                # gzip 응답은 requests가 자동으로 풀어줌
+                session.headers.update({"Accept-Encoding": "gzip, deflate"})
+                _session = session
+    return _session
+
+
+def reset_session():
+    """연결 풀을 닫고 다음 요청에서 새로 만듦 (벤치마크/설정 변경용)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def get(url, read_timeout=5):
+    return get_session().get(url, timeout=(CONNECT_TIMEOUT, read_timeout))
+
+
+def post(url, payload, read_timeout=READ_TIMEOUT, stream=False):
+    return get_session().post(url, json=payload, headers={'Content-Type': 'application/json'},
+                              timeout=(CONNECT_TIMEOUT, read_timeout), stream=stream)
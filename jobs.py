@@ -0,0 +1,168 @@
+"""
+문제 생성 작업 큐 (SQLite에 기록, 워커 스레드 JOB_WORKERS개가 처리)
+
+Streamlit 스크립트 스레드는 작업을 넣고 id만 받아 상태를 조회합니다. (생성 응답을 기다리며 붙잡히지 않음)
+같은 job_key의 작업이 대기/실행 중이면 새로 만들지 않고 그 작업을 함께 씁니다.
+키별 속도 제한과 쿨다운은 key_scheduler가 맡습니다.
+"""
+import os
+import socket
+import threading
+import time
+import database
+import metrics
+
+# 동시에 실행하는 생성 작업 수 (생성 요청은 네트워크 대기가 대부분이라 스레드로 충분)
+JOB_WORKERS = 3
+# 새 작업 알림이 없어도 이 간격으로 큐 확인 (다른 프로세스가 넣은 작업)
+JOB_POLL_SEC = 2.0
+# 워커 프로세스가 살아 있음을 기록하고 죽은 프로세스의 작업을 정리하는 간격 (초)
+JOB_HEARTBEAT_SEC = 10
+# 이 시간 동안 하트비트가 없는 프로세스는 죽은 것으로 보고 그 작업을 다시 대기로 (전용 작업은 실패로)
+JOB_DEAD_SEC = 45
+# 실행한 프로세스 기록이 없는 (하트비트 이전) 작업은 이보다 오래 실행 중이면 다시 대기로
+JOB_STALE_SEC = 15 * 60
+# 작업 완료 기록이 실패했을 때 (잠김 등) 다시 시도하는 횟수
+FINISH_RETRIES = 3
+
+# 이 프로세스 식별자 (사용자 키 작업처럼 이 프로세스에서만 실행할 작업의 owner)
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# kind -> {"run": 함수(job) -> (만든 문제 수, 에러), "after": 함수(job, 만든 문제 수) 또는 None}
+_handlers = {}
+_wakeup = threading.Event()
+_lock = threading.Lock()
+_started = False
+_running = 0
+# 이 프로세스의 워커가 지금 실행 중인 작업 id (여기 없는데 DB에 이 프로세스 실행 중으로 남은 작업은 정리 대상)
+_active = set()
+
+
+def register(kind, run, after=None):
+    """작업 종류별 처리 함수 등록 (after는 작업이 끝나 기록된 뒤 호출, 후속 작업 넣기용)"""
+    _handlers[kind] = {"run": run, "after": after}
+
+
+def start():
+    """워커 스레드와 하트비트 스레드를 프로세스에서 한 번만 시작 (여러 번 호출해도 됨)"""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    _beat()
+    for n in range(JOB_WORKERS):
+        threading.Thread(target=_worker, name=f"generation-job-{n}", daemon=True).start()
+    threading.Thread(target=_heartbeat, name="generation-heartbeat", daemon=True).start()
+
+
+def submit(kind, job_key, subject=None, user_id=None, count=20, owner=None):
+    """
+    작업을 넣고 작업 id 반환 (같은 작업이 진행 중이면 그 id)
+    owner가 있으면 그 프로세스의 워커만 실행 (메모리에만 있는 키를 쓰는 작업)
+    """
+    start()
+    job_id, created = database.enqueue_generation_job(kind, job_key, subject, user_id, count, owner)
+    metrics.inc("generation_jobs_submitted_total", kind=kind, coalesced="no" if created else "yes")
+    if created:
+        _wakeup.set()
+    return job_id
+
+
+def status(job_id):
+    """
+    {status: queued|running|done|failed, produced, error} 또는 None
+    재시작 뒤 이어 푸는 시험처럼 submit 없이 상태만 보는 프로세스도 워커를 띄워 대기 작업을 처리
+    """
+    if job_id is None:
+        return None
+    start()
+    return database.get_generation_job(job_id)
+
+
+def idle():
+    """이 프로세스의 워커가 쉬고 있고 대기 중인 작업도 없는지 (벤치마크/테스트용)"""
+    return _running == 0 and database.count_active_generation_jobs() == 0
+
+
+def wait_idle(timeout=60):
+    deadline = time.time() + timeout
+    while not idle() and time.time() < deadline:
+        time.sleep(0.05)
+    return idle()
+
+
+def _beat():
+    """하트비트 기록 후 죽은 프로세스가 잡고 있던 작업 정리"""
+    database.beat_generation_worker(PROCESS_ID)
+    with _lock:
+        active = list(_active)
+    recovered = database.recover_generation_jobs(JOB_STALE_SEC, JOB_DEAD_SEC, PROCESS_ID, active)
+    if recovered:
+        metrics.inc("generation_jobs_recovered_total", recovered)
+        _wakeup.set()
+
+
+def _heartbeat():
+    while True:
+        time.sleep(JOB_HEARTBEAT_SEC)
+        try:
+            _beat()
+        except Exception:
+            pass
+
+
+def _worker():
+    global _running
+    while True:
+        with _lock:
+            _running += 1
+        try:
+            job = database.claim_generation_job(PROCESS_ID)
+            if job is not None:
+                with _lock:
+                    _active.add(job["id"])
+                _run(job)
+        except Exception:
+            job = None
+        finally:
+            with _lock:
+                _running -= 1
+        if job is None:
+            _wakeup.wait(JOB_POLL_SEC)
+            _wakeup.clear()
+
+
+def _run(job):
+    handler = _handlers.get(job["kind"])
+    produced, error = 0, "Unknown job kind"
+    started = time.perf_counter()
+    try:
+        if handler is not None:
+            produced, error = handler["run"](job)
+    except Exception as e:
+        produced, error = 0, str(e)
+    finally:
+        _finish(job["id"], produced, error)
+        with _lock:
+            _active.discard(job["id"])
+        metrics.observe("generation_job_seconds", time.perf_counter() - started,
+                        kind=job["kind"], status="done" if produced else "failed")
+    if handler is not None and handler["after"] is not None:
+        handler["after"](job, produced)
+
+
+def _finish(job_id, produced, error):
+    """
+    작업 완료 기록 (실패하면 잠시 쉬고 다시 시도)
+    끝내 기록하지 못한 작업은 _active에서 빠지므로 다음 하트비트의 정리가 다시 대기로 돌림
+    """
+    for attempt in range(FINISH_RETRIES):
+        try:
+            database.finish_generation_job(job_id, produced, error)
+            return True
+        except Exception:
+            if attempt + 1 < FINISH_RETRIES:
+                time.sleep(attempt + 1)
+    metrics.inc("generation_job_finish_errors_total")
+    return False
@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import deque
+import metrics
+
+# 키 하나당 분당 요청 한도 추정치 (무료 등급 Flash 기준)
+KEY_RPM_LIMIT = 15
+# 429에 Retry-After가 없을 때의 기본 대기, 연속 429마다 두 배 (최대 MAX)
+COOLDOWN_BASE = 30
+COOLDOWN_MAX = 10 * 60
+# 키가 잘못되었거나 권한이 없을 때 (401/403, 모델 목록 조회 400) 대기
+INVALID_KEY_COOLDOWN = 30 * 60
+# 지연시간 EWMA 가중치 / 처음 보는 키의 기본 지연 추정 (초)
+LATENCY_ALPHA = 0.3
+DEFAULT_LATENCY = 15.0
+# 서버 키가 아닌 키(사용자가 입력한 키)는 이 시간 동안 안 쓰면 상태를 버림 (쿨다운 중이거나 요청 중이면 유지)
+IDLE_KEY_TTL = 30 * 60
+
+# 프로세스 전체가 공유하는 키 상태: api_key -> dict
+_keys = {}
+# 점수 높은 순으로 정렬된 키 목록 (상태가 바뀔 때만 다시 정렬 → 고르기는 앞에서부터 읽기만 함)
+_ranking = []
+_lock = threading.Lock()
+# 서버(시크릿)의 키: 상태를 버리지 않고 /metrics에도 이 키들만 노출
+_cloud_keys = set()
+# 키 상태를 버릴 때 호출할 함수들 (키별 캐시를 함께 정리)
+_evict_listeners = []
+
+
+def _new_state():
+    return {
+        "successes": 0,
+        "failures": 0,
+        "consecutive_429": 0,
+        "latency_ewma": None,
+        "cooldown_until": 0.0,
+        "in_flight": 0,
+        "recent": deque(),        # 최근 60초 요청 시각 (남은 분당 한도 추정용)
+        "last_status": None,
+        "last_used": time.time(),
+    }
+
+
+def _state(api_key):
+    state = _keys.get(api_key)
+    if state is None:
+        state = _keys[api_key] = _new_state()
+        _ranking.append(api_key)
+    return state
+
+
+def _remaining_quota(state, now):
+    recent = state["recent"]
+    while recent and recent[0] < now - 60:
+        recent.popleft()
+    return KEY_RPM_LIMIT - len(recent)
+
+
+def _quota_wait(state, now):
+    """분당 한도가 찼으면 가장 오래된 요청이 60초 창을 벗어날 때까지 남은 초, 아니면 0"""
+    if _remaining_quota(state, now) > 0:
+        return 0.0
+    return state["recent"][0] + 60 - now
+
+
+def _available(state, now):
+    return state["cooldown_until"] <= now and _remaining_quota(state, now) > 0
+
+
+def _score(state, now):
+    # 성공률(라플라스 보정) / 예상 지연, 동시 요청이 많거나 분당 한도가 찼으면 감점
+    success_rate = (state["successes"] + 1) / (state["successes"] + state["failures"] + 2)
+    latency = state["latency_ewma"] or DEFAULT_LATENCY
+    score = success_rate / latency / (1 + state["in_flight"])
+    if _remaining_quota(state, now) <= 0:
+        score *= 0.01
+    return score
+
+
+def set_cloud_keys(api_keys):
+    with _lock:
+        _cloud_keys.clear()
+        _cloud_keys.update(api_keys or [])
+
+
+def on_evict(listener):
+    """키 상태를 버릴 때 listener(api_key) 호출 (gemini의 키별 모델 캐시 정리용)"""
+    _evict_listeners.append(listener)
+
+
+def _evict_idle(now):
+    """IDLE_KEY_TTL 동안 안 쓴 사용자 키를 목록에서 빼고 뺀 키 목록 반환 (_lock 안에서 호출)"""
+    idle = [k for k, state in _keys.items()
+            if k not in _cloud_keys and state["in_flight"] == 0
+            and state["cooldown_until"] <= now and state["last_used"] < now - IDLE_KEY_TTL]
+    for k in idle:
+        del _keys[k]
+    if idle:
+        _ranking[:] = [k for k in _ranking if k in _keys]
+    return idle
+
+
+def _rerank():
+    now = time.time()
+    _ranking.sort(key=lambda k: _score(_keys[k], now), reverse=True)
+
+
+def pick_keys(api_keys, n=1):
+    """
+    쿨다운이 아닌 키를 점수 높은 순으로 최대 n개 반환 (헤지용으로 여러 개 가능)
+    쿨다운 중이거나 최근 60초에 분당 한도(KEY_RPM_LIMIT)만큼 보낸 키는 네트워크 호출 없이 건너뜀
+    """
+    wanted = set(api_keys)
+    now = time.time()
+    evicted = []
+    with _lock:
+        if any(k not in _keys for k in wanted):
+            # 새 키가 들어올 때 오래 안 쓴 사용자 키를 정리 (사이드바에 입력한 키가 계속 쌓이지 않게)
+            evicted = _evict_idle(now)
+            for k in api_keys:
+                _state(k)
+            _rerank()
+        picked = []
+        for k in _ranking:
+            if k in wanted and _available(_keys[k], now):
+                picked.append(k)
+                if len(picked) >= n:
+                    break
+    for k in evicted:
+        for listener in _evict_listeners:
+            listener(k)
+    return picked
+
+
+def is_available(api_key):
+    with _lock:
+        state = _keys.get(api_key)
+        return state is None or _available(state, time.time())
+
+
+def cooldown_remaining(api_keys):
+    """모든 키가 쉬는 중일 때 가장 빨리 풀리는 키까지 남은 초 (쿨다운과 분당 한도 중 늦은 쪽)"""
+    now = time.time()
+    with _lock:
+        waits = [max(_keys[k]["cooldown_until"] - now, _quota_wait(_keys[k], now)) for k in api_keys if k in _keys]
+    return max(min(waits), 0) if waits else 0
+
+
+def start_request(api_key):
+    with _lock:
+        state = _state(api_key)
+        state["in_flight"] += 1
+        state["last_used"] = time.time()
+        state["recent"].append(state["last_used"])
+        _rerank()
+
+
+def report_success(api_key, latency):
+    with _lock:
+        state = _state(api_key)
+        state["in_flight"] = max(state["in_flight"] - 1, 0)
+        state["successes"] += 1
+        state["consecutive_429"] = 0
+        state["last_status"] = 200
+        prev = state["latency_ewma"]
+        state["latency_ewma"] = latency if prev is None else LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * prev
+        _rerank()
+
+
+def report_failure(api_key, status=None, retry_after=None, latency=None, started=True, invalid_key=False):
+    """
+    실패 기록. 429는 Retry-After(없으면 지수 백오프)만큼, 잘못된 키(401/403)는 길게 쉬게 함
+    started=False는 start_request 없이 난 실패(모델 목록 조회 등)
+    """
+    now = time.time()
+    with _lock:
+        state = _state(api_key)
+        if started:
+            state["in_flight"] = max(state["in_flight"] - 1, 0)
+        state["failures"] += 1
+        state["last_status"] = status
+        if status == 429:
+            state["consecutive_429"] += 1
+            if retry_after is None:
+                retry_after = min(COOLDOWN_BASE * 2 ** (state["consecutive_429"] - 1), COOLDOWN_MAX)
+            state["cooldown_until"] = max(state["cooldown_until"], now + retry_after)
+        elif invalid_key or status in (401, 403):
+            state["cooldown_until"] = now + INVALID_KEY_COOLDOWN
+        if latency is not None and status != 429:
+            prev = state["latency_ewma"]
+            state["latency_ewma"] = latency if prev is None else LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * prev
+        _rerank()
+
+
+def parse_retry_after(value):
+    """Retry-After 헤더(초) 파싱, 없거나 이상하면 None"""
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def snapshot():
+    """모니터링용 서버 키 상태 (키는 뒤 4자리만 노출, 사용자가 입력한 키는 제외)"""
+    now = time.time()
+    with _lock:
+        rows = []
+        for rank, k in enumerate(_ranking):
+            if k not in _cloud_keys:
+                continue
+            state = _keys[k]
+            rows.append({
+                "key": "…" + k[-4:],
+                "rank": rank + 1,
+                "successes": state["successes"],
+                "failures": state["failures"],
+                "latency_ewma": state["latency_ewma"],
+                "cooldown_remaining": max(state["cooldown_until"] - now, 0),
+                "remaining_quota": _remaining_quota(state, now),
+                "in_flight": state["in_flight"],
+                "last_status": state["last_status"],
+            })
+        return rows
+
+
+def _gauges():
+    rows = []
+    for row in snapshot():
+        labels = {"key": row["key"]}
+        for field in ("successes", "failures", "latency_ewma", "cooldown_remaining", "remaining_quota", "in_flight"):
+            rows.append((f"gemini_key_{field}", labels, row[field]))
+    return rows
+
+
+# /metrics에 키별 상태를 게이지로 노출
+metrics.register_collector(_gauges)
@@ -0,0 +1,219 @@
+"""
+가벼운 계측 (타이머/카운터 + 라벨), 외부 서비스 없이 Prometheus 텍스트 형식으로 내보냄
+
+환경변수로 켭니다. 하나도 설정하지 않으면 꺼져 있고, 계측 지점은 플래그 한 번만 확인합니다.
+    PT_METRICS=1                 메모리에만 수집 (render()로 확인)
+    PT_METRICS_PORT=9464         http://127.0.0.1:9464/metrics 로 노출
+    PT_METRICS_FILE=metrics.prom 주기적으로 파일에 기록 (PT_METRICS_FLUSH_SEC 초마다, 기본 15)
+"""
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 지연시간 히스토그램 구간 (초): DB 호출(ms 미만) ~ 생성 요청(수십 초)
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 180)
+FLUSH_INTERVAL = float(os.environ.get("PT_METRICS_FLUSH_SEC") or 15)
+
+enabled = bool(os.environ.get("PT_METRICS") or os.environ.get("PT_METRICS_PORT") or os.environ.get("PT_METRICS_FILE"))
+
+# (이름, 라벨 튜플) -> 값 / 히스토그램 dict
+_counters = {}
+_histograms = {}
+_collectors = []      # render 시점에 (이름, 라벨 dict, 값) 목록을 돌려주는 함수들 (게이지)
+_lock = threading.Lock()
+_exporters_started = False
+
+
+def enable(flag=True):
+    """실행 중 켜고 끄기 (벤치마크/디버그용)"""
+    global enabled
+    enabled = flag
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def inc(name, amount=1, **labels):
+    """카운터 증가 (이름은 _total로 끝나게)"""
+    if not enabled:
+        return
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, seconds, **labels):
+    """지연시간 한 건 기록"""
+    if not enabled:
+        return
+    key = (name, _label_key(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS)}
+        hist["count"] += 1
+        hist["sum"] += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+                break
+
+
+@contextmanager
+def timer(name, **labels):
+    """with metrics.timer("x_seconds", status=...): 블록 실행 시간 기록"""
+    if not enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def timed(name, **labels):
+    """
+    함수 실행 시간을 fn 라벨을 붙여 기록하는 데코레이터 (예외는 <name>_errors_total로 셈)
+    꺼져 있으면 원래 함수를 바로 호출
+    """
+    def decorator(func):
+        fn_labels = dict(labels, fn=func.__name__)
+        error_name = name.rsplit("_seconds", 1)[0] + "_errors_total"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                inc(error_name, **fn_labels)
+                raise
+            finally:
+                observe(name, time.perf_counter() - started, **fn_labels)
+        return wrapper
+    return decorator
+
+
+def register_collector(func):
+    """render 때마다 호출되어 게이지 값을 돌려주는 함수 등록: func() -> [(이름, 라벨 dict, 값), ...]"""
+    if func not in _collectors:
+        _collectors.append(func)
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ""
+    escaped = []
+    for k, v in items:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{k}="{v}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def render():
+    """Prometheus 텍스트 형식 (version 0.0.4)"""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, dict(v, buckets=list(v["buckets"]))) for k, v in _histograms.items())
+
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for (name, labels), hist in histograms:
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, n in zip(BUCKETS, hist["buckets"]):
+            cumulative += n
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {hist['sum']:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+
+    gauges = []
+    for collect in list(_collectors):
+        try:
+            gauges.extend(collect())
+        except Exception:
+            continue
+    # 같은 이름의 줄은 한데 모여 있어야 함 (정렬은 안정적이라 수집 순서 유지)
+    gauges.sort(key=lambda row: row[0])
+    for name, labels, value in gauges:
+        if value is None:
+            continue
+        if name not in typed:
+            lines.append(f"# TYPE {name} gauge")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(_label_key(labels))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _flush_loop(path):
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(render())
+            os.replace(tmp, path)  # 읽는 쪽이 반쯤 쓴 파일을 보지 않도록
+        except OSError:
+            pass
+
+
+def start_exporters():
+    """환경변수에 따라 /metrics 서버와 파일 기록 스레드를 한 번만 시작 (여러 번 호출해도 됨)"""
+    global _exporters_started
+    if not enabled or _exporters_started:
+        return
+    with _lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    port = os.environ.get("PT_METRICS_PORT")
+    if port:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        except (OSError, ValueError):
+            pass  # 포트를 이미 다른 프로세스가 쓰는 경우 등: 파일 기록은 계속
+    path = os.environ.get("PT_METRICS_FILE")
+    if path:
+        threading.Thread(target=_flush_loop, args=(path,), name="metrics-flush", daemon=True).start()
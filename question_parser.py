@@ -0,0 +1,239 @@
+import json
+import re
+
+# 5지 선다형
+OPTION_COUNT = 5
+
+# 출제 과목 (과목별 통계/할당량은 이 이름으로 맞춰짐)
+SUBJECTS = [
+    "물리치료 기초",
+    "물리치료 진단평가",
+    "물리치료 중재",
+    "의료관계법규",
+    "물리치료 실기"
+]
+# 모델이 과목명을 줄이거나 바꿔 쓴 경우("진단평가", "의료법규" 등) 알아볼 핵심어 (공백 제거 후 비교)
+_SUBJECT_KEYWORDS = [
+    ("물리치료 진단평가", ("진단", "평가")),
+    ("물리치료 중재", ("중재",)),
+    ("의료관계법규", ("법규", "의료법", "관계법")),
+    ("물리치료 실기", ("실기",)),
+    ("물리치료 기초", ("기초",)),
+]
+
+_CIRCLED = {c: i + 1 for i, c in enumerate("①②③④⑤⑥⑦⑧⑨")}
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_SMART_QUOTES = str.maketrans({'“': '"', '”': '"'})
+# 객체 밖에서 볼 구조 문자 / 문자열 안에서 볼 문자
+_STRUCTURE = re.compile(r'[{}"]')
+_IN_STRING = re.compile(r'["\\]')
+
+
+def _loads_lenient(text):
+    """객체 하나 파싱 (문자열 안 줄바꿈 허용, 끝 쉼표/스마트 따옴표는 고쳐서 재시도)"""
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        pass
+    repaired = _TRAILING_COMMA.sub(r'\1', text.translate(_SMART_QUOTES))
+    try:
+        return json.loads(repaired, strict=False)
+    except ValueError:
+        return None
+
+
+def _scan(state):
+    """state의 버퍼를 이어서 훑으며 닫힌 최상위 객체를 파싱해 내보냄 (정규식으로 구조 문자만 건너뜀)"""
+    buf = state["buf"]
+    pos = state["pos"]
+    while True:
+        if state["start"] < 0:
+            i = buf.find('{', pos)
+            if i < 0:
+                buf, pos = '', 0
+                break
+            state["start"], state["depth"], pos = i, 1, i + 1
+            continue
+        if state["in_string"]:
+            m = _IN_STRING.search(buf, pos)
+            if not m:
+                pos = len(buf)
+                break
+            if m.group() == '\\':
+                if m.end() >= len(buf):
+                    pos = m.start()  # 이스케이프가 조각 경계에 걸림: 다음 조각과 함께 다시 봄
+                    break
+                pos = m.end() + 1
+            else:
+                state["in_string"] = False
+                pos = m.end()
+            continue
+        m = _STRUCTURE.search(buf, pos)
+        if not m:
+            pos = len(buf)
+            break
+        pos = m.end()
+        ch = m.group()
+        if ch == '"':
+            state["in_string"] = True
+        elif ch == '{':
+            state["depth"] += 1
+        else:
+            state["depth"] -= 1
+            if state["depth"] == 0:
+                obj = _loads_lenient(buf[state["start"]:pos])
+                if obj is not None:
+                    state["start"] = -1
+                    state["buf"], state["pos"] = buf[pos:], 0
+                    yield obj
+                    buf, pos = state["buf"], state["pos"]
+                else:
+                    pos = state["start"] + 1
+                    state["start"] = -1
+    state["buf"], state["pos"] = buf, pos
+
+
+def iter_json_objects(chunks):
+    """
+    JSON 배열 텍스트 조각들을 받아, 최상위 객체가 닫히는 즉시 하나씩 파싱해 내보냅니다.
+    배열 바깥의 코드펜스나 잡담은 무시합니다. 깨진 객체(따옴표 누락 등)가 뒤 객체를 삼키지 않도록,
+    파싱에 실패하면 그 객체의 여는 괄호 다음부터 다시 훑습니다.
+    """
+    state = {"buf": "", "pos": 0, "start": -1, "depth": 0, "in_string": False}
+    for chunk in chunks:
+        state["buf"] += chunk
+        yield from _scan(state)
+    # 스트림이 끝났는데 닫히지 않은 객체: 여는 괄호 다음부터 다시 훑어 안쪽의 온전한 객체를 찾음
+    while state["start"] >= 0:
+        state["pos"] = state["start"] + 1
+        state["start"] = -1
+        state["in_string"] = False
+        yield from _scan(state)
+
+
+def _loads_array(text):
+    """빠른 경로: 응답이 온전한 배열이면 한 번에 파싱, 아니면 None"""
+    start = text.find('[')
+    end = text.rfind(']')
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1], strict=False)
+    except ValueError:
+        return None
+    if not isinstance(data, list) or not any(isinstance(item, dict) for item in data):
+        return None
+    return data
+
+
+def _answer_number(answer):
+    """정답 표기를 정수로 (3, "3", "3번", "③"), 못 읽으면 None"""
+    if isinstance(answer, bool):
+        return None
+    if isinstance(answer, int):
+        return answer
+    if isinstance(answer, float) and answer.is_integer():
+        return int(answer)
+    if isinstance(answer, str):
+        s = answer.strip()
+        if s[:1] in _CIRCLED:
+            return _CIRCLED[s[0]]
+        m = re.match(r'^(\d+)', s)
+        if m:
+            return int(m.group(1))
+    return None
+
+
+def observe_answer_base(item, base_state):
+    """
+    정답 번호 체계 추론: 0이 보이면 0부터, OPTION_COUNT가 보이면 1부터 시작하는 번호로 고정
+    (프롬프트가 0부터를 요구하므로 둘 다 안 보이면 0부터로 간주)
+    """
+    if not isinstance(item, dict) or "base" in base_state:
+        return
+    number = _answer_number(item.get('answer'))
+    if number == 0:
+        base_state["base"] = 0
+    elif number == OPTION_COUNT:
+        base_state["base"] = 1
+
+
+def normalize_category(category):
+    """모델이 쓴 과목명을 SUBJECTS 중 하나로, 알아볼 수 없으면 None"""
+    if not isinstance(category, str):
+        return None
+    name = category.strip()
+    if name in SUBJECTS:
+        return name
+    compact = re.sub(r'\s+', '', name)
+    for subject, keywords in _SUBJECT_KEYWORDS:
+        if any(k in compact for k in keywords):
+            return subject
+    return None
+
+
+def validate_question(item, subject=None, base_state=None):
+    """
+    스키마 검증 후 정리된 문제 dict 반환, 쓸 수 없으면 None
+    - question: 비어있지 않은 문자열
+    - options: 정확히 OPTION_COUNT개의 비어있지 않은 보기
+    - answer: 0부터 시작하는 보기 인덱스로 정규화 (보기 문장으로 답한 경우도 인식)
+    - category: SUBJECTS 중 하나 (지정한 과목이 있으면 그 과목, 없으면 모델이 쓴 과목명을 맞춰 봄)
+    """
+    if not isinstance(item, dict):
+        return None
+    question = item.get('question')
+    options = item.get('options')
+    if not isinstance(question, str) or not question.strip():
+        return None
+    if not isinstance(options, list) or len(options) != OPTION_COUNT:
+        return None
+    options = [str(o).strip() for o in options]
+    if not all(options):
+        return None
+
+    answer = item.get('answer')
+    if isinstance(answer, str) and answer.strip() in options:
+        answer_idx = options.index(answer.strip())
+    else:
+        number = _answer_number(answer)
+        if number is None:
+            return None
+        if base_state is None:
+            base_state = {}
+        observe_answer_base(item, base_state)
+        answer_idx = number - base_state.get("base", 0)
+    if not 0 <= answer_idx < OPTION_COUNT:
+        return None
+
+    # 과목을 지정해 생성했으면 그 과목으로 통일 (과목별 통계/할당량이 이름으로 맞춰짐)
+    category = subject or normalize_category(item.get('category'))
+    if category is None:
+        return None
+    return {
+        "category": category,
+        "question": question.strip(),
+        "options": options,
+        "answer": answer_idx,
+        "explanation": str(item.get('explanation') or ''),
+    }
+
+
+def parse_questions(text, subject=None):
+    """
+    모델 응답 전체에서 유효한 문제를 최대한 살려냅니다. (문제 리스트, 버린 객체 수)
+    배열 일부가 깨져도 나머지 객체는 그대로 씁니다.
+    """
+    text = text or ''
+    items = _loads_array(text)
+    if items is None:
+        items = list(iter_json_objects([text]))
+    base_state = {}
+    for item in items:
+        observe_answer_base(item, base_state)
+    questions = []
+    for item in items:
+        q = validate_question(item, subject, base_state)
+        if q:
+            questions.append(q)
+    return questions, len(items) - len(questions)
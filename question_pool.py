@@ -0,0 +1,224 @@
+import threading
+import time
+import database
+import gemini
+import jobs
+import key_scheduler
+import metrics
+import selection
+
+# 사용자가 아직 받지 않은 문제가 이 수 아래로 떨어지면 백그라운드 보충 시작
+POOL_LOW_WATER = 60
+# 보충 작업 한 번에 생성하는 문제 수
+POOL_REFILL_BATCH = 20
+# 풀이 비어 즉석 생성할 때의 방식: "stream"(첫 문제 최우선) 또는 "sharded"(과목별 병렬)
+INLINE_GENERATION_MODE = "stream"
+# 즉석 생성을 기다리는 최대 시간 (초): 넘으면 받은 문제까지로 시험을 확정 (남은 예약은 settle_usage에서 환불)
+EXAM_WAIT_SEC = 5 * 60
+
+_lock = threading.Lock()
+_started = False
+# 서버(시크릿)의 키: 공용 풀 보충과 공용 즉석 생성에만 씀
+_cloud_keys = []
+# 사용자가 직접 입력한 키로 하는 즉석 생성: user_id -> {"keys": [...], "results": [...]}
+# 키는 DB에 남기지 않으므로 작업은 이 프로세스의 워커만 실행하고, 결과도 풀이 아니라 그 사용자에게만 전달
+_personal = {}
+
+
+def set_cloud_keys(api_keys):
+    with _lock:
+        _cloud_keys[:] = list(api_keys or [])
+    key_scheduler.set_cloud_keys(api_keys)
+
+
+def _get_cloud_keys():
+    with _lock:
+        return list(_cloud_keys)
+
+
+def _is_cloud(api_keys):
+    cloud = _get_cloud_keys()
+    return bool(cloud) and bool(api_keys) and set(api_keys) <= set(cloud)
+
+
+def _run_refill_job(job):
+    """보충 작업: 한 배치를 생성해 풀에 저장"""
+    api_keys = _get_cloud_keys()
+    if not api_keys:
+        return 0, "No cloud API keys"
+    questions, error = gemini.generate_exam_batch(api_keys, count=job["count"], subject=job["subject"])
+    if not questions:
+        return 0, error
+    database.add_pool_questions(questions)
+    return len(questions), None
+
+
+def _after_refill(job, produced):
+    # 아직 모자라면 다음 배치를 이어서 넣음 (생성에 실패했으면 다음 요청 때 다시)
+    if produced:
+        request_refill(job["user_id"])
+
+
+def _run_inline_job(job):
+    """
+    즉석 생성 작업: 도착하는 대로 전달 (기다리는 시험 화면이 poll_exam으로 꺼내감)
+    서버 키 작업은 공용 풀에, 사용자 키 작업은 그 사용자의 결과 목록에만
+    """
+    personal = _personal.get(job["user_id"]) if job["user_id"] is not None else None
+    if personal is not None:
+        api_keys = personal["keys"]
+    else:
+        api_keys = _get_cloud_keys()
+    if not api_keys:
+        return 0, "No API keys"
+    finished = threading.Event()
+    produced = [0]
+
+    def _deliver(batch, done=False):
+        if batch:
+            if personal is not None:
+                with _lock:
+                    personal["results"].extend(batch)
+            else:
+                database.add_pool_questions(batch)
+            produced[0] += len(batch)
+        if done:
+            finished.set()
+
+    if INLINE_GENERATION_MODE == "sharded":
+        generate = gemini.generate_exam_batch_sharded
+    else:
+        generate = gemini.generate_exam_batch_streaming
+    generated, error = generate(api_keys, count=job["count"], min_count=1, on_late_results=_deliver)
+    if not generated:
+        return 0, error
+    _deliver(generated)
+    finished.wait()  # 남은 문제까지 받을 때까지 워커 자리를 차지 (동시 생성 수 제한)
+    return produced[0], None
+
+
+jobs.register("refill", _run_refill_job, after=_after_refill)
+jobs.register("inline", _run_inline_job)
+
+
+def request_refill(user_id=None):
+    """
+    풀이 부족하면 서버 키로 보충 작업을 큐에 넣고 작업 id 반환 (충분하거나 서버 키가 없으면 None)
+    같은 과목의 보충이 이미 대기/실행 중이면 새로 넣지 않음
+    """
+    if not _get_cloud_keys():
+        return None
+    subject = None
+    if user_id is not None:
+        # 사용자의 약한 과목 중 남은 문제가 모자란 과목만 생성 (모자란 과목이 없으면 보충 안 함)
+        subject = selection.refill_subject(user_id, POOL_LOW_WATER)
+        if subject is None:
+            return None
+    elif database.count_pool_questions() >= POOL_LOW_WATER:
+        return None
+    return jobs.submit("refill", f"refill:{subject or '*'}", subject=subject, user_id=user_id, count=POOL_REFILL_BATCH)
+
+
+def warm_up(api_keys):
+    """프로세스 시작 시 한 번만: 서버 키를 등록하고 풀 상태를 확인해 필요하면 보충"""
+    global _started
+    set_cloud_keys(api_keys)
+    with _lock:
+        if _started:
+            return
+        _started = True
+    request_refill()
+
+
+def _submit_inline(user_id, api_keys, count):
+    """모자란 문제의 즉석 생성 작업을 넣고 작업 id 반환"""
+    if _is_cloud(api_keys):
+        # 동시에 시작한 사용자들은 같은 즉석 생성 작업을 함께 기다림
+        return jobs.submit("inline", "inline", count=count)
+    # 사용자 키: 그 사용자만의 작업, 이 프로세스에서만 실행
+    with _lock:
+        personal = _personal.setdefault(user_id, {"keys": [], "results": []})
+        personal["keys"] = list(api_keys)
+    return jobs.submit("inline", f"inline:{user_id}:{jobs.PROCESS_ID}", user_id=user_id, count=count,
+                       owner=jobs.PROCESS_ID)
+
+
+def _take_personal(user_id, need):
+    with _lock:
+        personal = _personal.get(user_id)
+        if personal is None:
+            return []
+        taken = personal["results"][:need]
+        del personal["results"][:need]
+        return taken
+
+
+def draw_exam(user_id, api_keys, count=20, exam_session=None):
+    """
+    풀에서 사용자가 안 본 문제를 약한 과목 위주로 꺼내 (문제 리스트, 에러 메시지)로 반환합니다.
+    count개가 안 되면 모자란 만큼 즉석 생성 작업을 큐에 넣습니다. (기다리지 않음)
+    이때 exam_session["generating"]이 True, exam_session["job_id"]가 작업 id이며
+    화면은 poll_exam으로 도착한 문제를 이어 받습니다.
+    """
+    # 약한 과목일수록 많이 뽑음 (과목별 누적 통계 기준)
+    questions = database.draw_pool_questions(user_id, count, selection.exam_quotas(user_id, count))
+    last_error = None
+    metrics.inc("exam_draws_total", source="pool" if len(questions) >= count else "inline")
+
+    if exam_session is not None:
+        exam_session["questions_list"] = questions
+        if len(questions) < count and api_keys:
+            exam_session["job_id"] = _submit_inline(user_id, api_keys, count - len(questions))
+            exam_session["generating"] = exam_session["job_id"] is not None
+            if not exam_session["generating"] and not questions:
+                last_error = "작업 큐에 넣지 못했습니다"
+    elif not questions:
+        last_error = "풀에 남은 문제가 없습니다"
+
+    # 꺼내간 만큼 다음 시험을 위해 미리 채워둠
+    request_refill(user_id)
+    return questions, last_error
+
+
+def poll_exam(user_id, exam_session, count=20):
+    """
+    즉석 생성을 기다리는 시험: 작업 상태를 보고 풀에 새로 들어온 문제를 이어 붙임
+    작업이 끝났으면 exam_session["generating"]을 내리고 작업 에러를 exam_session["error"]에 남김
+    공용 작업이 끝났는데도 모자라면 모자란 만큼 새 작업을 넣고 계속 기다림
+    EXAM_WAIT_SEC가 지나도록 안 끝나면 (워커가 멈춘 경우 등) 더 기다리지 않고 끝난 것으로 처리
+    """
+    job = jobs.status(exam_session.get("job_id"))
+    finished = job is None or job["status"] in ("done", "failed")
+    timed_out = not finished and time.time() > exam_session.setdefault("wait_until", time.time() + EXAM_WAIT_SEC)
+    questions = exam_session["questions_list"]
+    # 상태를 먼저 읽고 꺼내야 '끝남'을 본 뒤에 꺼낸 결과에 마지막 문제까지 들어 있음
+    need = count - len(questions)
+    if need > 0:
+        questions.extend(_take_personal(user_id, need))
+    need = count - len(questions)
+    if need > 0:
+        questions.extend(database.draw_pool_questions(user_id, need))
+    need = count - len(questions)
+    if finished and job is not None and job["produced"] and need > 0:
+        # 함께 쓴 공용 작업이 다른 사용자의 (더 적은) 요청만큼만 만들었으면 모자란 만큼 다시 요청
+        with _lock:
+            personal = user_id in _personal
+        cloud = _get_cloud_keys()
+        if not personal and cloud:
+            job_id = _submit_inline(user_id, cloud, need)
+            if job_id is not None:
+                exam_session["job_id"] = job_id
+                metrics.inc("exam_topups_total")
+                return questions
+    if finished or timed_out or len(questions) >= count:
+        exam_session["generating"] = False
+        if finished or timed_out:
+            with _lock:
+                _personal.pop(user_id, None)  # 다 받았으면 사용자 키와 남은 결과 정리
+        if timed_out:
+            metrics.inc("exam_wait_timeouts_total")
+            if not questions:
+                exam_session["error"] = "문제 생성 시간이 초과되었습니다"
+        elif job is not None and not questions:
+            exam_session["error"] = job["error"]
+    return questions
@@ -0,0 +1,35 @@
+# 오답노트 간격 반복 일정 (SM-2)
+# 객관식이라 스스로 점수를 매기지 않고 맞힘/틀림 두 단계만 SM-2 품질 점수(0~5)로 바꿔 씀
+START_EASE = 2.5
+MIN_EASE = 1.3
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+# 첫 번째, 두 번째로 맞혔을 때의 간격 (일), 이후는 이전 간격 × ease
+FIRST_INTERVAL = 1
+SECOND_INTERVAL = 6
+# 복습에서 틀리면 다음 날 다시
+RELEARN_INTERVAL = 1
+
+
+def ease_delta(quality):
+    """SM-2 난이도 계수 변화량 (품질 4면 그대로, 낮을수록 감소)"""
+    return round(0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02), 2)
+
+
+def ease_after(ease, quality):
+    """SM-2 난이도 계수 갱신 (MIN_EASE 아래로는 내려가지 않음)"""
+    return max(MIN_EASE, round(ease + ease_delta(quality), 2))
+
+
+def next_review(ease, interval_days, repetitions, correct):
+    """복습 결과로 (새 ease, 다음 간격(일), 연속 정답 수) 계산"""
+    ease = ease or START_EASE
+    if not correct:
+        return ease_after(ease, QUALITY_WRONG), RELEARN_INTERVAL, 0
+    if repetitions == 0:
+        interval = FIRST_INTERVAL
+    elif repetitions == 1:
+        interval = SECOND_INTERVAL
+    else:
+        interval = max(1, round((interval_days or 1) * ease))
+    return ease_after(ease, QUALITY_CORRECT), interval, repetitions + 1
@@ -0,0 +1,49 @@
+import database
+import gemini
+
+# 풀이 기록이 적은 과목은 이 오답률로 보고 시작 (PRIOR_ATTEMPTS번 푼 것과 같은 무게)
+PRIOR_ERROR_RATE = 0.5
+PRIOR_ATTEMPTS = 4
+# 잘하는 과목도 완전히 빠지지 않도록 과목마다 보장하는 최소 비율
+MIN_SHARE = 0.08
+
+
+def subject_weights(user_id):
+    """
+    사용자의 과목별 출제 비중 {과목: 비율} (합 1)
+    누적 통계(과목 수만큼의 행)만 읽으므로 기록이 아무리 많아도 비용이 같음
+    """
+    stats = database.get_subject_stats(user_id)
+    rates = {}
+    for subject in gemini.SUBJECTS:
+        attempts, wrong = stats.get(subject, (0, 0))
+        rates[subject] = (wrong + PRIOR_ERROR_RATE * PRIOR_ATTEMPTS) / (attempts + PRIOR_ATTEMPTS)
+    total = sum(rates.values()) or 1
+    spare = 1 - MIN_SHARE * len(rates)
+    return {s: MIN_SHARE + spare * r / total for s, r in rates.items()}
+
+
+def allocate(count, weights):
+    """비율대로 count개를 정수로 나눔 (최대 나머지 방식, 합은 항상 count)"""
+    raw = {s: count * w for s, w in weights.items()}
+    quotas = {s: int(v) for s, v in raw.items()}
+    leftover = count - sum(quotas.values())
+    for s in sorted(raw, key=lambda s: raw[s] - quotas[s], reverse=True)[:leftover]:
+        quotas[s] += 1
+    return quotas
+
+
+def exam_quotas(user_id, count=20):
+    """시험 한 회분의 과목별 문제 수 (약한 과목일수록 많이)"""
+    return allocate(count, subject_weights(user_id))
+
+
+def refill_subject(user_id, target_total):
+    """
+    보충 생성할 과목: 사용자의 출제 비중 대비 남은 문제가 가장 모자란 과목
+    (이미 충분한 과목, 특히 잘하는 과목은 더 만들지 않음) 모자란 과목이 없으면 None
+    """
+    unseen = database.count_pool_questions_by_category(user_id)
+    deficits = {s: target_total * w - unseen.get(s, 0) for s, w in subject_weights(user_id).items()}
+    subject = max(deficits, key=deficits.get)
+    return subject if deficits[subject] > 0 else None
@@ -0,0 +1,164 @@
+"""
+진행 중인 시험 저장소 (서버 재시작, 재배포, 웹소켓 재접속 후에도 같은 시험을 이어 풀기)
+
+문제 묶음은 압축한 JSON으로 새 시험이거나 문제가 늘었을 때만 쓰고,
+문제를 넘길 때마다는 작은 진행 상태(JSON)만 갱신합니다.
+
+백엔드는 PT_SESSION_STORE 환경변수로 고릅니다.
+    sqlite (기본)        usage_data.db의 exam_sessions 테이블
+    file:/공유/폴더      사용자마다 파일 두 개 (여러 앱 프로세스/서버가 같은 폴더를 공유)
+"""
+import json
+import os
+import uuid
+import zlib
+import database
+
+# 저장하는 진행 상태 항목 (questions_list는 묶음으로 따로 저장)
+STATE_KEYS = ("current_idx", "correct_count", "is_submitted", "user_choice", "generating", "job_id", "review", "error", "reserved", "wait_until")
+
+
+class SQLiteBackend:
+    def save_batch(self, user_id, batch, state):
+        database.save_exam_batch(user_id, batch, state)
+
+    def save_state(self, user_id, state):
+        database.save_exam_state(user_id, state)
+
+    def load(self, user_id):
+        return database.load_exam_session(user_id)
+
+    def delete(self, user_id):
+        database.delete_exam_session(user_id)
+
+
+class FileBackend:
+    """<폴더>/<user_id>.batch (압축 묶음) + <user_id>.state (진행 상태), 임시 파일에 쓰고 os.replace로 교체"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, user_id, ext):
+        return os.path.join(self.directory, f"{user_id}.{ext}")
+
+    def _write(self, path, data):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # 다른 프로세스가 반쯤 쓴 파일을 읽지 않도록
+
+    def save_batch(self, user_id, batch, state):
+        # 두 파일 사이에서 멈추면 상태의 batch_crc가 맞지 않아 load가 무시함
+        self._write(self._path(user_id, "batch"), batch)
+        self._write(self._path(user_id, "state"), state.encode("utf-8"))
+
+    def save_state(self, user_id, state):
+        self._write(self._path(user_id, "state"), state.encode("utf-8"))
+
+    def load(self, user_id):
+        try:
+            with open(self._path(user_id, "batch"), "rb") as f:
+                batch = f.read()
+            with open(self._path(user_id, "state"), encoding="utf-8") as f:
+                state = f.read()
+        except FileNotFoundError:
+            return None
+        return batch, state
+
+    def delete(self, user_id):
+        for ext in ("batch", "state"):
+            try:
+                os.remove(self._path(user_id, ext))
+            except FileNotFoundError:
+                pass
+
+
+def _make_backend(spec):
+    if spec.startswith("file:"):
+        return FileBackend(spec[len("file:"):])
+    return SQLiteBackend()
+
+
+_backend = _make_backend(os.environ.get("PT_SESSION_STORE") or "sqlite")
+
+
+def set_backend(backend):
+    """백엔드 교체 (벤치마크/다른 저장소 연결용)"""
+    global _backend
+    _backend = backend
+
+
+def valid_user_id(user_id):
+    """주소로 받은 id는 UUID 형식만 허용 (파일 이름에도 쓰이므로)"""
+    try:
+        return str(uuid.UUID(str(user_id))) == str(user_id)
+    except ValueError:
+        return False
+
+
+def _pack(questions):
+    return zlib.compress(json.dumps(questions, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _state(exam_session):
+    state = {k: exam_session.get(k) for k in STATE_KEYS}
+    state["batch_crc"] = exam_session.get("_batch_crc")
+    return json.dumps(state, ensure_ascii=False)
+
+
+def save(user_id, exam_session):
+    """
+    시험 진행 저장: 문제 수가 마지막 저장과 다르면 묶음까지, 같으면 진행 상태만
+    (exam_session["_stored_len"]에 마지막으로 저장한 문제 수를 기록)
+    """
+    questions = exam_session.get("questions_list") or []
+    try:
+        if exam_session.get("_stored_len") != len(questions):
+            batch = _pack(questions)
+            exam_session["_batch_crc"] = zlib.crc32(batch)
+            _backend.save_batch(user_id, batch, _state(exam_session))
+            exam_session["_stored_len"] = len(questions)
+        else:
+            _backend.save_state(user_id, _state(exam_session))
+    except (OSError, database.sqlite3.Error):
+        # 저장 실패가 시험 진행을 막지는 않음 (다음 저장 때 묶음부터 다시)
+        exam_session.pop("_stored_len", None)
+
+
+def load(user_id):
+    """저장된 시험 세션 dict 또는 None (묶음과 상태가 서로 다른 저장의 것이면 None)"""
+    try:
+        stored = _backend.load(user_id)
+    except (OSError, database.sqlite3.Error):
+        return None
+    if stored is None:
+        return None
+    batch, state = stored
+    try:
+        exam_session = json.loads(state)
+        if exam_session.pop("batch_crc", None) != zlib.crc32(batch):
+            return None
+        exam_session["questions_list"] = json.loads(zlib.decompress(batch).decode("utf-8"))
+    except (ValueError, zlib.error):
+        return None
+    exam_session["_stored_len"] = len(exam_session["questions_list"])
+    exam_session["_batch_crc"] = zlib.crc32(batch)
+    return exam_session
+
+
+def load_unfinished(user_id):
+    """아직 끝나지 않은 시험만 (남은 문제가 있거나 생성 중)"""
+    exam_session = load(user_id)
+    if exam_session is None:
+        return None
+    if exam_session.get("current_idx", 0) < len(exam_session["questions_list"]) or exam_session.get("generating"):
+        return exam_session
+    return None
+
+
+def clear(user_id):
+    try:
+        _backend.delete(user_id)
+    except (OSError, database.sqlite3.Error):
+        pass